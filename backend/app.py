@@ -20,12 +20,44 @@ root_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(root_dir))
 #import modules
 from scripts.find_episode import find_episode
-from scripts.find_episode_by_keywords import find_episodes_by_keywords
+from scripts.find_episode_by_keywords import search_keywords
 from scripts.get_imdb_rating import get_rating
+from scripts.timing import start_timing, stop_timing, get_spans, server_timing_header
+from scripts.index_manager import current_version, start_reloader
+from scripts.suggest import MAX_SUGGESTIONS, get_suggester
+from scripts.quote_index import MAX_QUOTE_HITS, get_quote_index
+from scripts.http_cache import get_http_cache
+from scripts.deadline import start_deadline, stop_deadline, get_deadline
+
+MAX_KEYWORD_RESULTS = 10
 
 #init flask app
 app = Flask(__name__, static_folder='../frontend')
-CORS(app)
+CORS(app, expose_headers=['Server-Timing'])
+
+#per-request timing spans, sent back as a Server-Timing header
+@app.before_request
+def begin_request_timing():
+    start_timing()
+    #every outbound call in this request takes its timeout from what is left of this budget
+    start_deadline()
+@app.after_request
+def add_server_timing(response):
+    stop_deadline()
+    spans = stop_timing()
+    if spans:
+        response.headers['Server-Timing'] = server_timing_header(spans)
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+def add_degraded(payload):
+    """Flag answers that are missing parts because the request deadline ran out"""
+    deadline = get_deadline()
+    if deadline and deadline.degraded:
+        payload['degraded'] = list(deadline.degraded)
+    return payload
+def wants_timings(data):
+    """Clients opt into a 'timings' field in the JSON body with timings=true"""
+    return bool(data.get('timings')) or request.args.get('timings', '').lower() in ('1', 'true')
 #serve frontend
 @app.route('/')
 def serve_index():
@@ -39,6 +71,7 @@ def search_episode():
         data = request.json
         description = data.get('description')
         test_mode = data.get('test_mode', False)
+        cascade = data.get('cascade')
         
         if not description:
             return jsonify({'error': 'missing description'}), 400
@@ -46,7 +79,7 @@ def search_episode():
         if len(description) > 500:
             description = description[:500]
         #find episode
-        result = find_episode(description, test_mode=test_mode)
+        result = find_episode(description, test_mode=test_mode, cascade=cascade)
         if result is None:            return jsonify({
                 'error': 'failed to search episodes',
                 'message': 'check server logs for details'
@@ -54,10 +87,13 @@ def search_episode():
         #log success
         logger.info(f"Successfully found episodes for scene: {description[:50]}...")
         logger.info(f"Result being returned: {result}")
-        return jsonify({
+        payload = add_degraded({
             'success': True,
             'results': result
         })
+        if wants_timings(data):
+            payload['timings'] = get_spans()
+        return jsonify(payload)
     except Exception as e:
         #log error
         return jsonify({
@@ -76,12 +112,12 @@ def test_default_episode():
     
     if imdb_data is None:
         logger.error(f"/api/test: get_rating returned None for S{test_season}E{test_episode_identifier}.")
-        return jsonify({
+        return jsonify(add_degraded({
             'success': False,
             'test_parameters': {'season': test_season, 'episode_identifier': test_episode_identifier},
             'message': 'IMDb data fetching failed: get_rating returned None. Check server logs for get_imdb_rating.py errors.',
             'imdb_data': None
-        }), 500
+        })), 500
 
     # Check for completeness of critical IMDb data
     rating_ok = imdb_data.get('rating') not in [None, 'N/A', '']
@@ -101,12 +137,12 @@ def test_default_episode():
 
     logger.debug(f"/api/test: Full IMDb data for S{test_season}E{test_episode_identifier}: {imdb_data}")
 
-    return jsonify({
+    return jsonify(add_degraded({
         'success': is_complete,
         'test_parameters': {'season': test_season, 'episode_identifier': test_episode_identifier},
         'message': status_message,
         'imdb_data': imdb_data
-    })
+    }))
 
 @app.route('/api/keyword-search', methods=['POST'])
 def search_by_keywords():
@@ -114,7 +150,8 @@ def search_by_keywords():
     try:
         data = request.json
         keywords = data.get('keywords')
-        max_results = data.get('maxResults', 5)
+        #every result gets an IMDb lookup, keep the count bounded
+        max_results = max(1, min(int(data.get('maxResults', 5)), MAX_KEYWORD_RESULTS))
         
         if not keywords:
             return jsonify({'error': 'missing keywords'}), 400
@@ -123,12 +160,16 @@ def search_by_keywords():
         if len(keywords) > 200:
             keywords = keywords[:200]
         #search episodes
-        results = find_episodes_by_keywords(keywords, max_results)
+        search = search_keywords(keywords, max_results)
+        if search.get('error'):
+            return jsonify({'error': search['error']}), 400
+        results = search['results']
         
         if not results:
             return jsonify({
                 'success': True,
-                'results': "No episodes found matching your keywords."
+                'results': "No episodes found matching your keywords.",
+                'expansions': search['expansions']
             })
             
         #format results
@@ -136,10 +177,15 @@ def search_by_keywords():
         #log success
         logger.info(f"Successfully found episodes for keywords: {keywords[:50]}...")
         
-        return jsonify({
+        payload = add_degraded({
             'success': True,
-            'results': formatted_results
+            'results': formatted_results,
+            #misspelled term -> vocabulary terms searched instead
+            'expansions': search['expansions']
         })
+        if wants_timings(data):
+            payload['timings'] = get_spans()
+        return jsonify(payload)
     except Exception as e:        #log error
         logger.error(f"Error in keyword search: {str(e)}")
         return jsonify({
@@ -147,7 +193,51 @@ def search_by_keywords():
             'message': 'failed to process keyword search request'
         }), 500
 
+@app.route('/api/suggest', methods=['GET'])
+def suggest_keywords():
+    """Autocomplete the last word of a partial keyword query (called on every keystroke)"""
+    query = request.args.get('q', '')[:200]
+    try:
+        limit = int(request.args.get('limit', MAX_SUGGESTIONS))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    suggester = get_suggester()
+    if suggester is None:
+        return jsonify({'query': query, 'suggestions': []})
+    return jsonify({'query': query, 'suggestions': suggester.suggest(query, limit)})
+
+@app.route('/api/quote', methods=['GET'])
+def find_quote():
+    """Every episode and line containing an exact quote (punctuation and word order included)"""
+    query = request.args.get('q', '')[:200]
+    if not query.strip():
+        return jsonify({'error': 'missing q'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', MAX_QUOTE_HITS)), MAX_QUOTE_HITS))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    quote_index = get_quote_index()
+    if quote_index is None:
+        return jsonify({'error': 'no script corpus available'}), 503
+    return jsonify(quote_index.search(query, limit))
+
+@app.route('/api/index-version', methods=['GET'])
+def index_version():
+    """Which search index version this worker is serving"""
+    version = current_version()
+    if version is None:
+        return jsonify({'version': None})
+    return jsonify({'version': version.name, 'manifest': version.manifest})
+
+@app.route('/api/http-cache', methods=['GET'])
+def http_cache_stats():
+    """IMDb page cache hits, revalidations and misses for this worker"""
+    return jsonify(get_http_cache().stats())
+
 if __name__ == '__main__':
+    #the debug reloader runs this twice, only the serving child watches the indexes
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_reloader()
     #run in debug mode
     app.run(debug=True)
 
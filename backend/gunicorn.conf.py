@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for running the backend with several workers
+
+    gunicorn -c backend/gunicorn.conf.py --chdir backend app:app
+
+The current index version (data/indexes/CURRENT) is loaded in the master,
+building one first if there is none, so the workers fork with the same
+read-only pages mapped instead of each building or loading a copy. Every
+worker then runs its own IndexReloader: one of them builds a new version
+when data/scripts or the descriptions change and the others pick it up
+from CURRENT, without restarting anything.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+#add project root to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+#import the app in the master so workers inherit the mapped index after fork
+preload_app = True
+
+def on_starting(server):
+    """Load (or build) the current index version once, before any worker exists"""
+    from scripts.index_manager import load_current
+    version = load_current()
+    index = version.keyword_index
+    server.log.info(f"Index version {version.name} ready: {len(index.docs)} scripts, {index.memory_bytes():,} bytes mapped")
+    #built here so the workers inherit it instead of each building one on the first keystroke
+    from scripts.suggest import suggester_for
+    suggester_for(index)
+
+def post_fork(server, worker):
+    """Threads don't survive fork, so each worker starts its own reloader"""
+    from scripts.index_manager import start_reloader
+    start_reloader()
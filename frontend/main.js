@@ -243,6 +243,33 @@ keywordForm.addEventListener('submit', async (e) => {
         loading.classList.add('hidden')
     }
 })
+// Autocomplete the keyword box as the user types
+const keywordsInput = document.getElementById('keywords')
+const keywordSuggestions = document.getElementById('keywordSuggestions')
+let suggestController = null
+keywordsInput.addEventListener('input', async () => {
+    const query = keywordsInput.value
+    // Drop the answer to the previous keystroke if it hasn't arrived yet
+    if (suggestController) suggestController.abort()
+    suggestController = new AbortController()
+    try {
+        const response = await fetch(`http://localhost:5000/api/suggest?q=${encodeURIComponent(query)}`, {
+            signal: suggestController.signal,
+        })
+        if (!response.ok) return
+        const data = await response.json()
+        keywordSuggestions.innerHTML = ''
+        data.suggestions.forEach(suggestion => {
+            const option = document.createElement('option')
+            option.value = suggestion.value
+            option.label = suggestion.kind === 'term' ? `${suggestion.episodes} episodes` : suggestion.text
+            keywordSuggestions.appendChild(option)
+        })
+    } catch (err) {
+        if (err.name !== 'AbortError') console.warn('Suggestions unavailable:', err)
+    }
+})
+
 // Function to display results (common for both search types)
 function displayResults(resultsText) {
     const episodeInfo = resultsContent.querySelector('.episode-info')
@@ -261,8 +288,18 @@ function displayResults(resultsText) {
         existingLink.remove()
     }
     
-    // Parse result text
-    const lines = resultsText.split('\n')
+    // Clear any existing list of other matches
+    const existingOthers = resultsContent.querySelector('.other-results')
+    if (existingOthers) {
+        existingOthers.remove()
+    }
+    
+    // Keyword search returns one block per episode, separated by blank lines
+    const blocks = resultsText.split('\n\n')
+    const otherResults = blocks.slice(1).filter(block => block.startsWith('Season '))
+    
+    // Parse result text of the best match
+    const lines = blocks[0].split('\n')
     // Show episode info
     episodeInfo.textContent = lines[0]  // First line is episode info
     
@@ -272,6 +309,9 @@ function displayResults(resultsText) {
         const airDateLine = lines.find(line => line.includes('Original Air Date:'))
         const keywordMatchLine = lines.find(line => line.includes('Matched'))
         const keywordsFoundLine = lines.find(line => line.includes('Keywords found:'))
+        const spellingLine = lines.find(line => line.startsWith('Spelling:'))
+        const aliasLine = lines.find(line => line.startsWith('Also listed as:'))
+        const dialogueLines = lines.filter(line => line.startsWith('Dialogue'))
         const imageLine = lines.find(line => line.includes('IMDb Image:'))
         const imdbUrlLine = lines.find(line => line.includes('IMDb URL:'))
         
@@ -336,6 +376,28 @@ function displayResults(resultsText) {
                 keywordDetails.textContent = keywordsFoundLine
                 keywordInfo.appendChild(keywordDetails)
             }
+            // Show how misspelled keywords were corrected
+            if (spellingLine) {
+                const spelling = document.createElement('div')
+                spelling.classList.add('text-sm', 'text-base-content/80')
+                spelling.textContent = spellingLine.replace('Spelling:', 'Searched instead:')
+                keywordInfo.appendChild(spelling)
+            }
+            // The same script filed under other seasons
+            if (aliasLine) {
+                const alias = document.createElement('div')
+                alias.classList.add('text-sm', 'text-base-content/80')
+                alias.textContent = aliasLine
+                keywordInfo.appendChild(alias)
+            }
+            // Add matching dialogue snippets, matched words are wrapped in **
+            dialogueLines.forEach(line => {
+                const snippet = document.createElement('blockquote')
+                snippet.classList.add('dialogue-snippet', 'text-sm', 'italic', 'mt-2', 'pl-3', 'border-l-2', 'border-white/30')
+                snippet.innerHTML = searchHistory.escapeHtml(line.replace(/^Dialogue \(line \d+\):\s*/, ''))
+                    .replace(/\*\*(.+?)\*\*/g, '<mark>$1</mark>')
+                keywordInfo.appendChild(snippet)
+            })
             // Replace airDate content with keyword info
             airDate.classList.remove('hidden')
             airDate.innerHTML = ''
@@ -348,6 +410,25 @@ function displayResults(resultsText) {
         airDate.classList.add('hidden')
     }
     
+    // List the remaining matches below the best one
+    if (otherResults.length) {
+        const othersContainer = document.createElement('div')
+        othersContainer.classList.add('other-results', 'mt-4', 'text-sm')
+        const heading = document.createElement('div')
+        heading.classList.add('font-bold', 'mb-1')
+        heading.textContent = 'Other matches'
+        othersContainer.appendChild(heading)
+        otherResults.forEach(block => {
+            const blockLines = block.split('\n')
+            const rating = blockLines.find(line => line.includes('IMDb Rating:'))
+            const matched = blockLines.find(line => line.includes('Matched'))
+            const item = document.createElement('div')
+            item.textContent = [blockLines[0], matched, rating].filter(Boolean).join(' · ')
+            othersContainer.appendChild(item)
+        })
+        resultsContent.appendChild(othersContainer)
+    }
+    
     results.classList.remove('hidden')
 }
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Offline parse benchmark for the IMDb scraper
+
+Runs every parser against the recorded fixtures (see imdb_fixtures.py) and
+reports throughput and per-strategy parse times. No request leaves the
+machine, so the numbers measure parsing alone:
+
+    html.parser       BeautifulSoup over each season page, which every page strategy pays first
+    JSON-LD           the TVSeries episode list in the page's ld+json block
+    <HTML strategy>   each compiled HTML_PARSING_STRATEGIES spec over the parsed pages
+    GraphQL           json.loads plus episode extraction for each recorded GraphQL response
+
+Each parser runs --repeat times over all its inputs and the fastest pass
+is reported, which is the least noisy.
+
+    python scripts/imdb_fixtures.py record      once, online
+    python scripts/bench_imdb_parsing.py --repeat 20
+"""
+
+import sys
+import json
+import time
+import logging
+import urllib.parse
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.get_imdb_rating import IMDbParser, COMPILED_STRATEGIES
+from scripts.imdb_fixtures import FixtureStore
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def load_inputs(store):
+    """([(season, page html)], [(season, graphql body)]) from the successful fixtures"""
+    pages, graphql = [], []
+    for fixture in store:
+        if fixture["status"] != 200:
+            continue
+        text = fixture["body"].decode(fixture.get("encoding") or 'utf-8', errors='replace')
+        if fixture["method"] == "GET":
+            season = urllib.parse.parse_qs(urllib.parse.urlparse(fixture["url"]).query).get("season", ["?"])[0]
+            pages.append((season, text))
+        elif fixture["method"] == "POST" and fixture.get("request_body"):
+            season = json.loads(fixture["request_body"]).get("variables", {}).get("seasonNumber", "?")
+            graphql.append((season, text))
+    return pages, graphql
+
+def bench(name, parse, inputs, repeat):
+    """Fastest of `repeat` passes of parse(season, data) over inputs; parse returns the episodes found"""
+    best = None
+    episodes = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        episodes = sum(len(parse(season, data)) for season, data in inputs)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {"name": name, "inputs": len(inputs), "episodes": episodes, "seconds": best}
+
+def run(repeat=5):
+    pages, graphql = load_inputs(FixtureStore())
+    parser = IMDbParser()
+    results = []
+
+    if pages:
+        parsing = bench("html.parser", lambda season, html: [BeautifulSoup(html, 'html.parser')], pages, repeat)
+        #builds the soup, finds no episodes
+        parsing["episodes"] = None
+        results.append(parsing)
+        soups = [(season, BeautifulSoup(html, 'html.parser')) for season, html in pages]
+        results.append(bench(
+            "JSON-LD",
+            lambda season, soup: [parser._json_ld_episode_info(ep, season)
+                                  for ep in next(parser._json_ld_episode_lists(soup), [])],
+            soups, repeat))
+        for strategy in COMPILED_STRATEGIES:
+            results.append(bench(
+                strategy.name,
+                lambda season, soup, strategy=strategy: parser._parse_html_strategy(soup, strategy, season),
+                soups, repeat))
+    if graphql:
+        results.append(bench(
+            "GraphQL",
+            lambda season, body: [parser._graphql_episode_info(edge["node"], idx, season)
+                                  for idx, edge in enumerate(parser._graphql_edges(json.loads(body)))],
+            graphql, repeat))
+    return results
+
+def main():
+    """Command line interface: benchmark every parser against the recorded fixtures"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the IMDb parsers against recorded fixtures')
+    parser.add_argument('--repeat', type=int, default=5, help='passes per parser, the fastest is reported')
+    parser.add_argument('--verbose', action='store_true', help="keep the scraper's own logging on (it is part of the cost)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("scripts.get_imdb_rating").setLevel(logging.WARNING)
+    results = run(max(1, args.repeat))
+    if not results:
+        print(f"No fixtures in {FixtureStore().directory}, record some first:")
+        print("  python scripts/imdb_fixtures.py record")
+        sys.exit(1)
+
+    print(f"\n{'parser':<26} {'inputs':>6} {'episodes':>8} {'total ms':>9} {'ms/input':>9} {'inputs/s':>9} {'episodes/s':>10}")
+    for result in results:
+        seconds = max(result["seconds"], 1e-9)
+        episodes = result["episodes"]
+        print(f"{result['name']:<26} {result['inputs']:>6} {'-' if episodes is None else episodes:>8} {seconds * 1000:>9.2f} "
+              f"{seconds * 1000 / result['inputs']:>9.2f} {result['inputs'] / seconds:>9.1f} "
+              f"{'-' if episodes is None else f'{episodes / seconds:.0f}':>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Boolean keyword queries over the keyword index
+
+    kramer AND (bagel OR muffin) NOT elaine
+
+Operands are anything parse_query understands on its own (words, "quoted
+phrases", a NEAR/k b, speaker:name before an operand). Operators are the
+uppercase words AND, OR and NOT plus parentheses; NOT binds tightest, then
+AND, then OR, and operands written next to each other are ANDed.
+
+A query is parsed into a tree of Nodes, compiled into a plan that orders
+every AND cheapest-first (by doc frequency, negations last) and executed
+on the index's doc bitmaps. Each step only looks at the docs that survived
+the steps before it and an AND stops as soon as its bitmap is empty.
+"""
+
+import re
+import sys
+import logging
+from collections import namedtuple
+from pathlib import Path
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.keyword_index import parse_query, bitmap_docs
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#op is "leaf" (clause set), "and", "or" or "not"
+Node = namedtuple("Node", ["op", "children", "clause"], defaults=((), None))
+
+OPERAND = r'"[^"]*"|[^\s,"()]+\s+NEAR(?:/\d+)?\s+[^\s,"()]+|[^\s,"()]+'
+TOKEN_PATTERN = re.compile(
+    r'\s*(?:([()])|(AND|OR|NOT)(?=[\s()",]|$)|((?i:speaker):(?:"[^"]*"|[^\s,"()]+)\s+(?:' + OPERAND + r')|' + OPERAND + r')|,)')
+
+def tokenize_query(query_str):
+    """Split a query into '(' / ')' / operator / operand tokens as (kind, text) pairs"""
+    tokens = []
+    pos = 0
+    while pos < len(query_str):
+        match = TOKEN_PATTERN.match(query_str, pos)
+        if not match or match.end() == pos:
+            #whitespace or a character no token starts with
+            pos += 1
+            continue
+        paren, operator, operand = match.groups()
+        if paren:
+            tokens.append(("paren", paren))
+        elif operator:
+            tokens.append(("op", operator))
+        elif operand:
+            tokens.append(("operand", operand))
+        pos = match.end()
+    return tokens
+
+def is_boolean_query(tokens):
+    return any(kind in ("op", "paren") for kind, _ in tokens)
+
+class QueryParser:
+    """Recursive descent over the token list; unbalanced parentheses are tolerated"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def advance(self):
+        self.pos += 1
+
+    def parse(self):
+        node = None
+        while self.pos < len(self.tokens):
+            expr = self.parse_or()
+            if expr is not None:
+                node = expr if node is None else Node("and", (node, expr))
+            if self.peek() == ("paren", ")"):
+                #stray closing parenthesis
+                self.advance()
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ("op", "OR"):
+            self.advance()
+            children.append(self.parse_and())
+        children = [child for child in children if child is not None]
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else Node("or", tuple(children))
+
+    def parse_and(self):
+        children = []
+        while True:
+            kind, value = self.peek()
+            if kind is None or (kind, value) in (("op", "OR"), ("paren", ")")):
+                break
+            if (kind, value) == ("op", "AND"):
+                self.advance()
+                continue
+            child = self.parse_unary()
+            if child is not None:
+                children.append(child)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else Node("and", tuple(children))
+
+    def parse_unary(self):
+        kind, value = self.peek()
+        self.advance()
+        if (kind, value) == ("op", "NOT"):
+            child = self.parse_unary()
+            return Node("not", (child,)) if child is not None else None
+        if (kind, value) == ("paren", "("):
+            node = self.parse_or()
+            if self.peek() == ("paren", ")"):
+                self.advance()
+            return node
+        if kind == "operand":
+            clauses = parse_query(value)
+            return Node("leaf", clause=clauses[0]) if clauses else None
+        return None
+
+def parse_boolean(query_str):
+    """Query tree for a boolean query, None when the query uses no operators or parentheses"""
+    tokens = tokenize_query(query_str)
+    if not is_boolean_query(tokens):
+        return None
+    return QueryParser(tokens).parse()
+
+def map_leaves(node, fn):
+    """Copy of the tree with fn applied to every leaf clause"""
+    if node.op == "leaf":
+        return node._replace(clause=fn(node.clause))
+    return node._replace(children=tuple(map_leaves(child, fn) for child in node.children))
+
+def positive_clauses(node):
+    """Leaf clauses that aren't negated, in query order and without duplicates (these get scored)"""
+    clauses = []
+    seen = set()
+
+    def walk(current):
+        if current.op == "not":
+            return
+        if current.op == "leaf":
+            if current.clause.label not in seen:
+                seen.add(current.clause.label)
+                clauses.append(current.clause)
+            return
+        for child in current.children:
+            walk(child)
+
+    walk(node)
+    return clauses
+
+def estimate_cost(index, node):
+    """Rough number of docs a node can match, used to order AND children"""
+    if node.op == "leaf":
+        return index.clause_cost(node.clause)
+    if node.op == "and":
+        positive = [estimate_cost(index, child) for child in node.children if child.op != "not"]
+        return min(positive) if positive else len(index.docs)
+    if node.op == "or":
+        return sum(estimate_cost(index, child) for child in node.children)
+    return len(index.docs)
+
+def compile_plan(index, node):
+    """
+    Execution plan for a query tree
+
+    Nested ANDs/ORs are flattened, AND children are ordered cheapest first
+    with negations after every positive operand, and OR children largest
+    first so later operands only check the docs not matched yet.
+    """
+    if node.op == "leaf":
+        return node
+    children = []
+    for child in node.children:
+        child = compile_plan(index, child)
+        if child.op == node.op and node.op in ("and", "or"):
+            children.extend(child.children)
+        else:
+            children.append(child)
+    if node.op == "and":
+        children.sort(key=lambda child: (child.op == "not", estimate_cost(index, child)))
+    elif node.op == "or":
+        children.sort(key=lambda child: estimate_cost(index, child), reverse=True)
+    return node._replace(children=tuple(children))
+
+def execute(index, plan, allowed=None):
+    """Bitmap of the docs matching a compiled plan, within the `allowed` bitmap"""
+    universe = allowed if allowed is not None else (1 << len(index.docs)) - 1
+    if plan.op == "leaf":
+        return index.clause_bitmap(plan.clause, universe)
+    if plan.op == "not":
+        return universe & ~execute(index, plan.children[0], universe)
+    if plan.op == "and":
+        result = universe
+        for child in plan.children:
+            #each operand only has to look at the docs still in the running
+            if child.op == "not":
+                result &= ~execute(index, child.children[0], result)
+            else:
+                result &= execute(index, child, result)
+            if not result:
+                return 0
+        return result
+    result = 0
+    for child in plan.children:
+        result |= execute(index, child, universe & ~result)
+        if result == universe:
+            break
+    return result
+
+def explain(plan):
+    """Readable form of a plan, in execution order"""
+    if plan.op == "leaf":
+        return plan.clause.label
+    if plan.op == "not":
+        return f"NOT {explain(plan.children[0])}"
+    joined = f" {plan.op.upper()} ".join(explain(child) for child in plan.children)
+    return f"({joined})"
+
+def main():
+    """Command line interface: print the plan and matching episodes for a query"""
+    import argparse
+    import time
+    from scripts.keyword_index import get_index
+
+    parser = argparse.ArgumentParser(description='Run a boolean keyword query')
+    parser.add_argument('query', type=str, help='e.g. kramer AND (bagel OR muffin) NOT elaine')
+    args = parser.parse_args()
+
+    tree = parse_boolean(args.query)
+    if tree is None:
+        print("Not a boolean query (no AND/OR/NOT or parentheses)")
+        sys.exit(1)
+    index = get_index()
+    started = time.perf_counter()
+    plan = compile_plan(index, tree)
+    matches = execute(index, plan)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"\nPlan: {explain(plan)}")
+    print(f"{bin(matches).count('1')} episodes in {elapsed:.3f} ms")
+    for doc_id in bitmap_docs(matches):
+        print(f"  {index.docs[doc_id]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Build compact per-episode digests for the LLM prompts
+
+Each paragraph in data/seinfeld_descriptions.txt is reduced to a short,
+length-capped line of key people, locations and plot beats (plus the main
+speakers from the matching script when one is available). The digests are
+written to data/episode_digests.json together with a version and a hash of
+the descriptions they were built from, so stale digests are never used.
+"""
+
+import re
+import sys
+import json
+import hashlib
+import logging
+from collections import Counter
+from pathlib import Path
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.find_episode_by_keywords import load_script_files
+from scripts.episode_titles import PART_PATTERN, split_title
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+DATA_DIR = Path(__file__).parent.parent / "data"
+DESCRIPTIONS_FILE = DATA_DIR / "seinfeld_descriptions.txt"
+DIGESTS_FILE = DATA_DIR / "episode_digests.json"
+#bump whenever the digest format changes so old files are rebuilt
+DIGEST_VERSION = 3
+DIGEST_MAX_CHARS = 280
+MAX_ENTITIES = 6
+MAX_LOCATIONS = 3
+
+FILLER_WORDS = {'a', 'an', 'the', 'that', 'which', 'who', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+                'very', 'really', 'just', 'also', 'then', 'meanwhile', 'however', 'so', 'his', 'her', 'their', 'its'}
+NON_ENTITIES = {'The', 'A', 'An', 'He', 'She', 'They', 'It', 'His', 'Her', 'When', 'Meanwhile', 'After', 'But',
+                'And', 'While', 'Season', 'Episode', 'Then', 'This', 'In', 'On', 'At', 'I', 'Part'}
+LOCATION_TERMS = ['coffee shop', "monk's", 'apartment', 'restaurant', 'office', 'parking garage', 'car', 'hospital',
+                  'airport', 'hotel', 'movie theater', 'bakery', 'store', 'diner', 'subway', 'bar', 'club', 'gym',
+                  'beach', 'street', 'elevator', 'bathroom', 'party', 'wedding', 'funeral', 'museum', 'library']
+SPEAKER_PATTERN = re.compile(r"^([A-Z][A-Z .'\-]{1,20}):", re.MULTILINE)
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+#"The Contest - Jerry and George..." (title, then a dash, then the description); no
+#sentence end before the dash, apart from the "Pt." of a part marker
+PARAGRAPH_TITLE_PATTERN = re.compile(r"((?:[^.!?]|(?<=\b[Pp]t)\.){1,80}?)\s+[-\u2013\u2014]\s+")
+
+def hash_text(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def split_descriptions(descriptions):
+    """Split the descriptions file into per-episode paragraphs (same split as find_episode)"""
+    return re.split(r'\r?\n\s*\r?\n', descriptions.strip())
+
+def match_script(season, paragraph, scripts_by_season):
+    """
+    Return the (title, script path) for a paragraph body, if any
+
+    A paragraph that starts with its title ("The Contest - ...") only
+    matches a script with that title (a bare title counts as part 1).
+    Otherwise the first script title mentioned anywhere in it is used.
+    """
+    candidates = scripts_by_season.get(season, {})
+    lead = paragraph_title(paragraph)
+    if lead:
+        base, part = split_title(lead)
+        for title, script_path in candidates.items():
+            script_base, script_part = split_title(title)
+            if script_base == base and (script_part or 1) == (part or 1):
+                return title, script_path
+        #a title with no script of its own, not "the soup" mentioned in passing
+        return None, None
+    paragraph_lower = paragraph.lower()
+    #prefer the longest title so "The Soup Nazi" wins over "The Soup"
+    for title in sorted(candidates, key=len, reverse=True):
+        base_title = title.split('(')[0].strip().lower()
+        if base_title and base_title in paragraph_lower:
+            return title, candidates[title]
+    return None, None
+
+def paragraph_title(body):
+    """Title leading a description paragraph body, if it has one"""
+    match = PARAGRAPH_TITLE_PATTERN.match(body)
+    return match.group(1).strip() if match else None
+
+def top_speakers(script_path, limit=MAX_ENTITIES):
+    try:
+        with open(script_path, 'r', encoding='utf-8') as f:
+            speakers = Counter(m.group(1).strip().title() for m in SPEAKER_PATTERN.finditer(f.read()))
+        return [name for name, _ in speakers.most_common(limit)]
+    except Exception as e:
+        logger.debug(f"Could not read speakers from {script_path}: {e}")
+        return []
+
+def extract_entities(text, exclude=()):
+    words = re.findall(r"\b[A-Z][a-zA-Z'\-]+", text)
+    words = [w[:-2] if w.endswith("'s") else w for w in words]
+    counts = Counter(w for w in words if w not in NON_ENTITIES and w not in exclude)
+    return [name for name, _ in counts.most_common(MAX_ENTITIES)]
+
+def extract_locations(text):
+    text_lower = text.lower()
+    found = [term for term in LOCATION_TERMS if re.search(rf"\b{re.escape(term)}\b", text_lower)]
+    return found[:MAX_LOCATIONS]
+
+def compress_sentence(sentence):
+    words = [w for w in sentence.split() if w.lower().strip(',;') not in FILLER_WORDS]
+    return " ".join(words).rstrip('.!?;,')
+
+def build_digest(paragraph, scripts_by_season):
+    """Turn one description paragraph into a dense digest line"""
+    match = re.match(r"Season (\d+):\s*(.*)", paragraph, re.DOTALL)
+    season, body = (match.group(1), match.group(2)) if match else (None, paragraph)
+    body = re.sub(r'\s+', ' ', body).strip()
+
+    title, script_path = match_script(season, body, scripts_by_season) if season else (None, None)
+    lead = PARAGRAPH_TITLE_PATTERN.match(body)
+    if not title and lead:
+        #no script for this episode, use the title the paragraph starts with
+        title = lead.group(1).strip()
+    title_words = set()
+    if title:
+        #the title is already in the digest header, don't spend budget repeating it
+        part_marker = PART_PATTERN.search(title.lower())
+        base_title = title[:part_marker.start()].strip() if part_marker else title
+        title_words = set(base_title.split())
+        if lead:
+            #title, part marker and separator: everything before the dash
+            body = body[lead.end():]
+        else:
+            body = re.sub(rf"^{re.escape(base_title)}\s*[-:,]?\s*", "", body, flags=re.IGNORECASE)
+    entities = extract_entities(body, exclude=title_words)
+    if script_path:
+        for speaker in top_speakers(script_path):
+            if speaker not in entities:
+                entities.append(speaker)
+    entities = entities[:MAX_ENTITIES]
+    locations = extract_locations(body)
+
+    parts = [f"Season {season}: {title}" if season and title else (f"Season {season}:" if season else "")]
+    if entities:
+        parts.append("who: " + ", ".join(entities))
+    if locations:
+        parts.append("where: " + ", ".join(locations))
+    digest = " | ".join(p for p in parts if p)
+
+    #fill the remaining budget with compressed plot beats
+    beats = []
+    for sentence in SENTENCE_SPLIT.split(body):
+        beat = compress_sentence(sentence)
+        if not beat:
+            continue
+        if len(digest) + len(" | plot: ") + len("; ".join(beats + [beat])) > DIGEST_MAX_CHARS:
+            break
+        beats.append(beat)
+    if beats:
+        digest += " | plot: " + "; ".join(beats)
+    elif body:
+        digest += " | plot: " + body[:max(0, DIGEST_MAX_CHARS - len(digest) - 9)]
+    return digest[:DIGEST_MAX_CHARS]
+
+def build_digests(descriptions_file=DESCRIPTIONS_FILE, digests_file=DIGESTS_FILE):
+    """Build digests for every description paragraph and save them to digests_file"""
+    descriptions_file = Path(descriptions_file)
+    digests_file = Path(digests_file)
+    if not descriptions_file.exists():
+        logger.error("Descriptions file not found. Run seinfeld_scraper.py first")
+        return None
+    descriptions = descriptions_file.read_text(encoding='utf-8')
+    paragraphs = split_descriptions(descriptions)
+
+    scripts_by_season = {}
+    for episode_key, script_path in load_script_files().items():
+        match = re.match(r"Season (\d+): (.*)", episode_key)
+        if match:
+            scripts_by_season.setdefault(match.group(1), {})[match.group(2)] = script_path
+
+    digests = [build_digest(p, scripts_by_season) for p in paragraphs]
+    raw_chars = sum(len(p) for p in paragraphs)
+    digest_chars = sum(len(d) for d in digests)
+    logger.info(f"Built {len(digests)} digests: {raw_chars} -> {digest_chars} chars "
+                f"({digest_chars / max(raw_chars, 1):.0%} of the raw descriptions)")
+
+    payload = {
+        "version": DIGEST_VERSION,
+        "source_hash": hash_text(descriptions),
+        "max_chars": DIGEST_MAX_CHARS,
+        "digests": digests,
+    }
+    digests_file.parent.mkdir(exist_ok=True)
+    with open(digests_file, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=1)
+    logger.info(f"Saved digests to {digests_file}")
+    return digests
+
+def load_digests(descriptions, digests_file=DIGESTS_FILE):
+    """Load digests aligned with the description paragraphs
+
+    Returns None when the digest file is missing, from another format
+    version, or was built from different descriptions.
+    """
+    digests_file = Path(digests_file)
+    if not digests_file.exists():
+        return None
+    try:
+        with open(digests_file, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load digests: {e}")
+        return None
+    if payload.get("version") != DIGEST_VERSION or payload.get("source_hash") != hash_text(descriptions):
+        logger.warning("Episode digests are stale, run scripts/build_digests.py to rebuild them")
+        return None
+    return payload.get("digests")
+
+def main():
+    """Command line interface for building digests"""
+    digests = build_digests()
+    if digests:
+        print(f"\nBuilt {len(digests)} digests. Sample:\n")
+        for digest in digests[:3]:
+            print(digest)
+
+if __name__ == "__main__":
+    main()
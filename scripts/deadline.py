@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Request-scoped deadlines for outbound calls
+
+backend/app.py starts a deadline for every request. Like the timing spans,
+it lives in a context variable, so it follows the request into the IMDb
+worker threads (they run in a copy of the request context). Every outbound
+call asks ``call_timeout(cap)`` for its timeout. That is its own cap cut
+down to what is left of the request budget, and ``DeadlineExceeded`` once
+too little is left to be worth starting. ``with_retries`` (and
+``with_retries_async`` for coroutines) retries transient failures with
+jittered exponential backoff, but only while another attempt still fits in
+the budget.
+
+Code that gives up on part of an answer because time ran out calls
+``mark_degraded(reason)``. The endpoint then returns what it has, flagged as
+degraded, and the answer is not cached. Without a deadline (CLI, scripts)
+calls just use their caps.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+#whole-request budget, well under the gunicorn worker timeout
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+#not worth opening a connection with less than this left
+MIN_CALL_SECONDS = 0.25
+RETRY_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_CAP_SECONDS = 2.0
+
+_current_deadline = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """Not enough of the request budget left for another outbound call"""
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+        #reasons parts of the answer were dropped, in order
+        self.degraded = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, cap: float) -> float:
+        remaining = self.remaining()
+        if remaining < MIN_CALL_SECONDS:
+            raise DeadlineExceeded(f"{remaining:.2f}s left of the request budget")
+        return min(cap, remaining)
+
+def start_deadline(seconds=REQUEST_DEADLINE_SECONDS) -> Deadline:
+    """Start the budget for the current request"""
+    deadline = Deadline(seconds)
+    _current_deadline.set(deadline)
+    return deadline
+
+def stop_deadline() -> Optional[Deadline]:
+    deadline = _current_deadline.get()
+    _current_deadline.set(None)
+    return deadline
+
+def get_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+def narrow_deadline(expires: float) -> Deadline:
+    """
+    Cut the budget of the current context to `expires` (time.monotonic())
+
+    For work that has a tighter deadline than the request it belongs to.
+    Degraded reasons still land on the request's deadline.
+    """
+    current = _current_deadline.get()
+    if current is not None:
+        expires = min(expires, current.expires)
+    deadline = Deadline(expires - time.monotonic())
+    if current is not None:
+        deadline.degraded = current.degraded
+    _current_deadline.set(deadline)
+    return deadline
+
+def call_timeout(cap: float) -> float:
+    """Timeout for the next outbound call: cap, cut to the remaining request budget"""
+    deadline = _current_deadline.get()
+    return cap if deadline is None else deadline.timeout(cap)
+
+def mark_degraded(reason: str):
+    """Record that part of the answer was dropped to stay within the deadline"""
+    logger.warning(f"Degraded answer: {reason}")
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.degraded.append(reason)
+
+def is_degraded() -> bool:
+    deadline = _current_deadline.get()
+    return bool(deadline and deadline.degraded)
+
+def with_retries(call: Callable[[float], object], cap: float, retryable: Callable[[Exception], bool],
+                 attempts: int = RETRY_ATTEMPTS, name: str = "call"):
+    """
+    call(timeout) with up to `attempts` tries
+
+    Failures for which retryable(error) is true are retried after a full
+    jitter backoff, unless the sleep plus another call would not fit in
+    the remaining budget. The last error is raised, as DeadlineExceeded if
+    the budget is spent.
+    """
+    for attempt in range(attempts):
+        timeout = call_timeout(cap)
+        try:
+            return call(timeout)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            time.sleep(retry_delay(e, attempt, attempts, retryable, name))
+
+async def with_retries_async(call: Callable[[float], Awaitable], cap: float, retryable: Callable[[Exception], bool],
+                             attempts: int = RETRY_ATTEMPTS, name: str = "call"):
+    """with_retries for a coroutine function: await call(timeout), backing off without blocking the loop"""
+    for attempt in range(attempts):
+        timeout = call_timeout(cap)
+        try:
+            return await call(timeout)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            await asyncio.sleep(retry_delay(e, attempt, attempts, retryable, name))
+
+def retry_delay(error: Exception, attempt: int, attempts: int, retryable: Callable[[Exception], bool],
+                name: str) -> float:
+    """Backoff before retrying a failed attempt, or raise if it shouldn't be retried"""
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.remaining() < MIN_CALL_SECONDS:
+        #most likely timed out because the budget ran out, report it as such
+        raise DeadlineExceeded(f"{name} failed with the request budget spent: {error}") from error
+    if attempt == attempts - 1 or not retryable(error):
+        raise error
+    delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if deadline is not None and deadline.remaining() - delay < MIN_CALL_SECONDS:
+        raise error
+    logger.info(f"{name} failed ({error}), retry {attempt + 1} of {attempts - 1} in {delay:.2f}s")
+    return delay
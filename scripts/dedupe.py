@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate script detection with MinHash and LSH
+
+The download lists file some pages under more than one season (The
+Masseuse and The Hamptons each appear twice), so data/scripts
+holds near-identical copies that inflate the corpus and double-count in
+keyword rankings.
+
+Each script becomes a set of word shingles with the download header
+stripped, since the copies differ in their Season: line. Each set gets a
+MinHash signature of NUM_PERMUTATIONS minimums. The permutations are
+"xor a random mask, multiply by a random odd number mod 2**64", which is
+a bijection, vectorized over all shingles with NumPy. The signatures are
+cut into LSH_BANDS bands. Only scripts that share a whole band are
+compared, and each such candidate pair is confirmed with the exact
+Jaccard similarity of the two shingle sets. The work is roughly linear in
+the number of scripts instead of comparing every pair.
+
+Confirmed pairs are merged into clusters. pack_corpus keeps one copy of
+each cluster, the first key in sorted order, and records the other keys
+as its aliases.
+
+    python scripts/dedupe.py     list the duplicate clusters in data/scripts
+"""
+
+import re
+import sys
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.tokenizer import tokenize_text
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16
+#rows per band; pairs above about (1 / LSH_BANDS) ** (1 / LSH_ROWS) = 0.71 similarity become candidates
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+DUPLICATE_THRESHOLD = 0.9
+#fixed seed so the same corpus always dedupes the same way
+MINHASH_SEED = 1729
+HEADER_PATTERN = re.compile(r"^(Title|Season|URL|Downloaded):", re.IGNORECASE)
+
+_rng = np.random.default_rng(MINHASH_SEED)
+PERMUTATION_MASKS = _rng.integers(0, 2 ** 64, NUM_PERMUTATIONS, dtype=np.uint64)
+#odd, so multiplication mod 2**64 is invertible
+PERMUTATION_MULTIPLIERS = _rng.integers(0, 2 ** 64, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+
+def shingles(text):
+    """Set of hashed word SHINGLE_SIZE-grams of a script, download header lines left out"""
+    words = []
+    for line in text.split("\n"):
+        if not HEADER_PATTERN.match(line):
+            words.extend(tokenize_text(line))
+    if len(words) < SHINGLE_SIZE:
+        words += [""] * (SHINGLE_SIZE - len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8'), digest_size=8).digest(), 'little')
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def minhash_signature(shingle_set):
+    """NUM_PERMUTATIONS minimums, one per permutation of the 64-bit shingle hashes"""
+    hashes = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    #uint64 arithmetic wraps, which is exactly the mod 2**64 we want
+    with np.errstate(over='ignore'):
+        permuted = (hashes[:, None] ^ PERMUTATION_MASKS[None, :]) * PERMUTATION_MULTIPLIERS[None, :]
+    return permuted.min(axis=0)
+
+def lsh_candidates(signatures):
+    """Pairs of keys whose signatures agree on at least one whole band"""
+    candidates = set()
+    for band in range(LSH_BANDS):
+        buckets = {}
+        rows = slice(band * LSH_ROWS, (band + 1) * LSH_ROWS)
+        for key, signature in signatures.items():
+            buckets.setdefault(signature[rows].tobytes(), []).append(key)
+        for bucket in buckets.values():
+            for i in range(len(bucket)):
+                for j in range(i + 1, len(bucket)):
+                    candidates.add((bucket[i], bucket[j]))
+    return candidates
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def find_duplicates(texts, threshold=DUPLICATE_THRESHOLD):
+    """
+    Group near-identical scripts
+
+    `texts` maps episode key -> script text. Returns {canonical key:
+    sorted alias keys} for every cluster with more than one member, the
+    canonical key being the first in sorted order.
+    """
+    shingle_sets = {key: shingles(text) for key, text in texts.items()}
+    signatures = {key: minhash_signature(shingle_set) for key, shingle_set in shingle_sets.items()}
+    candidates = sorted(tuple(sorted(pair)) for pair in lsh_candidates(signatures))
+
+    #union-find over the confirmed pairs
+    parent = {key: key for key in texts}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    confirmed = 0
+    for a, b in candidates:
+        if jaccard(shingle_sets[a], shingle_sets[b]) >= threshold:
+            confirmed += 1
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for key in sorted(texts):
+        clusters.setdefault(find(key), []).append(key)
+    logger.info(f"Dedupe: {len(candidates)} LSH candidate pairs, {confirmed} confirmed near-duplicates")
+    return {members[0]: members[1:] for members in clusters.values() if len(members) > 1}
+
+def main():
+    """Command line interface: list the duplicate clusters in data/scripts"""
+    from scripts.find_episode_by_keywords import load_script_files
+
+    texts = {}
+    for key, path in load_script_files().items():
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            texts[key] = f.read()
+    duplicates = find_duplicates(texts)
+    print(f"\n{len(duplicates)} scripts with duplicates among {len(texts)}")
+    for canonical, aliases in sorted(duplicates.items()):
+        print(f"  {canonical}  <-  {', '.join(aliases)}")
+
+if __name__ == "__main__":
+    main()
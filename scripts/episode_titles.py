@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Normalized episode title -> IMDb episode map
+
+Title lookups used to scan a season listing for the first episode whose
+title contained the query, so "The Pilot" also matched "The Pilot (Part 2)".
+When that failed, the keyword search scraped the season again with the
+parenthesised part stripped. TitleIndex resolves a title with one dict
+lookup instead, across the whole show. A script filed under the wrong
+season (the download list has a few) still finds its episode.
+
+Titles are normalized by lowercasing, dropping accents, punctuation and a
+leading "the", and rewriting part markers ("(1)", "(Part 1)", "Pt. 1",
+": Part One") to " part N". A two-parter that IMDb lists under one title
+is numbered in airing order. Its bare title is an alias for part 1.
+
+The map is built from season listings, whichever client fetched them, and
+saved to data/imdb_titles.json, so it survives restarts.
+
+    python scripts/episode_titles.py build            list all seasons and save the map
+    python scripts/episode_titles.py "The Pilot (1)"  resolve a title
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Optional, Tuple
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+TITLE_INDEX_PATH = Path(__file__).parent.parent / "data" / "imdb_titles.json"
+PART_WORDS = {"one": 1, "two": 2, "three": 3, "i": 1, "ii": 2, "iii": 3}
+#a part marker at the end of a title: "(1)", "(Part 1)", "(Pt. 2)", ": Part One", "- Part II", "Pt. 2"
+PART_PATTERN = re.compile(
+    r"\s*(?:\(\s*(?:(?:part|pt)\.?\s*)?(\d+|one|two|three|i{1,3})\s*\)"
+    r"|[:,\-]?\s*\b(?:part|pt)\.?\s*(\d+|one|two|three|i{1,3}))\s*$"
+)
+IMDB_ID_PATTERN = re.compile(r"/title/(tt\d+)")
+
+def split_title(title: str) -> Tuple[str, Optional[int]]:
+    """(normalized title without its part marker, part number or None)"""
+    text = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii").lower()
+    text = re.sub(r"['`]", "", text).replace("&", " and ")
+    part = None
+    match = PART_PATTERN.search(text)
+    if match:
+        value = match.group(1) or match.group(2)
+        part = int(value) if value.isdigit() else PART_WORDS[value]
+        text = text[:match.start()]
+    words = re.findall(r"[a-z0-9]+", text)
+    if len(words) > 1 and words[0] == "the":
+        words = words[1:]
+    return " ".join(words), part
+
+def title_key(base: str, part: Optional[int]) -> str:
+    return f"{base} part {part}" if part else base
+
+def normalize_title(title: str) -> str:
+    return title_key(*split_title(title))
+
+def listing_entry(result: dict) -> Optional[dict]:
+    """Map entry for one episode from a season listing, None if it has no usable number"""
+    season, episode = str(result.get('season', '')), str(result.get('episode', ''))
+    if not (season.isdigit() and episode.isdigit() and result.get('title')):
+        return None
+    match = IMDB_ID_PATTERN.search(result.get('imdb_url') or "")
+    return {
+        "season": int(season),
+        "episode": int(episode),
+        "title": result['title'],
+        "imdb_id": match.group(1) if match else None,
+    }
+
+class TitleIndex:
+    """Normalized title -> IMDb episode entries ({season, episode, title, imdb_id}) for the whole show"""
+
+    def __init__(self, entries=()):
+        #(season, episode) -> entry, the source of truth the lookup dicts are derived from
+        self.entries = {}
+        self.titles = {}
+        self.aliases = {}
+        self._lock = threading.Lock()
+        self.add(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entries) -> int:
+        """Add or update entries, returns how many changed"""
+        with self._lock:
+            changed = 0
+            for entry in entries:
+                key = (entry["season"], entry["episode"])
+                if self.entries.get(key) != entry:
+                    self.entries[key] = entry
+                    changed += 1
+            if changed:
+                self._rebuild()
+            return changed
+
+    def _rebuild(self):
+        groups = {}
+        for key in sorted(self.entries):
+            entry = self.entries[key]
+            base, part = split_title(entry["title"])
+            groups.setdefault((entry["season"], base), []).append((part, entry))
+
+        titles, aliases = {}, {}
+        for (_, base), parts in groups.items():
+            if len(parts) > 1 and all(part is None for part, _ in parts):
+                #a two-parter listed under one title, number it in airing order
+                parts = [(number, entry) for number, (_, entry) in enumerate(parts, 1)]
+            for part, entry in parts:
+                titles.setdefault(title_key(base, part), []).append(entry)
+            numbered = [(part, entry) for part, entry in parts if part is not None]
+            if numbered:
+                aliases.setdefault(base, []).append(min(numbered, key=lambda item: item[0])[1])
+        #swap whole dicts so lookups never see a half-built map
+        self.titles, self.aliases = titles, aliases
+
+    def resolve(self, title: str, season=None) -> Optional[dict]:
+        """
+        Entry for an episode title, None if the map doesn't have it
+
+        A title held by episodes in several seasons resolves to the one in
+        `season` if there is one.
+        """
+        base, part = split_title(title)
+        candidates = self.titles.get(title_key(base, part))
+        if not candidates and part is None:
+            #the bare title of a two-parter is its first part
+            candidates = self.aliases.get(base)
+        if not candidates and part is not None:
+            #"The Pilot (1)" when IMDb lists a single "The Pilot"
+            candidates = self.titles.get(base)
+        if not candidates:
+            return None
+        for entry in candidates:
+            if season is not None and str(entry["season"]) == str(season):
+                return entry
+        return candidates[0]
+
+    def to_json(self) -> list:
+        return [self.entries[key] for key in sorted(self.entries)]
+
+def save_title_index(index: TitleIndex, path=TITLE_INDEX_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index.to_json(), f, indent=1)
+    os.replace(tmp_path, path)
+
+def load_title_index(path=TITLE_INDEX_PATH) -> TitleIndex:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return TitleIndex(json.load(f))
+    except FileNotFoundError:
+        return TitleIndex()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable title map {path}: {e}")
+        return TitleIndex()
+
+_title_index = None
+_title_index_lock = threading.Lock()
+
+def get_title_index() -> TitleIndex:
+    """Process-wide title map, loaded from data/imdb_titles.json on first use"""
+    global _title_index
+    if _title_index is not None:
+        return _title_index
+    with _title_index_lock:
+        if _title_index is None:
+            _title_index = load_title_index()
+        return _title_index
+
+def learn_titles(results) -> int:
+    """Add a season listing (get_episode_rating dicts) to the map and save it if anything changed"""
+    index = get_title_index()
+    changed = index.add(entry for entry in map(listing_entry, results) if entry)
+    if changed:
+        try:
+            save_title_index(index)
+        except OSError as e:
+            logger.warning(f"Could not save title map: {e}")
+    return changed
+
+def main():
+    """Command line interface: build the title map from IMDb, or resolve a title"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the normalized IMDb title map')
+    parser.add_argument('title', help='"build" to list every season and save the map, otherwise a title to resolve')
+    parser.add_argument('--season', type=int, help='preferred season for titles used in several')
+    args = parser.parse_args()
+
+    if args.title == 'build':
+        from scripts.imdb_async import refresh_ratings
+
+        #listing a season feeds the map as a side effect
+        refresh_ratings()
+        print(f"{len(get_title_index())} episodes in {TITLE_INDEX_PATH}")
+        return
+    entry = get_title_index().resolve(args.title, args.season)
+    print(f"{normalize_title(args.title)!r} -> {entry}")
+    if entry is None:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
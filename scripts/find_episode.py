@@ -2,8 +2,10 @@ import os
 import re
 import sys
 import json
+import time
 import logging
 import hashlib
+import threading
 from pathlib import Path
 import together
 from dotenv import load_dotenv
@@ -15,6 +17,10 @@ if __name__ == "__main__":
     sys.path.insert(0, str(project_root))
 
 from scripts.get_imdb_rating import get_rating
+from scripts.build_digests import load_digests
+from scripts.index_manager import current_version
+from scripts.timing import span, timed
+from scripts.deadline import DeadlineExceeded, with_retries, mark_degraded, is_degraded
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +28,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+#models used for matching
+LARGE_MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+SMALL_MODEL = "meta-llama/Llama-3.2-3B-Instruct-Turbo"
+NO_MATCH = "No matching episodes found."
+STOP_SEQUENCES = ["[INST]", "INSTRUCTIONS:", "Your response:"]
+
+#cascade mode: the small model sees the top prefiltered candidates first and
+#the 70B model is only called when its answer can't be trusted
+CASCADE_MODE = os.getenv('CASCADE_MODE', 'false').lower() in ('1', 'true', 'yes')
+CASCADE_TOP_K = int(os.getenv('CASCADE_TOP_K', '8'))
+#digests are much shorter than the raw paragraphs so more fit in one prompt
+DIGEST_CHUNK_SIZE = 24
+DIGEST_FALLBACK_CHUNK_SIZE = 16
+#running totals so the escalation thresholds can be tuned from the logs
+CASCADE_STATS = {"queries": 0, "escalations": 0, "small_seconds": 0.0, "large_seconds": 0.0}
+
+CLEANUP_PATTERNS = [
+    r'INSTRUCTIONS:.*?(?=Season|\n\n|$)',
+    r'Your response:.*?(?=Season|\n\n|$)',
+    r'\[INST\].*?\[/INST\]',
+    r'Task: Find matching.*?(?=Season|\n\n|$)',
+    r'EPISODE DESCRIPTIONS:.*?(?=Season|\n\n|$)',
+    r'SCENE TO MATCH:.*?(?=Season|\n\n|$)',
+    r'^\d+\.\s*.*?(?=Season|\n\n|$)',
+    r'^Format matches.*?(?=Season|\n\n|$)',
+    r'^Return ONLY.*?(?=Season|\n\n|$)',
+    r'^If no.*?(?=Season|\n\n|$)',
+    r'^No explanations.*?(?=Season|\n\n|$)'
+]
+
+#transport timeout of each Together call (cut further to what is left of the request deadline)
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '20'))
+#transient statuses worth another try
+LLM_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+EPISODE_REF_PATTERN = re.compile(r'(?:Season\s*(\d+).*?Episode\s*(\d+)|S(\d+)E(\d+))')
+
 def get_cache_key(scene_description):
     return hashlib.md5(scene_description.lower().strip().encode()).hexdigest()
 
@@ -45,6 +88,7 @@ def save_to_cache(scene_description, result):
     with open(cache_file, 'w') as f:
         json.dump(cache, f)
 
+@timed("prefilter")
 def prefilter_episodes(scene_description, episodes):
     stop_words = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'shall', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'}
     
@@ -106,16 +150,164 @@ def load_descriptions():
         logger.error(f"Failed to load descriptions: {e}")
         return None
 
-def find_episode(scene_description, test_mode=False):
+def load_description_store():
+    """(descriptions, digests) from the installed index version, or from data/ when there is none
+
+    Taken once per request so a hot swap mid-request can't mix two versions.
+    """
+    version = current_version()
+    if version is not None and version.descriptions:
+        return version.descriptions, version.digests
+    descriptions = load_descriptions()
+    return descriptions, load_digests(descriptions) if descriptions else None
+
+def clean_model_output(raw_text):
+    """Strip echoed prompt fragments from a completion, NO_MATCH if nothing is left"""
+    text = raw_text
+    for pattern in CLEANUP_PATTERNS:
+        text = re.sub(pattern, '', text, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
+
+    text = re.sub(r'\n\s*\n+', '\n', text).strip()
+
+    if not text or text.lower().strip() == NO_MATCH.lower():
+        text = NO_MATCH
+    return text
+
+_together_client = None
+_together_client_lock = threading.Lock()
+
+def get_together_client():
+    """Process-wide Together client, retries are left to with_retries so they respect the deadline"""
+    global _together_client
+    if _together_client is None:
+        with _together_client_lock:
+            if _together_client is None:
+                _together_client = together.Together(api_key=os.getenv('TOGETHER_API_KEY'), max_retries=0)
+    return _together_client
+
+def is_retryable_llm_error(error):
+    #a timed out call was aborted by the client, so trying again doesn't leave one running
+    if isinstance(error, together.APIConnectionError):
+        return True
+    return isinstance(error, together.APIStatusError) and error.status_code in LLM_RETRY_STATUSES
+
+def complete_prompt(prompt, model, **params):
+    """Run a single Together completion and return the cleaned text"""
+    def call(timeout):
+        #the timeout goes to the HTTP client, a call that runs over is closed rather than left running
+        return get_together_client().completions.create(
+            prompt=prompt,
+            model=model,
+            stop=STOP_SEQUENCES,
+            timeout=timeout,
+            **params
+        )
+
+    with span("llm", description=model):
+        try:
+            output = with_retries(call, LLM_TIMEOUT_SECONDS, is_retryable_llm_error, name=f"Together {model}")
+        except (together.APITimeoutError, DeadlineExceeded) as e:
+            mark_degraded(f"{model} did not answer in time: {str(e) or 'timed out'}")
+            raise
+
+    #log raw output for debugging
+    logger.info(f"Raw API output ({model}): {output}")
+    if output and output.choices:
+        raw_text = (output.choices[0].text or "").strip()
+        logger.info(f"Raw extracted text: '{raw_text}'")
+        text = clean_model_output(raw_text)
+        logger.info(f"Cleaned extracted text: '{text}'")
+        return text
+
+    logger.warning("No choices in API response")
+    return NO_MATCH
+
+def build_prompt(chunk, scene_description):
+    return f"""[INST] Task: Find matching Seinfeld episodes based on a scene description.
+EPISODE DESCRIPTIONS:
+{chunk}
+SCENE TO MATCH:
+{scene_description}
+INSTRUCTIONS:
+1. Return ONLY matching episode numbers and names
+2. If no matches found, respond: "No matching episodes found."
+3. Format matches as "Season X Episode Y: Title"
+4. No explanations or additional text
+
+                Your response: [/INST]"""
+
+def check_small_model_answer(text, candidates):
+    """Decide whether the small model's answer can be trusted
+
+    Returns None if the answer is usable, otherwise the reason to escalate:
+    "empty", "malformed" or "inconsistent" (points at an episode that isn't
+    among the prefiltered candidates it was shown).
+    """
+    if not text or text == NO_MATCH:
+        return "empty"
+
+    match = EPISODE_REF_PATTERN.search(text)
+    if not match:
+        return "malformed"
+
+    season = match.group(1) or match.group(3)
+    title = text[match.end():].split('\n')[0].lstrip(' :-').strip().lower()
+    season_candidates = [c.lower() for c in candidates if c.startswith(f"Season {season}:")]
+    if not season_candidates:
+        return "inconsistent"
+    if title and not any(title in c for c in season_candidates):
+        return "inconsistent"
+    return None
+
+def run_cascade_stage(scene_description, relevant_episodes):
+    """Ask the small model about the top-ranked candidates
+
+    Returns the small model's answer, or None when the query has to be
+    escalated to the large model.
+    """
+    candidates = relevant_episodes[:CASCADE_TOP_K]
+    CASCADE_STATS["queries"] += 1
+
+    started = time.perf_counter()
+    try:
+        text = complete_prompt(
+            build_prompt("\n\n".join(candidates), scene_description),
+            SMALL_MODEL,
+            max_tokens=128,
+            temperature=0.3,
+            top_p=0.7,
+        )
+    except Exception as e:
+        logger.error(f"Cascade small model request failed: {e}")
+        text = NO_MATCH
+    small_seconds = time.perf_counter() - started
+    CASCADE_STATS["small_seconds"] += small_seconds
+
+    reason = check_small_model_answer(text, candidates)
+    if reason:
+        CASCADE_STATS["escalations"] += 1
+
+    escalation_rate = CASCADE_STATS["escalations"] / CASCADE_STATS["queries"]
+    logger.info(
+        f"Cascade small stage: {small_seconds * 1000:.0f}ms over {len(candidates)} candidates, "
+        f"{'escalating (' + reason + ')' if reason else 'accepted'}; "
+        f"escalation rate {escalation_rate:.1%} over {CASCADE_STATS['queries']} queries"
+    )
+    return None if reason else text
+
+def find_episode(scene_description, test_mode=False, cascade=None):
     """Find seinfeld episode based on scene description
     
     Args:
         scene_description (str): The scene to search for
         test_mode (bool, optional): If True, skips descriptions to avoid token limit. Defaults to False.
+        cascade (bool, optional): Try the small model on the top candidates before the 70B model.
+            Defaults to the CASCADE_MODE env setting.
     """
     try:
         cache_key = get_cache_key(scene_description)
-        cache = load_cache()
+        with span("cache"):
+            cache = load_cache()
         
         if cache_key in cache:
             logger.info("Returning cached result")
@@ -125,10 +317,11 @@ def find_episode(scene_description, test_mode=False):
             logger.error("TOGETHER_API_KEY not found in .env")
             return None
             
-        logger.info("Configuring Together.ai API")
-        together.api_key = api_key
+        if cascade is None:
+            cascade = CASCADE_MODE
         
         #test mode
+        cascade_text = None
         if test_mode:
             logger.info("Running in test mode - bypassing episode descriptions")
             if "jerry" in scene_description.lower() and "car" in scene_description.lower():
@@ -137,113 +330,91 @@ def find_episode(scene_description, test_mode=False):
                 return result
             chunks = ["TEST_MODE_ACTIVE"]
         else:
-            descriptions = load_descriptions()
+            with span("descriptions"):
+                descriptions, stored_digests = load_description_store()
             if not descriptions:
                 return None
             episode_chunks = re.split(r'\r?\n\s*\r?\n', descriptions.strip())
             
             relevant_episodes = prefilter_episodes(scene_description, episode_chunks)
             logger.info(f"Prefiltered to {len(relevant_episodes)} relevant episodes from {len(episode_chunks)} total")
-              #use batch processing for efficiency
+            
+            #use batch processing for efficiency
             chunk_size = 12
+            #swap raw paragraphs for their compact digests when they are up to date
+            digests = stored_digests
+            if digests and len(digests) == len(episode_chunks):
+                digest_by_episode = dict(zip(episode_chunks, digests))
+                raw_chars = sum(len(ep) for ep in relevant_episodes)
+                relevant_episodes = [digest_by_episode[ep] for ep in relevant_episodes]
+                chunk_size = DIGEST_CHUNK_SIZE
+                logger.info(f"Using episode digests: {raw_chars} -> {sum(len(ep) for ep in relevant_episodes)} prompt chars")
+            
+            if cascade and relevant_episodes:
+                cascade_text = run_cascade_stage(scene_description, relevant_episodes)
             chunks = [relevant_episodes[i:i + chunk_size] for i in range(0, len(relevant_episodes), chunk_size)]
         
         all_matches = []
+        if cascade_text:
+            all_matches.append(cascade_text)
+            chunks = []
+
+        large_started = time.perf_counter()
         for chunk_episodes in chunks:
             if test_mode and chunk_episodes == ["TEST_MODE_ACTIVE"]:
                 break
-            
+
             chunk = "\n\n".join(chunk_episodes)
-            
-            prompt = f"""[INST] Task: Find matching Seinfeld episodes based on a scene description.
-EPISODE DESCRIPTIONS:
-{chunk}
-SCENE TO MATCH:
-{scene_description}
-INSTRUCTIONS:
-1. Return ONLY matching episode numbers and names
-2. If no matches found, respond: "No matching episodes found."
-3. Format matches as "Season X Episode Y: Title"
-4. No explanations or additional text
+            prompt = build_prompt(chunk, scene_description)
 
-                Your response: [/INST]"""
-            
             logger.info(f"Generating content for batch of {len(chunk_episodes)} episodes")
-            
+
             try:
-                output = together.Complete.create(
-                    prompt=prompt,
-                    model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
+                text = complete_prompt(
+                    prompt,
+                    LARGE_MODEL,
                     max_tokens=256,
                     temperature=0.5,
-                    stop=["[INST]", "INSTRUCTIONS:", "Your response:"],
                 )
-                
-                #log raw output for debugging
-                logger.info(f"Raw API output: {output}")
-                if output and 'output' in output and output['output']['choices']:
-                    raw_text = output['output']['choices'][0]['text'].strip()
-                    logger.info(f"Raw extracted text: '{raw_text}'")
-                    
-                    text = raw_text
-                    
-                    cleanup_patterns = [
-                        r'INSTRUCTIONS:.*?(?=Season|\n\n|$)',
-                        r'Your response:.*?(?=Season|\n\n|$)',
-                        r'\[INST\].*?\[/INST\]',
-                        r'Task: Find matching.*?(?=Season|\n\n|$)',
-                        r'EPISODE DESCRIPTIONS:.*?(?=Season|\n\n|$)',
-                        r'SCENE TO MATCH:.*?(?=Season|\n\n|$)',
-                        r'^\d+\.\s*.*?(?=Season|\n\n|$)',
-                        r'^Format matches.*?(?=Season|\n\n|$)',
-                        r'^Return ONLY.*?(?=Season|\n\n|$)',
-                        r'^If no.*?(?=Season|\n\n|$)',
-                        r'^No explanations.*?(?=Season|\n\n|$)'
-                    ]
-                    
-                    for pattern in cleanup_patterns:
-                        text = re.sub(pattern, '', text, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-                    
-                    text = re.sub(r'\n\s*\n+', '\n', text).strip()
-                    
-                    if not text or text.lower().strip() == "no matching episodes found.":
-                        text = "No matching episodes found."
-                    
-                    logger.info(f"Cleaned extracted text: '{text}'")
-                else:
-                    text = "No matching episodes found."
-                    logger.warning("No choices in API response")
-                    
+            except DeadlineExceeded:
+                break
             except Exception as e:
                 logger.error(f"Together API request failed: {e}")
-                text = "No matching episodes found."
-            
-            if text != "No matching episodes found.":
+                text = NO_MATCH
+
+            if text != NO_MATCH:
                 confidence_indicators = ["exact", "clearly", "definitely", "obviously"]
                 if any(indicator in text.lower() for indicator in confidence_indicators):
                     logger.info("High confidence match found, stopping search")
                     all_matches.append(text)
                     break
                 all_matches.append(text)
-                break       
+                break
+        if cascade and chunks and not test_mode:
+            large_seconds = time.perf_counter() - large_started
+            CASCADE_STATS["large_seconds"] += large_seconds
+            logger.info(f"Cascade large stage: {large_seconds * 1000:.0f}ms")
         logger.info(f"all_matches: {all_matches}")
         if not all_matches:
-            final_result = "No matching episodes found."
+            final_result = NO_MATCH
         else:
             text = "\n".join(all_matches)
             logger.info(f"Combined text: '{text}'")
             
             #if no matches with prefiltered episodes, try all episodes
-            if text == "No matching episodes found." and not test_mode:
+            if text == NO_MATCH and not test_mode:
                 logger.info("No matches found with prefiltered episodes. Trying with all episodes...")
                 
-                descriptions = load_descriptions()
                 if descriptions:
                     all_episode_chunks = re.split(r'\r?\n\s*\r?\n', descriptions.strip())
                     logger.info(f"Trying with all {len(all_episode_chunks)} episodes")
                     
                     #use smaller chunks for all episodes
                     chunk_size = 8
+                    digests = stored_digests
+                    if digests and len(digests) == len(all_episode_chunks):
+                        all_episode_chunks = digests
+                        chunk_size = DIGEST_FALLBACK_CHUNK_SIZE
                     all_chunks = [all_episode_chunks[i:i + chunk_size] for i in range(0, len(all_episode_chunks), chunk_size)]
                     
                     fallback_matches = []
@@ -269,53 +440,21 @@ INSTRUCTIONS:
                         logger.info(f"Fallback: Generating content for batch of {len(chunk_episodes)} episodes")
                         
                         try:
-                            fallback_output = together.Complete.create(
-                                prompt=fallback_prompt,
-                                model="meta-llama/Llama-3.2-3B-Instruct-Turbo",
+                            fallback_text = complete_prompt(
+                                fallback_prompt,
+                                SMALL_MODEL,
                                 max_tokens=128,
                                 temperature=0.3,
-                                top_p=0.7,                                stop=["[INST]", "INSTRUCTIONS:", "Your response:"],
+                                top_p=0.7,
                             )
-                            
-                            logger.info(f"Fallback raw API output: {fallback_output}")
-                            
-                            if fallback_output and 'output' in fallback_output and fallback_output['output']['choices']:
-                                raw_fallback_text = fallback_output['output']['choices'][0]['text'].strip()
-                                logger.info(f"Fallback raw extracted text: '{raw_fallback_text}'")
-                                
-                                fallback_text = raw_fallback_text
-                                
-                                cleanup_patterns = [
-                                    r'INSTRUCTIONS:.*?(?=Season|\n\n|$)',
-                                    r'Your response:.*?(?=Season|\n\n|$)',
-                                    r'\[INST\].*?\[/INST\]',
-                                    r'Task: Find matching.*?(?=Season|\n\n|$)',
-                                    r'EPISODE DESCRIPTIONS:.*?(?=Season|\n\n|$)',
-                                    r'SCENE TO MATCH:.*?(?=Season|\n\n|$)',
-                                    r'^\d+\.\s*.*?(?=Season|\n\n|$)',
-                                    r'^Format matches.*?(?=Season|\n\n|$)',
-                                    r'^Return ONLY.*?(?=Season|\n\n|$)',
-                                    r'^If no.*?(?=Season|\n\n|$)',
-                                    r'^No explanations.*?(?=Season|\n\n|$)'
-                                ]
-                                
-                                for pattern in cleanup_patterns:
-                                    fallback_text = re.sub(pattern, '', fallback_text, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-                                
-                                fallback_text = re.sub(r'\n\s*\n+', '\n', fallback_text).strip()
-                                
-                                if not fallback_text or fallback_text.lower().strip() == "no matching episodes found.":
-                                    fallback_text = "No matching episodes found."
-                                
-                                logger.info(f"Fallback cleaned text: '{fallback_text}'")
-                                
-                                if fallback_text != "No matching episodes found.":
-                                    fallback_matches.append(fallback_text)
-                                    logger.info("Found match in fallback search, stopping")
-                                    break
-                            else:
-                                logger.warning("No choices in fallback API response")
-                                
+
+                            if fallback_text != NO_MATCH:
+                                fallback_matches.append(fallback_text)
+                                logger.info("Found match in fallback search, stopping")
+                                break
+
+                        except DeadlineExceeded:
+                            break
                         except Exception as e:
                             logger.error(f"Fallback API request failed: {e}")
                             continue
@@ -324,7 +463,7 @@ INSTRUCTIONS:
                         text = "\n".join(fallback_matches)
                         logger.info(f"Fallback result: '{text}'")
               #try to parse season and episode numbers from response
-            ep_matches = re.finditer(r'(?:Season\s*(\d+).*?Episode\s*(\d+)|S(\d+)E(\d+))', text)
+            ep_matches = EPISODE_REF_PATTERN.finditer(text)
             enhanced_results = []
             
             #get only the first episode match from the llm output
@@ -339,21 +478,24 @@ INSTRUCTIONS:
                     rating_info = get_rating(int(season), int(episode))
                     
                     if rating_info:
-                        result_text = text 
-                        result_text += f"\nIMDb Rating: {rating_info.get('rating', 'N/A')}/10 ({rating_info.get('votes', 'N/A')} votes)"
-                        result_text += f"\nOriginal Air Date: {rating_info.get('air_date', 'N/A')}"
-                        if rating_info.get('image_url'):
-                            result_text += f"\nIMDb Image: {rating_info['image_url']}"
-                        if rating_info.get('imdb_url'):
-                            result_text += f"\nIMDb URL: {rating_info['imdb_url']}"
-                        enhanced_results.append(result_text)
+                        with span("format"):
+                            result_text = text 
+                            result_text += f"\nIMDb Rating: {rating_info.get('rating', 'N/A')}/10 ({rating_info.get('votes', 'N/A')} votes)"
+                            result_text += f"\nOriginal Air Date: {rating_info.get('air_date', 'N/A')}"
+                            if rating_info.get('image_url'):
+                                result_text += f"\nIMDb Image: {rating_info['image_url']}"
+                            if rating_info.get('imdb_url'):
+                                result_text += f"\nIMDb URL: {rating_info['imdb_url']}"
+                            enhanced_results.append(result_text)
             
             final_result = enhanced_results[0] if enhanced_results else text
         
         logger.info(f"Final result before return: '{final_result}'")
         
-        if final_result:
-            save_to_cache(scene_description, final_result)
+        #an answer cut short by the deadline is returned but not remembered
+        if final_result and not is_degraded():
+            with span("cache-save"):
+                save_to_cache(scene_description, final_result)
         
         return final_result
         
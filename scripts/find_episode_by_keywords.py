@@ -9,9 +9,10 @@ import logging
 import json
 from pathlib import Path
 import sys
-from collections import Counter
-import string
-from tqdm import tqdm
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
 
 #add project root to path if running as script
 if __name__ == "__main__":
@@ -20,6 +21,10 @@ if __name__ == "__main__":
 
 #import imdb rating function
 from scripts.get_imdb_rating import get_rating
+from scripts.timing import span
+from scripts.deadline import get_deadline, narrow_deadline, mark_degraded
+from scripts.keyword_index import bitmap_docs, get_index, parse_query, split_filters
+from scripts.boolean_query import parse_boolean, positive_clauses, map_leaves, compile_plan, execute, explain
 
 #setup logging
 logging.basicConfig(
@@ -31,6 +36,9 @@ logger = logging.getLogger(__name__)
 #constants
 SCRIPTS_DIR = Path(__file__).parent.parent / "data" / "scripts"
 TOP_RESULTS = 5
+#IMDb lookups for one request run on this many threads and must finish within the deadline
+IMDB_WORKERS = int(os.getenv("IMDB_WORKERS", "4"))
+IMDB_DEADLINE_SECONDS = float(os.getenv("IMDB_DEADLINE_SECONDS", "4"))
 
 def load_script_files():
     """
@@ -63,82 +71,119 @@ def load_script_files():
     logger.info(f"Loaded {len(script_files)} script files")
     return script_files
 
-def preprocess_text(text):
-    """
-    Preprocess text: lowercase, remove punctuation, extra whitespace
-    """
-    #convert to lowercase
-    text = text.lower()
-    #remove punctuation
-    translator = str.maketrans('', '', string.punctuation)
-    text = text.translate(translator)
-    #remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def tokenize(text):
-    """Tokenize preprocessed text into a list of words"""
-    return text.split()
-
-def parse_keywords(keywords_str):
-    """
-    Parse keywords string into a list of individual keywords
-    """
-    #split by commas and spaces
-    keywords = re.split(r'[,\s]+', keywords_str.lower())
-    
-    #remove empty strings and strip whitespace
-    keywords = [k.strip() for k in keywords if k.strip()]
-    
-    return keywords
+def match_snippets(index, result):
+    """Highlighted dialogue for a scored result, straight from the index line tables"""
+    with span("snippets"):
+        positions = sorted({p for _, clause_positions in result["matches"] for p in clause_positions})
+        terms = {term for clause, _ in result["matches"] for term in clause.terms}
+        return index.snippets(result["doc_id"], positions, terms)
+
+def format_snippet(snippet):
+    """One 'Dialogue:' line: context before / SPEAKER: match / context after"""
+    line = f"{snippet['speaker']}: {snippet['text']}" if snippet["speaker"] else snippet["text"]
+    return f"Dialogue (line {snippet['line']}): " + " / ".join(snippet["before"] + [line] + snippet["after"])
 
 def find_episodes_by_keywords(keywords_str, max_results=5):
     """
     Find episodes matching the given keywords
     
     Args:
-        keywords_str (str): Comma or space separated keywords
+        keywords_str (str): Comma or space separated keywords, "quoted phrases" or a NEAR/k b,
+            optionally with season:5-7 / flag:clip / -flag:clip / title:pilot filters (filters
+            alone list the episodes they allow). With AND/OR/NOT or
+            parentheses only episodes satisfying the boolean expression are returned
+            (see scripts/boolean_query.py)
         max_results (int): Maximum number of results to return
         
     Returns:
-        list: List of dictionaries with episode info and scores
+        list: Formatted result text for each episode
     """
-    #parse and preprocess keywords
-    keywords = parse_keywords(keywords_str)
-    if not keywords:
-        logger.warning("No valid keywords provided")
-        return []
-    logger.info(f"Searching for keywords: {', '.join(keywords)}")
+    return search_keywords(keywords_str, max_results)["results"]
 
-    #tokenize keywords for set operations
-    keyword_set = set(keywords)
+def search_keywords(keywords_str, max_results=5):
+    """
+    Keyword search that also reports how misspelled terms were expanded
 
-    #load script files
-    script_files = load_script_files()
-    if not script_files:
+    Returns a dict with "results" (formatted text, as find_episodes_by_keywords)
+    and "expansions" (original term -> vocabulary terms searched instead), plus
+    "error" when the query can't be run as written.
+    """
+    #season/catalog filters first, then keywords, quoted phrases and NEAR/k clauses
+    keywords_str, filters, filter_problems = split_filters(keywords_str)
+    if filter_problems:
+        #running without the filter would quietly widen the search
+        message = "; ".join(filter_problems)
+        logger.warning(f"Rejected filters: {message}")
+        return {"results": [], "expansions": {}, "error": message}
+    #AND/OR/NOT queries decide which episodes match; their operands are still scored below
+    tree = parse_boolean(keywords_str)
+    clauses = positive_clauses(tree) if tree else parse_query(keywords_str)
+    if tree and not clauses:
+        #"NOT soup" only says what to leave out, there is nothing to look for or score
+        message = "A boolean query needs at least one term that isn't negated, e.g. soup AND NOT kramer"
+        logger.warning(f"{message}: {keywords_str}")
+        return {"results": [], "expansions": {}, "error": message}
+    if not clauses and not filters:
+        logger.warning("No valid keywords provided")
+        return {"results": [], "expansions": {}}
+    if clauses:
+        logger.info(f"Searching for keywords: {', '.join(c.label for c in clauses)}")
+
+    #load (or build once per process) the positional index
+    with span("index-load"):
+        index = get_index()
+    if not index:
         logger.error("No script files found")
-        return []
+        return {"results": [], "expansions": {}}
+
+    #terms missing from the vocabulary are swapped for their closest spellings
+    with span("typo-expansion"):
+        clauses, expansions = index.expand_query(clauses)
+        if tree:
+            tree = map_leaves(tree, lambda clause: index.expand_clause(clause)[0])
+    if expansions:
+        logger.info(f"Expanded misspelled terms: {expansions}")
+
+    #docs allowed by the filters, as a bitmap ANDed into every clause
+    allowed = index.filter_bitmap(filters)
+    if allowed == 0:
+        logger.info(f"No episodes left after filters: {filters}")
+        return {"results": [], "expansions": expansions}
+
+    if tree:
+        with span("boolean-plan"):
+            plan = compile_plan(index, tree)
+            allowed = execute(index, plan, allowed)
+        logger.info(f"Boolean plan {explain(plan)} matched {bin(allowed).count('1')} episodes")
+        if not allowed:
+            return {"results": [], "expansions": expansions}
 
     results = {}
-
-    for episode_key, script_path in tqdm(script_files.items(), desc="Searching episodes"):
-        try:
-            with open(script_path, 'r', encoding='utf-8') as f:
-                script_content = f.read()
-            processed_content = preprocess_text(script_content)
-            tokens = tokenize(processed_content)
-            token_counts = Counter(tokens)
-            script_token_set = set(tokens)
-
-            # Find which keywords are present (set intersection)
-            matched_keywords = keyword_set & script_token_set
-            unique_keywords_matched = len(matched_keywords)
-            keyword_counts = {k: token_counts[k] for k in matched_keywords}
+    if not clauses:
+        #filters alone (e.g. title:parking-garage from the title suggestions) list the episodes they allow
+        for doc_id in bitmap_docs(allowed)[:max_results]:
+            results[index.docs[doc_id]] = {
+                "episode": index.docs[doc_id], "score": 0, "base_score": 0, "keyword_counts": {},
+                "matched_keywords": 0, "total_keywords": 0, "keywords_coverage": "0.0%",
+                "doc_id": doc_id, "matches": [],
+            }
+
+    with span("keyword-lookup", description=f"{len(clauses)} clauses"):
+        clause_matches = [(clause, index.evaluate(clause, allowed)) for clause in clauses]
+        matched_docs = set()
+        for _, matches in clause_matches:
+            matched_docs.update(matches)
+
+        for doc_id in sorted(matched_docs):
+            episode_key = index.docs[doc_id]
+            doc_matches = [(clause, matches[doc_id]) for clause, matches in clause_matches if doc_id in matches]
+            keyword_counts = {clause.label: len(positions) for clause, positions in doc_matches}
+            unique_keywords_matched = len(keyword_counts)
 
             # Score: prioritize number of unique keywords matched, then frequency
             base_score = sum(keyword_counts.values())
             keyword_diversity_bonus = unique_keywords_matched * 100
-            coverage_ratio = unique_keywords_matched / len(keyword_set)
+            coverage_ratio = unique_keywords_matched / len(clauses)
             coverage_bonus = int(coverage_ratio * 200)
             total_score = base_score + keyword_diversity_bonus + coverage_bonus
 
@@ -149,12 +194,11 @@ def find_episodes_by_keywords(keywords_str, max_results=5):
                     "base_score": base_score,
                     "keyword_counts": keyword_counts,
                     "matched_keywords": unique_keywords_matched,
-                    "total_keywords": len(keyword_set),
+                    "total_keywords": len(clauses),
                     "keywords_coverage": f"{coverage_ratio:.1%}",
-                    "script_path": str(script_path)
+                    "doc_id": doc_id,
+                    "matches": doc_matches,
                 }
-        except Exception as e:
-            logger.error(f"Error processing {script_path}: {e}")
 
     sorted_results = sorted(
         results.values(),
@@ -162,55 +206,115 @@ def find_episodes_by_keywords(keywords_str, max_results=5):
         reverse=True
     )
     
+    top_results = sorted_results[:max_results]
+    ratings = fetch_ratings(top_results)
+
     formatted_results = []
-    # Only process the #1 result for IMDb lookup if sorted_results is not empty
-    if sorted_results:
-        top_result = sorted_results[0] # Get the single best match
-        episode_key = top_result["episode"]
-        match = re.match(r"Season (\d+): (.*)", episode_key)
-        if match:
-            season_num = match.group(1)
-            episode_name = match.group(2)
-            rating_info = None # Initialize rating_info
-            try:
-                rating_info = get_rating(season_num, episode_name)
-                if not rating_info:
-                    # Attempt to get rating with a cleaned name if the first try fails
-                    base_name = episode_name.split('(')[0].strip()
-                    if base_name != episode_name:
-                        rating_info = get_rating(season_num, base_name)
-            except Exception as e:
-                logger.debug(f"Error fetching rating for {episode_key}: {e}")
-                # rating_info remains None or its last state
-            
-            entry = f"Season {season_num} Episode: {episode_name}"
-            matched_count = top_result["matched_keywords"]
-            total_count = top_result["total_keywords"]
-            coverage = top_result["keywords_coverage"]
-            entry += f"\nMatched {matched_count}/{total_count} keywords ({coverage} coverage)"
-            keyword_info = ", ".join([f"{k} ({v})" for k, v in top_result["keyword_counts"].items()])
-            entry += f"\nKeywords found: {keyword_info}"
-
-            if rating_info:
-                if "rating" in rating_info and "votes" in rating_info:
-                    entry += f"\nIMDb Rating: {rating_info['rating']}/10 ({rating_info['votes']} votes)"
-                if "air_date" in rating_info and rating_info["air_date"] and rating_info["air_date"] != "Unknown":
-                    entry += f"\nAir Date: {rating_info['air_date']}"
-                if "description" in rating_info and rating_info["description"] and rating_info["description"] != "N/A":
-                    entry += f"\nDescription: {rating_info['description']}"
-                if "image_url" in rating_info and rating_info["image_url"]:
-                    entry += f"\nIMDb Image: {rating_info['image_url']}"
-                if "imdb_url" in rating_info and rating_info["imdb_url"]:
-                    entry += f"\nIMDb URL: {rating_info['imdb_url']}"
-            formatted_results.append(entry)
-        
-        # If you still want to return a list of top N results (without further IMDb lookups for N>1):
-        # You can adapt the loop here to format the other top_results (sorted_results[1:max_results])
-        # but without calling get_rating for them.
-        # For now, it only returns the #1 result with its IMDb details.
-        # If no episodes were found by keywords, formatted_results will be empty.
+    with span("format"):
+        for result in top_results:
+            entry = format_result(index, result, ratings.get(result["episode"]), expansions)
+            if entry:
+                formatted_results.append(entry)
+    # If no episodes were found by keywords, formatted_results will be empty.
+    return {"results": formatted_results, "expansions": expansions}
+
+_imdb_executor = None
+_imdb_executor_lock = threading.Lock()
+
+def get_imdb_executor():
+    """Shared, bounded pool for IMDb lookups so concurrent requests can't pile up threads"""
+    global _imdb_executor
+    if _imdb_executor is None:
+        with _imdb_executor_lock:
+            if _imdb_executor is None:
+                _imdb_executor = ThreadPoolExecutor(max_workers=IMDB_WORKERS, thread_name_prefix="imdb")
+    return _imdb_executor
+
+def get_rating_by(deadline, season, episode):
+    """get_rating with every IMDb call inside it cut to `deadline`, not just to the request budget"""
+    narrow_deadline(deadline)
+    return get_rating(season, episode)
+
+def fetch_ratings(results, deadline=None):
+    """
+    IMDb info for every result, fetched concurrently
 
-    return formatted_results
+    Returns episode key -> rating info. Lookups still queued when the
+    deadline passes are cancelled, and running ones give up at the same
+    deadline, so they don't hold pool threads that later requests need.
+    Their results go without rating data instead of holding up the
+    response. The deadline is never later than the request's own.
+    """
+    if not results:
+        return {}
+    deadline = deadline if deadline is not None else time.monotonic() + IMDB_DEADLINE_SECONDS
+    request_deadline = get_deadline()
+    if request_deadline is not None:
+        deadline = min(deadline, request_deadline.expires)
+    executor = get_imdb_executor()
+    futures = {}
+    for result in results:
+        match = re.match(r"Season (\d+): (.*)", result["episode"])
+        if match:
+            #each lookup runs in a copy of this context so its timing spans land on this request
+            context = contextvars.copy_context()
+            #titles like "The Pilot (1)" resolve through the normalized title map, no retry needed
+            future = executor.submit(context.run, get_rating_by, deadline, match.group(1), match.group(2))
+            futures[future] = result["episode"]
+
+    with span("imdb-wait", description=f"{len(futures)} lookups"):
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        mark_degraded(f"IMDb deadline passed, {len(not_done)} of {len(futures)} results without ratings")
+
+    ratings = {}
+    for future in done:
+        try:
+            ratings[futures[future]] = future.result()
+        except Exception as e:
+            logger.debug(f"Error fetching rating for {futures[future]}: {e}")
+    return ratings
+
+def format_expansions(expansions):
+    return ", ".join(f"{term} → {' / '.join(corrections)}" for term, corrections in expansions.items())
+
+def format_result(index, result, rating_info, expansions=None):
+    """Text block for one result: episode, match stats, dialogue and whatever IMDb info arrived"""
+    match = re.match(r"Season (\d+): (.*)", result["episode"])
+    if not match:
+        return None
+    season_num = match.group(1)
+    episode_name = match.group(2)
+    entry = f"Season {season_num} Episode: {episode_name}"
+    if result["total_keywords"]:
+        matched_count = result["matched_keywords"]
+        total_count = result["total_keywords"]
+        coverage = result["keywords_coverage"]
+        entry += f"\nMatched {matched_count}/{total_count} keywords ({coverage} coverage)"
+        keyword_info = ", ".join([f"{k} ({v})" for k, v in result["keyword_counts"].items()])
+        entry += f"\nKeywords found: {keyword_info}"
+    aliases = index.aliases.get(result["episode"])
+    if aliases:
+        entry += f"\nAlso listed as: {', '.join(aliases)}"
+    if expansions:
+        entry += f"\nSpelling: {format_expansions(expansions)}"
+    for snippet in match_snippets(index, result):
+        entry += f"\n{format_snippet(snippet)}"
+
+    if rating_info:
+        if "rating" in rating_info and "votes" in rating_info:
+            entry += f"\nIMDb Rating: {rating_info['rating']}/10 ({rating_info['votes']} votes)"
+        if "air_date" in rating_info and rating_info["air_date"] and rating_info["air_date"] != "Unknown":
+            entry += f"\nAir Date: {rating_info['air_date']}"
+        if "description" in rating_info and rating_info["description"] and rating_info["description"] != "N/A":
+            entry += f"\nDescription: {rating_info['description']}"
+        if "image_url" in rating_info and rating_info["image_url"]:
+            entry += f"\nIMDb Image: {rating_info['image_url']}"
+        if "imdb_url" in rating_info and rating_info["imdb_url"]:
+            entry += f"\nIMDb URL: {rating_info['imdb_url']}"
+    return entry
 
 def main():
     """Command line interface for keyword search"""
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Flat, position-independent files of typed arrays
+
+A store is a small header, a section table and a JSON metadata block,
+followed by named arrays of fixed-width numbers laid out back to back:
+
+    header   magic (8 bytes), format version, section count, metadata length, byte order
+    table    section count x (name, typecode, offset, length)
+    metadata JSON
+    sections raw array bytes, each aligned to 8 bytes
+
+Nothing in the file is a pointer, so it can be mapped anywhere. Readers
+mmap it read-only and get memoryviews cast to the section's typecode
+straight out of the mapping. Every process that opens the same file
+shares one copy in the OS page cache instead of unpickling its own.
+"""
+
+import os
+import sys
+import mmap
+import json
+import struct
+from pathlib import Path
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIII1s3x")
+SECTION_ENTRY = struct.Struct("<16sc7xQQ")
+ALIGNMENT = 8
+BYTE_ORDERS = {"little": b"L", "big": b"B"}
+
+def write_store(path, magic, meta, sections):
+    """
+    Write `sections` ({name: array or bytes-like}) and `meta` to path atomically
+
+    Arrays and memoryviews keep their typecode, anything else is stored as
+    bytes ('B').
+    The file is written next to the target and renamed over it, so readers
+    that already mapped the old file keep a consistent view.
+    """
+    meta_bytes = json.dumps(meta).encode('utf-8')
+    entries = []
+    payloads = []
+    offset = HEADER.size + len(sections) * SECTION_ENTRY.size + len(meta_bytes)
+    for name, data in sections.items():
+        #array.array has .typecode, a (cast) memoryview has .format
+        typecode = getattr(data, "typecode", None) or getattr(data, "format", "B")
+        payload = data.tobytes() if hasattr(data, "tobytes") else bytes(data)
+        padding = -offset % ALIGNMENT
+        offset += padding
+        entries.append(SECTION_ENTRY.pack(name.encode('ascii'), typecode.encode('ascii'), offset, len(payload)))
+        payloads.append((padding, payload))
+        offset += len(payload)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    #pid in the name so concurrent builders don't clobber each other's temp file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(magic, FORMAT_VERSION, len(sections), len(meta_bytes), BYTE_ORDERS[sys.byteorder]))
+        f.write(b"".join(entries))
+        f.write(meta_bytes)
+        for padding, payload in payloads:
+            f.write(b"\0" * padding)
+            f.write(payload)
+    os.replace(tmp_path, path)
+    return offset
+
+class FlatStore:
+    """Read-only mapping of a file written by write_store"""
+
+    def __init__(self, path, magic):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        found_magic, version, count, meta_len, byte_order = HEADER.unpack_from(self._mmap, 0)
+        if found_magic != magic:
+            raise ValueError(f"{self.path} is not a {magic!r} store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has store format {version}, expected {FORMAT_VERSION}")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise ValueError(f"{self.path} was written on a machine with a different byte order")
+
+        self._view = memoryview(self._mmap)
+        self._sections = {}
+        for i in range(count):
+            name, typecode, offset, length = SECTION_ENTRY.unpack_from(self._mmap, HEADER.size + i * SECTION_ENTRY.size)
+            self._sections[name.rstrip(b"\0").decode('ascii')] = (typecode.decode('ascii'), offset, length)
+        meta_start = HEADER.size + count * SECTION_ENTRY.size
+        self.meta = json.loads(bytes(self._view[meta_start:meta_start + meta_len]).decode('utf-8'))
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def section(self, name):
+        """Zero-copy memoryview over one section, cast to its typecode"""
+        typecode, offset, length = self._sections[name]
+        view = self._view[offset:offset + length]
+        return view if typecode == "B" else view.cast(typecode)
+
+    def sections(self):
+        return {name: self.section(name) for name in self._sections}
+
+    def size(self):
+        return len(self._mmap)
@@ -5,9 +5,22 @@ import json
 from typing import Optional, Dict, Union, Tuple
 import requests
 from bs4 import BeautifulSoup, Tag, NavigableString
+import soupsieve
 import urllib.parse
 from datetime import datetime
 import sys
+import threading
+from pathlib import Path
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.timing import timed
+from scripts.http_cache import CachingAdapter
+from scripts.imdb_fixtures import FIXTURE_MODE, FixtureAdapter
+from scripts.deadline import DeadlineExceeded, with_retries, mark_degraded
+from scripts.episode_titles import get_title_index, learn_titles
 
 #setup logging for this script specifically
 logger = logging.getLogger(__name__)
@@ -30,6 +43,83 @@ logger = logging.getLogger(__name__)
 
 #seinfeld imdb id
 SEINFELD_IMDB_ID = "tt0098904"
+BASE_URL = "https://www.imdb.com"
+GRAPHQL_URL = f"{BASE_URL}/graphql"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+#connect/read timeout for every IMDb request, nothing may hang a worker forever
+#(inside a web request it is cut further to what is left of the request deadline)
+REQUEST_TIMEOUT_SECONDS = 10
+#transient statuses worth another try
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+SEASONS = range(1, 10)
+
+# Simple GraphQL query to get episode data
+EPISODES_QUERY = """
+query Episodes($titleId: ID!, $seasonNumber: Int!, $first: Int!) {
+    title(id: $titleId) {
+        episodes(season: $seasonNumber, first: $first) {
+            edges {
+                node {
+                    titleText {
+                        text
+                    }
+                    plot {
+                        plotText {
+                            plainText
+                        }
+                    }
+                    releaseDate {
+                        day
+                        month
+                        year
+                    }
+                    runtime {
+                        seconds
+                    }
+                    ratingsSummary {
+                        aggregateRating
+                        voteCount
+                    }
+                    primaryImage {
+                        url
+                    }
+                    id
+                }
+            }
+        }
+    }
+}
+"""
+
+#parsed season pages, url -> (cache validator, soup), reused while the cached body is unchanged
+_parsed_pages: Dict[str, Tuple[str, BeautifulSoup]] = {}
+_parsed_pages_lock = threading.Lock()
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code in RETRY_STATUSES
+
+def season_url(season: Union[int, str]) -> str:
+    return f"{BASE_URL}/title/{SEINFELD_IMDB_ID}/episodes?season={season}"
+
+def graphql_request(season: Union[int, str]) -> Tuple[dict, dict]:
+    """(headers, json payload) of the GraphQL episodes query for one season"""
+    if isinstance(season, str) and season.isdigit():
+        season = int(season)
+    headers = {
+        'User-Agent': USER_AGENT,
+        'Content-Type': 'application/json',
+        'Referer': f'{BASE_URL}/title/{SEINFELD_IMDB_ID}/episodes/',
+    }
+    payload = {
+        "operationName": "Episodes",
+        # Get up to 50 episodes
+        "variables": {"titleId": SEINFELD_IMDB_ID, "seasonNumber": season, "first": 50},
+        "query": EPISODES_QUERY
+    }
+    return headers, payload
 
 #parse air dates consistently
 def parse_air_date(date_str: Optional[str]) -> str:
@@ -74,6 +164,29 @@ def parse_air_date(date_str: Optional[str]) -> str:
     logger.warning(f"Could not parse date string: '{date_str}' (cleaned: '{cleaned_date_str}') with known formats.")
     return "Unknown"
 
+#shared by the extraction specs below
+RATING_FIELD = {"pattern": r"(\d(?:\.\d)?)", "default": "N/A"}
+#"(2.1K)", "2,100 votes" -> "2.1K", "2100"
+VOTES_FIELD = {"strip": r"[(),]|\s*votes", "pattern": r"([\d.,KkMmBbTt]+(?:\.\d[KkMmBbTt])?)", "default": "0"}
+EPISODE_LINK_PATTERN = re.compile(r"ep(\d+)")
+#resize parameters of an IMDb image URL, "...@._V1_QL75_UX280_CR0,0,280,158_.jpg"
+IMAGE_SIZE_PATTERN = re.compile(r"\._V1_[^/]*?(\.\w+)$")
+
+def high_res_image_url(src: str) -> str:
+    """Full size image for an img src or srcset: the first candidate without IMDb's resize parameters"""
+    return IMAGE_SIZE_PATTERN.sub(r"._V1_\1", src.strip().split(" ")[0])
+
+#Declarative extraction specs, one per page layout IMDb has served. Each field says where
+#its value lives in an episode block:
+#   selector   CSS selector, the first match inside the block is used
+#   attr       attribute to read instead of the text (several: the first one present)
+#   separator  joins the element's text nodes, "" runs them together
+#   strip      regex removed from the text before `pattern` is applied
+#   pattern    regex whose first group is the value
+#   parse      function applied to the value
+#   default    value when the block has no match
+#   required   blocks without a value are not episodes, skipped before any other field is selected
+#Specs are compiled once, at import (COMPILED_STRATEGIES below).
 HTML_PARSING_STRATEGIES = [
     {
         "name": "JSON-LD",        "type": "json-ld",
@@ -81,266 +194,513 @@ HTML_PARSING_STRATEGIES = [
     {
         "name": "H4AnchorSiblingStrategy",
         "type": "html",
+        #details are in the siblings after each h4, up to the next episode's h4
         "use_sibling_navigation": True,
         "episode_blocks_selector": "h4:has(a[href*='/title/tt'])",
-        "title_selector": "a",
-        "link_selector": "a",
-        "extract_image_src": lambda img_tag: img_tag.get('src') if img_tag else None,
-        "extract_rating": lambda rating_text_node: re.search(r'(\d+\.\d+|\d+)/10', rating_text_node.get_text(strip=True)).group(1) if rating_text_node and re.search(r'(\d+\.\d+|\d+)/10', rating_text_node.get_text(strip=True)) else 'N/A',
-        "extract_votes": lambda votes_text_node: re.search(r'\((\d[\d,.]*K?)\)', votes_text_node.get_text(strip=True)).group(1).replace('K', '000').replace(',', '') if votes_text_node and re.search(r'\((\d[\d,.]*K?)\)', votes_text_node.get_text(strip=True)) else '0',
+        "fields": {
+            "title": {"selector": "a", "default": "Unknown Title"},
+            "link": {"selector": "a", "attr": "href", "required": True},
+        },
+        "sibling_fields": {
+            "rating": {"selector": "span[aria-label*='IMDb rating'], span[class*='ratingGroup__imdb-rating']", **RATING_FIELD},
+            #searched in the rating's parent
+            "votes": {"selector": "span[class*='voteCount'], span[class*='TotalRatingAmount'], a[href*='ratings'], button[data-testid*='ratings-bar__vote-count'] span", **VOTES_FIELD},
+            "description": {"selector": "div.ipc-html-content-inner-div, div[data-testid='plot'], p.ipc-overflowText--children, div.ipc-overflowText", "separator": " "},
+            #searched in the h4's parent when no sibling has the plot
+            "description_fallback": {"selector": "div[data-testid='plot'], .ipc-html-content-inner-div", "separator": " "},
+        },
     },
     {
         "name": "ModernEpisodeCard",
         "type": "html",
         "episode_blocks_selector": "article[data-testid*='episode-card-list-item'], div[class*=EpisodeCard__container]",
-        "title_selector": "a[data-testid*='episode-title'], a.ipc-title-link-wrapper .ipc-title__text, h3.ipc-title__text",
-        "link_selector": "a[data-testid*='episode-title'], a.ipc-title-link-wrapper",
-        "image_selector": "figure[class*='EpisodeCard__imageContainer'] img, img.ipc-image",
-        "extract_image_src": lambda img_tag: img_tag.get('src') or img_tag.get('srcset', '').split(' ')[0] if img_tag else None,
-        "rating_selector": "div[class*='EpisodeCard__ratings'] span[aria-label*='IMDb rating'], span.ipc-rating-star[class*='ipc-rating-star--base']",
-        "extract_rating": lambda el: re.search(r'(\d\.\d|\d+)', el.text.strip()).group(1) if el and re.search(r'(\d\.\d|\d+)', el.text.strip()) else 'N/A',
-        "votes_selector": "div[class*='EpisodeCard__ratings'] span[class*='EpisodeCard__voteCount'], span[class*='ipc-rating-star--voteCount']",
-        "extract_votes": lambda el: re.sub(r'[^\d]', '', el.text.strip('()')) if el else '0',        "air_date_selector": "div[class*='EpisodeCard__releaseDateText'], div[class*='EpisodeCard__metadata'] span.ipc-metadata-list-summary-item__li",
-        "extract_air_date": lambda el: el.text.strip() if el else 'Unknown',
-        "description_selector": "div[class*='EpisodeCard__plot'] div[class*='ipc-html-content-inner-div'], div.ipc-metadata-list-summary-item__plot-description",
-        "extract_description": lambda el: el.text.strip() if el else 'N/A',
-        "episode_number_selector": "div[class*='EpisodeCard__episodeNumber'], div.ipc-title__text",
-        "extract_episode_number": lambda el: re.search(r'[Ee](\d+)', el.text.strip()).group(1) if el and re.search(r'[Ee](\d+)', el.text.strip()) else None,
+        "fields": {
+            "title": {"selector": "a[data-testid*='episode-title'], a.ipc-title-link-wrapper .ipc-title__text, h3.ipc-title__text", "default": "Unknown Title"},
+            "link": {"selector": "a[data-testid*='episode-title'], a.ipc-title-link-wrapper", "attr": "href", "required": True},
+            "image": {"selector": "figure[class*='EpisodeCard__imageContainer'] img, img.ipc-image", "attr": ("src", "srcset"), "parse": high_res_image_url, "default": "N/A"},
+            "rating": {"selector": "div[class*='EpisodeCard__ratings'] span[aria-label*='IMDb rating'], span.ipc-rating-star[class*='ipc-rating-star--base']", **RATING_FIELD},
+            "votes": {"selector": "div[class*='EpisodeCard__ratings'] span[class*='EpisodeCard__voteCount'], span[class*='ipc-rating-star--voteCount']", **VOTES_FIELD},
+            "air_date": {"selector": "div[class*='EpisodeCard__releaseDateText'], div[class*='EpisodeCard__metadata'] span.ipc-metadata-list-summary-item__li", "parse": parse_air_date, "default": "Unknown"},
+            "description": {"selector": "div[class*='EpisodeCard__plot'] div[class*='ipc-html-content-inner-div'], div.ipc-metadata-list-summary-item__plot-description", "separator": " ", "default": "N/A"},
+            #"S1.E5"
+            "episode_number": {"selector": "div[class*='EpisodeCard__episodeNumber'], div.ipc-title__text", "pattern": r"[Ee](\d+)"},
+        },
     },
     {
         "name": "ClassicEpisodeList",
         "type": "html",
         "episode_blocks_selector": "div.eplist-item, div.lister-item-content",
-        "title_selector": "a[itemprop='name']",
-        "link_selector": "a[itemprop='name']",
-        "image_selector": "img[itemprop='image']",
-        "extract_image_src": lambda img_tag: img_tag.get('src') if img_tag else None,
-        "rating_selector": "span[itemprop='ratingValue']",
-        "extract_rating": lambda el: el.text.strip() if el else 'N/A',
-        "votes_selector": "span[itemprop='ratingCount']",
-        "extract_votes": lambda el: el.text.strip() if el else '0',
-        "air_date_selector": "div.airdate",
-        "extract_air_date": lambda el: el.text.strip() if el else 'Unknown',
-        "description_selector": "div[itemprop='description']",
-        "extract_description": lambda el: el.text.strip() if el else 'N/A',
-        "episode_number_selector": "meta[itemprop='episodeNumber']",
-        "extract_episode_number": lambda el: el.get('content') if el else None,
+        "fields": {
+            "title": {"selector": "a[itemprop='name']", "default": "Unknown Title"},
+            "link": {"selector": "a[itemprop='name']", "attr": "href", "required": True},
+            "image": {"selector": "img[itemprop='image']", "attr": "src", "parse": high_res_image_url, "default": "N/A"},
+            "rating": {"selector": "span[itemprop='ratingValue']", **RATING_FIELD},
+            "votes": {"selector": "span[itemprop='ratingCount']", **VOTES_FIELD},
+            "air_date": {"selector": "div.airdate", "parse": parse_air_date, "default": "Unknown"},
+            "description": {"selector": "div[itemprop='description']", "separator": " ", "default": "N/A"},
+            "episode_number": {"selector": "meta[itemprop='episodeNumber']", "attr": "content", "pattern": r"(\d+)"},
+        },
     },
     {
         "name": "GeneralContentItem", # Fallback for less structured data
         "type": "html",
         "episode_blocks_selector": "div.ipc-metadata-list-summary-item", # A general item that might contain episode info
-        "title_selector": ".ipc-title__text", # Often used for titles
-        "link_selector": "a.ipc-title-link-wrapper", # Common link wrapper
-        "image_selector": "img.ipc-image", # General image selector
-        "extract_image_src": lambda img_tag: img_tag.get('src') or img_tag.get('srcset', '').split(' ')[0] if img_tag else None,
-        "rating_selector": "span.ipc-rating-star--base", # General rating star
-        "extract_rating": lambda el: re.search(r'(\d\.\d|\d+)', el.text.strip()).group(1) if el and re.search(r'(\d\.\d|\d+)', el.text.strip()) else 'N/A',
-        "votes_selector": "span.ipc-rating-star--voteCount", # General vote count
-        "extract_votes": lambda el: re.sub(r'[^\d]', '', el.text.strip('()')) if el else '0',
-        "air_date_selector": "span.ipc-metadata-list-summary-item__li", # List items often contain metadata like air dates
-        "extract_air_date": lambda el: el.text.strip() if el and (re.match(r'^\d{4}$', el.text.strip()) or re.match(r'^[A-Za-z]{3,}\s\d{1,2},?\s\d{4}$', el.text.strip()) or re.match(r'^\d{1,2}\s[A-Za-z]{3,}\s\d{4}$', el.text.strip())) else 'Unknown',
-        "description_selector": "div.ipc-html-content-inner-div", # Common for plot summaries
-        "extract_description": lambda el: el.text.strip() if el else 'N/A',
-        "episode_number_selector": None, # Hard to reliably get episode number from this general structure
-        "extract_episode_number": lambda el: None,
+        "fields": {
+            "title": {"selector": ".ipc-title__text", "default": "Unknown Title"}, # Often used for titles
+            "link": {"selector": "a.ipc-title-link-wrapper", "attr": "href", "required": True}, # Common link wrapper
+            "image": {"selector": "img.ipc-image", "attr": ("src", "srcset"), "parse": high_res_image_url, "default": "N/A"},
+            "rating": {"selector": "span.ipc-rating-star--base", **RATING_FIELD}, # General rating star
+            "votes": {"selector": "span.ipc-rating-star--voteCount", **VOTES_FIELD},
+            "air_date": {"selector": "span.ipc-metadata-list-summary-item__li", "parse": parse_air_date, "default": "Unknown"}, # List items often contain metadata like air dates
+            "description": {"selector": "div.ipc-html-content-inner-div", "separator": " ", "default": "N/A"}, # Common for plot summaries
+            # No episode number, hard to get reliably from this general structure
+        },
     }
 ]
 
-class SeinfelderIMDB:
+class CompiledField:
+    """One field of an extraction spec, selector and regexes compiled"""
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.selector = soupsieve.compile(spec["selector"])
+        attr = spec.get("attr")
+        self.attrs = (attr,) if isinstance(attr, str) else tuple(attr or ())
+        self.separator = spec.get("separator", "")
+        self.strip = re.compile(spec["strip"], re.IGNORECASE) if spec.get("strip") else None
+        self.pattern = re.compile(spec["pattern"]) if spec.get("pattern") else None
+        self.parse = spec.get("parse")
+        self.default = spec.get("default")
+        self.required = spec.get("required", False)
+
+    def _raw(self, element: Tag) -> Optional[str]:
+        if not self.attrs:
+            return element.get_text(separator=self.separator, strip=True)
+        for attr in self.attrs:
+            value = element.get(attr)
+            if value:
+                return value
+        return None
+
+    def column(self, elements: list) -> list:
+        """Field value for each element, each step run over the whole column; None elements (no match) get the default"""
+        values = [None if element is None else self._raw(element) for element in elements]
+        if self.strip is not None:
+            strip = self.strip.sub
+            values = [None if value is None else strip("", value) for value in values]
+        if self.pattern is not None:
+            search = self.pattern.search
+            values = [None if value is None else (match.group(1) if (match := search(value)) else None) for value in values]
+        if self.parse is not None:
+            parse = self.parse
+            values = [None if value is None else parse(value) for value in values]
+        return [value if value else self.default for value in values]
+
+    def value(self, element: Optional[Tag]):
+        return self.column([element])[0]
+
+class CompiledStrategy:
+    """An HTML_PARSING_STRATEGIES entry ready to run"""
+
+    def __init__(self, spec: dict):
+        self.name = spec["name"]
+        self.spec = spec
+        self.blocks = soupsieve.compile(spec["episode_blocks_selector"])
+        self.use_sibling_navigation = spec.get("use_sibling_navigation", False)
+        fields = [CompiledField(name, field) for name, field in spec["fields"].items()]
+        #required fields first, they decide which blocks the others are selected in
+        self.fields = sorted(fields, key=lambda field: not field.required)
+        self.sibling_fields = {name: CompiledField(name, field) for name, field in spec.get("sibling_fields", {}).items()}
+
+    def rows(self, blocks: list) -> Dict[int, dict]:
+        """
+        Block position -> {field name: value} for every block that has its required fields
+
+        Each field is extracted for all blocks at once, so its regexes and
+        parse run over one column of elements. Fields sharing a selector
+        (title and link, usually) select once per block.
+        """
+        rows = {position: {} for position in range(len(blocks))}
+        selected = [{} for _ in blocks]
+        for field in self.fields:
+            pattern = field.selector.pattern
+            positions = list(rows)
+            elements = []
+            for position in positions:
+                if pattern not in selected[position]:
+                    selected[position][pattern] = field.selector.select_one(blocks[position])
+                elements.append(selected[position][pattern])
+            for position, value in zip(positions, field.column(elements)):
+                if field.required and not value:
+                    del rows[position]
+                else:
+                    rows[position][field.name] = value
+        return rows
+
+COMPILED_STRATEGIES = [CompiledStrategy(spec) for spec in HTML_PARSING_STRATEGIES if spec["type"] == "html"]
+
+class IMDbParser:
+    """
+    Parsing half of the IMDb client
+
+    Turns GraphQL responses and season pages into episode dicts and knows
+    nothing about HTTP. Subclasses do the fetching: SeinfelderIMDB with a
+    blocking requests session, AsyncSeinfelderIMDB (imdb_async.py) with a
+    pooled async client.
+    """
+
     def __init__(self):
-        """init session"""
+        self.episodes_cache: Dict[Tuple[str, str], dict] = {}
+
+    def _graphql_edges(self, data: Optional[dict]) -> list:
+        if data and "data" in data and data["data"] and "title" in data["data"] and "episodes" in data["data"]["title"]:
+            return data["data"]["title"]["episodes"]["edges"] or []
+        return []
+
+    def _graphql_episode_info(self, node: dict, edge_index: int, season: Union[int, str]) -> dict:
+        # Format the output
+        episode_info = {
+            "title": node.get("titleText", {}).get("text", "Unknown"),
+            "rating": str(node.get("ratingsSummary", {}).get("aggregateRating", "N/A")),
+            "votes": str(node.get("ratingsSummary", {}).get("voteCount", 0)),
+            "image_url": node.get("primaryImage", {}).get("url"),
+            "imdb_url": f"https://www.imdb.com/title/{node.get('id')}/",
+            "episode_num": edge_index + 1 if edge_index != -1 else "Unknown",
+            "season_num": season,
+            "description": node.get("plot", {}).get("plotText", {}).get("plainText", "N/A")
+        }
+
+        # Build the air date
+        if "releaseDate" in node and node["releaseDate"]:
+            rd = node["releaseDate"]
+            # API gives month as 1-12, day as 1-31, year as YYYY
+            # Construct a date string that parse_air_date can handle, e.g., YYYY-MM-DD
+            if rd.get("year") is not None and rd.get("month") is not None and rd.get("day") is not None:
+                try:
+                    # Ensure month and day are two digits for consistent parsing
+                    date_str = f"{rd['year']}-{str(rd['month']).zfill(2)}-{str(rd['day']).zfill(2)}"
+                    episode_info["air_date"] = date_str # Will be parsed by parse_air_date later
+                except Exception as e_date:
+                    logger.warning(f"Could not construct date from API parts: {rd}, error: {e_date}")
+                    episode_info["air_date"] = "Unknown"
+            else:
+                episode_info["air_date"] = "Unknown"
+        else:
+            episode_info["air_date"] = "Unknown"
+        return episode_info
+
+    def _parse_graphql(self, data: Optional[dict], season: Union[int, str], episode_num: Union[int, str]) -> Optional[dict]:
+        """Episode by number from a GraphQL episodes response, None if it isn't in there"""
+        if isinstance(season, str) and season.isdigit():
+            season = int(season)
+        episodes = self._graphql_edges(data)
+        ep_num = int(episode_num)
+        if not 0 < ep_num <= len(episodes):
+            return None
+        episode_info = self._graphql_episode_info(episodes[ep_num - 1]["node"], ep_num - 1, season)
+        logger.info(f"Found episode via GraphQL API: {episode_info['title']}")
+        return episode_info
+
+    def _parse_html(self, soup: BeautifulSoup, season: Union[int, str], episode_identifier_to_find: Union[int, str]) -> Optional[dict]:
+        """Run the compiled HTML strategies over a season page until one finds the episode number"""
+        for strategy in COMPILED_STRATEGIES:
+            logger.info(f"Trying HTML parsing strategy: {strategy.name}")
+            episodes = self._parse_html_strategy(soup, strategy, season)
+            if not episodes:
+                logger.debug(f"No episodes found with selector: {strategy.spec['episode_blocks_selector']}")
+                continue
+
+            logger.info(f"Found {len(episodes)} episodes using strategy: {strategy.name}")
+            for episode_data in episodes:
+                if episode_data["episode_num"] == str(int(episode_identifier_to_find)):
+                    logger.info(f"Matched S{season}E{episode_identifier_to_find} -> '{episode_data['title']}' using strategy: {strategy.name}")
+                    return episode_data
+
+            logger.debug(f"Strategy {strategy.name} did not yield a match for S{season}E{episode_identifier_to_find}")
+
+        logger.error(f"All HTML parsing strategies failed for S{season}E{episode_identifier_to_find}. No episode blocks found or no matching episode identified.")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Final HTML snippet for season page (first 3000 chars): {soup.prettify()[:3000]}")
+        return None
+
+    def _sibling_details(self, block: Tag, strategy: CompiledStrategy, block_ids: set) -> dict:
+        """air_date, rating, votes and description from the siblings after an episode block, up to the next block"""
+        fields = strategy.sibling_fields
+        details = {}
+        description_parts = []
+        collecting = True
+        for sibling in block.next_siblings:
+            if not isinstance(sibling, Tag):
+                continue
+            if sibling.name == 'h4' or id(sibling) in block_ids:
+                break
+            text = sibling.get_text(strip=True)
+
+            is_air_date = False
+            if "air_date" not in details:
+                air_date = parse_air_date(text)
+                if air_date != "Unknown":
+                    details["air_date"] = air_date
+                    is_air_date = True
+
+            rating_el = fields["rating"].selector.select_one(sibling)
+            if rating_el is not None and "rating" not in details:
+                rating = fields["rating"].value(rating_el)
+                if rating != fields["rating"].default:
+                    details["rating"] = rating
+                    votes_el = fields["votes"].selector.select_one(rating_el.parent or sibling)
+                    if votes_el is not None:
+                        details["votes"] = fields["votes"].value(votes_el)
+
+            if collecting:
+                description = None
+                if fields["description"].selector.select_one(sibling) is not None:
+                    description = sibling.get_text(separator=' ', strip=True)
+                elif sibling.name in ('p', 'div') and rating_el is None and not is_air_date:
+                    #a plain block of text long enough to be a plot
+                    text_content = sibling.get_text(separator=' ', strip=True)
+                    if len(text_content) > 20:
+                        description = text_content
+                if description:
+                    description_parts.append(description)
+                elif description_parts:
+                    collecting = False
+
+        if description_parts:
+            details["description"] = " ".join(description_parts).strip()
+        elif block.parent is not None:
+            plot_el = fields["description_fallback"].selector.select_one(block.parent)
+            if plot_el is not None:
+                details["description"] = fields["description_fallback"].value(plot_el)
+        return details
+
+    def _json_ld_episode_lists(self, soup: BeautifulSoup):
+        """Episode lists of every TVSeries JSON-LD block on a season page"""
+        scripts = soup.find_all('script', type='application/ld+json')
+        for script_tag in scripts:
+            if script_tag.string:
+                try:
+                    data = json.loads(script_tag.string)
+                except json.JSONDecodeError as e:
+                    logger.debug(f"JSON-LD parsing error: {e} for script content: {script_tag.string[:200]}...")
+                    continue # Try next script tag
+                # JSON-LD can be a list or a dict
+                if isinstance(data, list):
+                    # Find the TVSeries object in the list
+                    series_data = next((item for item in data if item.get("@type") == "TVSeries"), None)
+                    if not series_data: data = data[0] # Fallback if no TVSeries type explicitly found
+                    else: data = series_data
+
+                if data.get("@type") == "TVSeries" and 'episode' in data:
+                    yield data['episode']
+
+    def _json_ld_episode_info(self, ep_json: dict, season: Union[int, str]) -> dict:
+        ep_num_json = ep_json.get('episodeNumber') # This is usually an int
+        imdb_url_json = ep_json.get('url')
+        if imdb_url_json and not imdb_url_json.startswith('http'):
+            imdb_url_json = urllib.parse.urljoin(BASE_URL, imdb_url_json)
+
+        return {
+            'title': ep_json.get('name', 'Unknown'),
+            'rating': str(ep_json.get('aggregateRating', {}).get('ratingValue', 'N/A')),
+            'votes': str(ep_json.get('aggregateRating', {}).get('ratingCount', 0)),
+            'image_url': ep_json.get('image'),
+            'imdb_url': imdb_url_json,
+            'episode_num': str(ep_num_json) if ep_num_json is not None else "Unknown",
+            'season_num': season,
+            'air_date': ep_json.get('datePublished', 'Unknown'), # Will be parsed by parse_air_date
+            'description': ep_json.get('description', 'N/A')
+        }
+
+    def _parse_json_ld(self, soup: BeautifulSoup, season: Union[int, str], episode_identifier_to_find: Union[int, str]) -> Optional[dict]:
+        """Episode by number from the JSON-LD of a season page, None if it isn't in there"""
+        for episodes_list_json in self._json_ld_episode_lists(soup):
+            for ep_json in episodes_list_json:
+                ep_num_json = ep_json.get('episodeNumber') # This is usually an int
+                if ep_num_json is not None and int(ep_num_json) == int(episode_identifier_to_find):
+                    episode_data = self._json_ld_episode_info(ep_json, season)
+                    logger.info(f"Found episode via JSON-LD: {episode_data['title']}")
+                    return episode_data
+        logger.info("JSON-LD method did not find the episode or no suitable JSON-LD script found.")
+        return None
+
+    def _result(self, episode_data: dict, season: Union[int, str], episode: Union[int, str]) -> dict:
+        """Episode data from any strategy in the schema get_episode_rating returns"""
+        # Ensure air_date is parsed if not already (it should be by the sub-methods)
+        if 'air_date' in episode_data and not re.match(r"^\d{4}-\d{2}-\d{2}$", str(episode_data['air_date'])):
+            episode_data['air_date'] = parse_air_date(episode_data.get('air_date'))
+
+        # Ensure all expected keys are present, providing defaults
+        return {
+            'title': episode_data.get('title', 'Unknown'),
+            'rating': episode_data.get('rating', 'N/A'),
+            'votes': episode_data.get('votes', '0'),
+            'season': episode_data.get('season_num', season),
+            'episode': episode_data.get('episode_num', episode), # Ensure this is the actual episode number
+            'air_date': str(episode_data.get('air_date', 'Unknown')),
+            'image_url': episode_data.get('image_url'),
+            'imdb_url': episode_data.get('imdb_url'),
+            'description': episode_data.get('description', 'N/A')
+        }
+
+    def _parse_season(self, graphql_data: Optional[dict], soup: Optional[BeautifulSoup], season: Union[int, str]) -> list:
+        """Every episode of a season, from the first source that lists them (GraphQL, JSON-LD, HTML)"""
+        episodes = [self._graphql_episode_info(edge["node"], idx, season)
+                    for idx, edge in enumerate(self._graphql_edges(graphql_data))]
+        if not episodes and soup is not None:
+            episodes = [self._json_ld_episode_info(ep_json, season)
+                        for ep_json in next(self._json_ld_episode_lists(soup), [])]
+        if not episodes and soup is not None:
+            for strategy in COMPILED_STRATEGIES:
+                episodes = self._parse_html_strategy(soup, strategy, season)
+                if episodes:
+                    break
+        return [self._result(episode, season, episode.get('episode_num')) for episode in episodes]
+
+    def _parse_html_strategy(self, soup: BeautifulSoup, strategy: CompiledStrategy, season: Union[int, str]) -> list:
+        """Every episode one compiled HTML strategy finds on a season page"""
+        blocks = strategy.blocks.select(soup)
+        if not blocks:
+            return []
+        rows = strategy.rows(blocks)
+        if len(rows) < len(blocks):
+            logger.warning(f"Skipped {len(blocks) - len(rows)} of {len(blocks)} blocks without an episode IMDb path using strategy {strategy.name}")
+        block_ids = {id(block) for block in blocks} if strategy.use_sibling_navigation else None
+        episodes = []
+        for idx, row in rows.items():
+            episode_imdb_path = row["link"]
+            if strategy.use_sibling_navigation:
+                row.update(self._sibling_details(blocks[idx], strategy, block_ids))
+            # Episode number: from the link, else the block's own marker, else its position
+            episode_num_match = EPISODE_LINK_PATTERN.search(episode_imdb_path)
+            episode_num = episode_num_match.group(1) if episode_num_match else row.get("episode_number") or str(idx + 1)
+            episodes.append({
+                "title": row["title"],
+                "imdb_url": urllib.parse.urljoin(BASE_URL, episode_imdb_path),
+                "episode_num": episode_num,
+                "season_num": str(season),
+                "air_date": row.get("air_date", "Unknown"),
+                "rating": row.get("rating", "N/A"),
+                "votes": row.get("votes", "0"),
+                "description": row.get("description", "N/A"),
+                "image_url": row.get("image", "N/A"),
+            })
+        return episodes
+
+    def _cache_season(self, season: Union[int, str], results: list):
+        """Fill episodes_cache from a season listing and add its titles to the title map"""
+        for result in results:
+            self.episodes_cache[(str(season), str(result['episode']))] = result
+        learn_titles(results)
+
+class SeinfelderIMDB(IMDbParser):
+    def __init__(self, fixtures: Optional[str] = FIXTURE_MODE):
+        """init session, fixtures="record"/"replay" swaps the network for recorded responses"""
+        super().__init__()
         self.session = requests.Session()
         # set a normal browser user agent
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': USER_AGENT
         })
-        self.episodes_cache: Dict[Tuple[str, str], dict] = {}
-    
-    def _try_api_method(self, season: Union[int, str], episode_name: Union[int, str]) -> Optional[dict]:
+        if fixtures:
+            #bypasses the HTTP cache too, so recordings are raw IMDb responses
+            self.session.mount("https://", FixtureAdapter(fixtures))
+        else:
+            #season pages come from the on-disk cache and are revalidated instead of downloaded again
+            self.session.mount("https://", CachingAdapter())
+
+    def _fetch_graphql(self, season: Union[int, str]) -> Optional[dict]:
+        headers, payload = graphql_request(season)
+        logger.info(f"Attempting GraphQL API call for season {season}")
+
+        def post(timeout):
+            response = self.session.post(GRAPHQL_URL, json=payload, headers=headers, timeout=timeout)
+            if response.status_code in RETRY_STATUSES:
+                response.raise_for_status()
+            return response
+
+        response = with_retries(post, REQUEST_TIMEOUT_SECONDS, is_retryable, name="IMDb GraphQL")
+        if response.status_code != 200:
+            logger.info(f"GraphQL API returned status {response.status_code}")
+            return None
+        return response.json()
+
+    def _fetch_season_page(self, season: Union[int, str]) -> BeautifulSoup:
+        url = season_url(season)
+        logger.info(f"Fetching HTML from: {url}")
+
+        def get(timeout):
+            response = self.session.get(url, timeout=timeout)
+            response.raise_for_status()
+            return response
+
+        response = with_retries(get, REQUEST_TIMEOUT_SECONDS, is_retryable, name="IMDb season page")
+        validator = getattr(response, "cache_validator", None)
+        with _parsed_pages_lock:
+            parsed = _parsed_pages.get(url)
+        if validator and parsed and parsed[0] == validator:
+            logger.info(f"Season page unchanged ({response.cache_status}), reusing parsed HTML")
+            return parsed[1]
+        soup = BeautifulSoup(response.text, 'html.parser')
+        if validator:
+            with _parsed_pages_lock:
+                #one entry per season, so this never grows past SEASONS
+                _parsed_pages[url] = (validator, soup)
+        return soup
+
+    def _try_api_method(self, season: Union[int, str], episode_num: Union[int, str]) -> Optional[dict]:
         """Try to get episode data from IMDb API if available"""
         try:
-            # Use a more direct approach with potential API endpoints
-            if isinstance(season, str) and season.isdigit():
-                season = int(season)
-                
-            # Use IMDb's graphql API if available
-            url = "https://www.imdb.com/graphql"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Content-Type': 'application/json',
-                'Referer': f'https://www.imdb.com/title/{SEINFELD_IMDB_ID}/episodes/',
-            }
-            
-            # Prepare the query - specific to the episode if name is numeric
-            variables = {
-                "titleId": SEINFELD_IMDB_ID,
-                "seasonNumber": season,
-                "first": 50  # Get up to 50 episodes
-            }
-            
-            # Simple GraphQL query to get episode data
-            query = """
-            query Episodes($titleId: ID!, $seasonNumber: Int!, $first: Int!) {
-                title(id: $titleId) {
-                    episodes(season: $seasonNumber, first: $first) {
-                        edges {
-                            node {
-                                titleText {
-                                    text
-                                }
-                                plot {
-                                    plotText {
-                                        plainText
-                                    }
-                                }
-                                releaseDate {
-                                    day
-                                    month
-                                    year
-                                }
-                                runtime {
-                                    seconds
-                                }
-                                ratingsSummary {
-                                    aggregateRating
-                                    voteCount
-                                }
-                                primaryImage {
-                                    url
-                                }
-                                id
-                            }
-                        }
-                    }
-                }
-            }
-            """
-            
-            payload = {
-                "operationName": "Episodes",
-                "variables": variables,
-                "query": query
-            }
-            
-            logger.info(f"Attempting GraphQL API call for season {season}")
-            response = self.session.post(url, json=payload)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "data" in data and "title" in data["data"] and "episodes" in data["data"]["title"]:
-                    episodes = data["data"]["title"]["episodes"]["edges"]
-                    if episodes:
-                        # Find the right episode
-                        target_episode_node = None
-                        edge_index = -1
-                        if isinstance(episode_name, int) or (isinstance(episode_name, str) and episode_name.isdigit()):
-                            # Handle numeric episode number
-                            ep_num = int(episode_name)
-                            if 0 < ep_num <= len(episodes):
-                                target_episode_node = episodes[ep_num - 1]["node"]
-                                edge_index = ep_num -1
-                        else:
-                            # Try to find by title
-                            for idx, edge in enumerate(episodes):
-                                node = edge["node"]
-                                if "titleText" in node and "text" in node["titleText"]:
-                                    if episode_name.lower() in node["titleText"]["text"].lower():
-                                        target_episode_node = node
-                                        edge_index = idx
-                                        break
-                        
-                        if target_episode_node:
-                            # Format the output
-                            episode_info = {
-                                "title": target_episode_node.get("titleText", {}).get("text", "Unknown"),
-                                "rating": str(target_episode_node.get("ratingsSummary", {}).get("aggregateRating", "N/A")),
-                                "votes": str(target_episode_node.get("ratingsSummary", {}).get("voteCount", 0)),
-                                "image_url": target_episode_node.get("primaryImage", {}).get("url"),
-                                "imdb_url": f"https://www.imdb.com/title/{target_episode_node.get('id')}/",
-                                "episode_num": edge_index + 1 if edge_index != -1 else "Unknown",
-                                "season_num": season,
-                                "description": target_episode_node.get("plot", {}).get("plotText", {}).get("plainText", "N/A")
-                            }
-                            
-                            # Build the air date
-                            if "releaseDate" in target_episode_node and target_episode_node["releaseDate"]:
-                                rd = target_episode_node["releaseDate"]
-                                # API gives month as 1-12, day as 1-31, year as YYYY
-                                # Construct a date string that parse_air_date can handle, e.g., YYYY-MM-DD
-                                if rd.get("year") is not None and rd.get("month") is not None and rd.get("day") is not None:
-                                    try:
-                                        # Ensure month and day are two digits for consistent parsing
-                                        date_str = f"{rd['year']}-{str(rd['month']).zfill(2)}-{str(rd['day']).zfill(2)}"
-                                        episode_info["air_date"] = date_str # Will be parsed by parse_air_date later
-                                    except Exception as e_date:
-                                        logger.warning(f"Could not construct date from API parts: {rd}, error: {e_date}")
-                                        episode_info["air_date"] = "Unknown"
-                                else:
-                                    episode_info["air_date"] = "Unknown"
-                            else:
-                                episode_info["air_date"] = "Unknown"
-                            
-                            logger.info(f"Found episode via GraphQL API: {episode_info['title']}")
-                            return episode_info
-            
-            logger.info(f"GraphQL API method failed or episode not found (status: {response.status_code}), falling back to HTML parsing")
-            return None
+            episode_info = self._parse_graphql(self._fetch_graphql(season), season, episode_num)
+            if not episode_info:
+                logger.info("GraphQL API method failed or episode not found, falling back to HTML parsing")
+            return episode_info
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.warning(f"GraphQL API method failed: {str(e)}")
             return None
-    
+
+    def _try_json_ld_method(self, season: Union[int, str], episode_identifier_to_find: Union[int, str], soup: Optional[BeautifulSoup] = None) -> Optional[dict]:
+        """Attempts to extract episode data using JSON-LD from the season page."""
+        try:
+            if soup is None:
+                soup = self._fetch_season_page(season)
+            return self._parse_json_ld(soup, season, episode_identifier_to_find)
+        except requests.RequestException as e:
+            logger.error(f"Request failed for JSON-LD data for season {season}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error in _try_json_ld_method for S{season}E{episode_identifier_to_find}: {e}", exc_info=True)
+            return None
+
     def _get_episode(self, season: Union[int, str], episode_identifier_to_find: Union[int, str]) -> Optional[dict]:
-        """Get episode details using a structured approach with multiple strategies."""
-        BASE_URL = "https://www.imdb.com"
+        """
+        Get details of an episode number using a structured approach with multiple strategies.
+
+        Titles never get here: get_episode_rating resolves them to a number
+        through the title map, which doesn't mistake "The Pilot" for "The
+        Pilot (Part 2)" the way a substring test did.
+        """
         try:
             # Attempt API/JSON-LD methods first as they are more reliable if available
             api_result = self._try_api_method(season, episode_identifier_to_find)
             if api_result:
                 api_result['air_date'] = parse_air_date(api_result.get('air_date'))
                 return api_result
-            
-            json_ld_result = self._try_json_ld_method(season, episode_identifier_to_find)
+
+            # One fetch of the season page serves both JSON-LD and the HTML strategies
+            soup = self._fetch_season_page(season)
+            json_ld_result = self._try_json_ld_method(season, episode_identifier_to_find, soup)
             if json_ld_result:
                 json_ld_result['air_date'] = parse_air_date(json_ld_result.get('air_date'))
                 return json_ld_result
 
             logger.info("GraphQL and JSON-LD methods failed or episode not found, proceeding to HTML parsing strategies.")
+            return self._parse_html(soup, season, episode_identifier_to_find)
 
-            season_url = f"https://www.imdb.com/title/{SEINFELD_IMDB_ID}/episodes?season={season}"
-            logger.info(f"Fetching HTML from: {season_url}")
-            response = self.session.get(season_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            for strategy in HTML_PARSING_STRATEGIES:
-                if strategy["type"] != "html": continue # Skip non-HTML strategies here
-                
-                logger.info(f"Trying HTML parsing strategy: {strategy['name']}")
-                episode_blocks = soup.select(strategy["episode_blocks_selector"])
-                
-                if not episode_blocks:
-                    logger.debug(f"No episode blocks found with selector: {strategy['episode_blocks_selector']}")
-                    continue
-                
-                logger.info(f"Found {len(episode_blocks)} potential episode blocks using strategy: {strategy['name']} (selector: {strategy['episode_blocks_selector']})")
-                if episode_blocks and strategy['name'] == "H4AnchorSiblingStrategy": # Debug for H4 strategy
-                    logger.debug(f"First H4 block HTML: {episode_blocks[0].prettify()[:1000]}")
-
-                for idx, block in enumerate(episode_blocks):
-                    episode_data = self.process_episode_block(block, strategy, season, episode_identifier_to_find, BASE_URL, idx)
-                    if episode_data:
-                        logger.info(f"Successfully extracted episode data using strategy: {strategy['name']}")
-                        # Ensure air_date is parsed
-                        episode_data['air_date'] = parse_air_date(episode_data.get('air_date'))
-                        return episode_data
-                
-                logger.debug(f"Strategy {strategy['name']} did not yield a match for S{season}E{episode_identifier_to_find}")
-
-            logger.error(f"All HTML parsing strategies failed for S{season}E{episode_identifier_to_find}. No episode blocks found or no matching episode identified.")
-            logger.debug(f"Final HTML snippet for season page (first 3000 chars): {soup.prettify()[:3000]}")
-            return None
-
+        except DeadlineExceeded:
+            raise
         except requests.RequestException as e:
             logger.error(f"Request failed for season {season} page: {e}")
             return None
@@ -348,297 +708,29 @@ class SeinfelderIMDB:
             logger.error(f"General error in _get_episode for S{season} E{episode_identifier_to_find}: {e}", exc_info=True)
             return None
 
-    def process_episode_block(self, episode_block: Tag, strategy: dict, season_num_str: str, episode_identifier: Union[int, str], base_url: str, block_index: int):
-        logger.debug(f"Processing episode block with strategy: {strategy.get('name')}, looking for S{season_num_str}E{episode_identifier}, block index {block_index}")
+    def _get_season_listing(self, season: Union[int, str]) -> list:
+        """Every episode of a season from the GraphQL API, or from the season page if that fails"""
+        graphql_data = None
         try:
-            title_tag = episode_block.select_one(strategy.get("title_selector", "a")) # Default for H4 is h4 > a
-            title = title_tag.get_text(strip=True) if title_tag else "Unknown Title"
-
-            # For H4 strategy, episode_block is the H4 tag itself. Link is usually its child 'a'.
-            # For other strategies, link_selector might be different relative to episode_block.
-            link_source_tag = episode_block if strategy.get("name") == "H4AnchorSiblingStrategy" else episode_block
-            link_tag = link_source_tag.select_one(strategy.get("link_selector", "a"))
-            episode_imdb_path = link_tag.get(strategy.get("link_attr", "href")) if link_tag else None
-            
-            if not episode_imdb_path:
-                logger.warning(f"Could not extract episode IMDb path for '{title}' using strategy {strategy.get('name')}")
-                return None
-            
-            imdb_url = urllib.parse.urljoin(base_url, episode_imdb_path) # Use base_url passed in
-            
-            episode_num_match = re.search(r"ep(\d+)", episode_imdb_path)
-            episode_num_from_link = episode_num_match.group(1) if episode_num_match else "Unknown"
-
-            # Initialize details
-            air_date = "Unknown"
-            rating = "N/A"
-            votes = "0"
-            description = "N/A"
-            image_url = None
-
-            # Sibling navigation for AirDate, Rating, Votes, Description (primarily for H4AnchorSiblingStrategy)
-            if strategy.get("use_sibling_navigation"):
-                logger.debug(f"Strategy {strategy.get('name')}: Using sibling navigation for details (air_date, rating, votes, description) starting from after: {episode_block.name}")
-                current_sibling = episode_block.next_sibling
-                temp_description_parts = []
-                description_collection_completed_for_this_episode = False # Flag to stop collecting description
-
-                while current_sibling:
-                    if isinstance(current_sibling, Tag):
-                        # Determine if current_sibling indicates the start of the *next* episode block
-                        should_stop_main_sibling_walk = False
-                        if current_sibling.name == 'h4': # Primary indicator for H4 strategy
-                            should_stop_main_sibling_walk = True
-                        else:
-                            # Check if current_sibling matches the general episode_blocks_selector for the strategy
-                            episode_block_sel = strategy.get("episode_blocks_selector")
-                            if episode_block_sel:
-                                match_method = getattr(current_sibling, 'match', None)
-                                if callable(match_method):
-                                    try:
-                                        if match_method(episode_block_sel):
-                                            should_stop_main_sibling_walk = True
-                                    except Exception as e_match_exception:
-                                        logger.warning(f"H4 Sibling Nav: Exception during .match('{episode_block_sel}') call: {e_match_exception}. Sibling: <{current_sibling.name}>")
-                                else:
-                                    logger.error(f"H4 Sibling Nav: CRITICAL - current_sibling.match is None or not callable for tag <{current_sibling.name} class='{current_sibling.get('class','')}'>. Selector: '{episode_block_sel}'. This is unexpected for a BS4 Tag.")
-                        
-                        if should_stop_main_sibling_walk:
-                            logger.debug(f"H4 Sibling Nav: Encountered next episode's main block indicator (<{current_sibling.name}>). Stopping sibling walk for current episode's details.")
-                            break # Exit the `while current_sibling:` loop
-
-                        # Air Date Parsing (remains largely the same)
-                        if air_date == 'Unknown':
-                            air_date_text_source = current_sibling.get_text(strip=True)
-                            air_date_sibling_selector = strategy.get("air_date_sibling_selector")
-                            if air_date_sibling_selector:
-                                air_date_el_in_sibling = current_sibling.select_one(air_date_sibling_selector)
-                                if air_date_el_in_sibling:
-                                    air_date_text_source = air_date_el_in_sibling.get_text(strip=True)
-                            
-                            parsed_date_val = parse_air_date(air_date_text_source)
-                            if parsed_date_val != 'Unknown':
-                                air_date = parsed_date_val
-                                logger.debug(f"H4 Sibling Nav: Parsed air_date: '{air_date}' from text: '{air_date_text_source}'")
-                        
-                        # Rating & Votes Parsing (remains largely the same)
-                        if rating == "N/A":
-                            rating_el = current_sibling.select_one(strategy.get("rating_sibling_selector", "span[aria-label*='IMDb rating'], span[class*='ratingGroup__imdb-rating']"))
-                            if rating_el:
-                                rating_text = rating_el.get_text(strip=True)
-                                rating_match = re.search(r"(\d(?:\.\d)?)", rating_text)
-                                if rating_match:
-                                    rating = rating_match.group(1)
-                                    logger.debug(f"H4 Sibling Nav: Parsed rating: '{rating}' from element: <{rating_el.name}> text: '{rating_text}'")
-                                    votes_container_to_search = rating_el.parent if rating_el.parent else current_sibling
-                                    votes_el = votes_container_to_search.select_one(
-                                        strategy.get("votes_sibling_selector", 
-                                                     "span[class*='voteCount'], span[class*='TotalRatingAmount'], a[href*='ratings'], button[data-testid*='ratings-bar__vote-count'] span")
-                                    )
-                                    if votes_el:
-                                        votes_text = votes_el.get_text(strip=True)
-                                        normalized_votes_text = re.sub(r"[(),]|\s*votes", "", votes_text, flags=re.IGNORECASE)
-                                        votes_match = re.search(r"([\d.,KkMmBbTt]+(?:\.\d[KkMmBbTt])?)", normalized_votes_text)
-                                        if votes_match:
-                                            votes = votes_match.group(1)
-                                            logger.debug(f"H4 Sibling Nav: Parsed votes: '{votes}' from element: <{votes_el.name}> text: '{votes_text}' (normalized: '{normalized_votes_text}')")
-                                else:
-                                     logger.debug(f"H4 Sibling Nav: Rating found in element <{rating_el.name}> but couldn't parse numeric value from '{rating_text}'")
-                        
-                        # Description Parsing (modified break logic)
-                        if not description_collection_completed_for_this_episode:
-                            desc_container_selector = strategy.get("description_sibling_selector", "div.ipc-html-content-inner-div, div[data-testid='plot'], p.ipc-overflowText--children, div.ipc-overflowText")
-                            current_tag_is_description = False
-                            desc_text_from_tag = ""
-
-                            # Check if current sibling matches the description selector
-                            # Using select_one for CSS selectors is generally safer/clearer than .match for this purpose.
-                            # However, to minimize changes if .match was intended for non-CSS filters, we'll guard it.
-                            if current_sibling.select_one(f":scope > {desc_container_selector}", soupsieve_adapter=None) if isinstance(desc_container_selector, str) and ('>' in desc_container_selector or '[' in desc_container_selector or '#' in desc_container_selector or ':' in desc_container_selector) else (getattr(current_sibling, 'match', None) and callable(getattr(current_sibling, 'match', None)) and current_sibling.match(desc_container_selector)):
-                                current_tag_is_description = True
-                                desc_text_from_tag = current_sibling.get_text(separator=' ', strip=True)
-                            elif current_sibling.name in ['p', 'div'] and not current_sibling.find(strategy.get("rating_sibling_selector", "span[aria-label*='IMDb rating']")) and not (air_date == 'Unknown' and parse_air_date(current_sibling.get_text(strip=True)) != 'Unknown'):
-                                text_content = current_sibling.get_text(separator=' ', strip=True)
-                                if len(text_content) > 20: # Heuristic for generic p/div tags
-                                    current_tag_is_description = True
-                                    desc_text_from_tag = text_content
-                            
-                            if current_tag_is_description and desc_text_from_tag:
-                                if not temp_description_parts: # First part of description for this episode
-                                    logger.debug(f"H4 Sibling Nav: Starting description collection with: '{desc_text_from_tag[:100]}...'")
-                                temp_description_parts.append(desc_text_from_tag)
-                            elif temp_description_parts and not current_tag_is_description: # Was collecting, but this tag is not part of desc
-                                logger.debug("H4 Sibling Nav: Description collection ended for this episode due to encountering a non-description tag.")
-                                description_collection_completed_for_this_episode = True # Stop collecting for this episode
-
-                    current_sibling = current_sibling.next_sibling
-                # End of `while current_sibling:` loop
-
-                if temp_description_parts:
-                    description = " ".join(temp_description_parts).strip()
-                if not description or description.lower() == "n/a": # Check if still N/A or empty
-                    # Last attempt for description if H4 sibling didn't find it: check parent of H4 for a plot summary
-                    if strategy.get("name") == "H4AnchorSiblingStrategy" and episode_block.parent:
-                        parent_plot_el = episode_block.parent.select_one(strategy.get("description_fallback_selector_in_parent", "div[data-testid='plot'], .ipc-html-content-inner-div"))
-                        if parent_plot_el:
-                            description = parent_plot_el.get_text(separator=' ', strip=True)
-                            logger.debug(f"H4 Strategy: Found description from parent fallback: {description[:100]}")
-                description = description if description and description.lower() != "n/a" else "N/A"
-                logger.debug(f"H4 Sibling Nav: Final description: '{description[:200]}...'")
-            else: # For strategies NOT using sibling navigation (i.e., direct selectors from episode_block)
-                # This part is for other strategies that define direct selectors for each field from the main episode_block
-                air_date_el = episode_block.select_one(strategy.get("air_date_selector"))
-                if air_date_el: air_date = parse_air_date(air_date_el.get_text(strip=True))
-                
-                rating_el = episode_block.select_one(strategy.get("rating_selector"))
-                if rating_el:
-                    rating_text = rating_el.get_text(strip=True)
-                    rating_match = re.search(r"(\d(?:\.\d)?)", rating_text)
-                    if rating_match: rating = rating_match.group(1)
-                
-                votes_el = episode_block.select_one(strategy.get("votes_selector"))
-                if votes_el:
-                    votes_text = votes_el.get_text(strip=True)
-                    normalized_votes_text = re.sub(r"[(),]|\s*votes", "", votes_text, flags=re.IGNORECASE)
-                    votes_match = re.search(r"([\d.,KkMmBbTt]+(?:\.\d[KkMmBbTt])?)", normalized_votes_text)
-                    if votes_match: votes = votes_match.group(1)
-                
-                desc_el = episode_block.select_one(strategy.get("description_selector"))
-                if desc_el: description = desc_el.get_text(separator=' ', strip=True)
-
-            # General image extraction if not found by H4 specific logic or for other strategies
-            if not image_url and strategy.get("image_selector"):
-                # For non-H4 strategies, episode_block is the container. For H4, this won't typically find it.
-                # This also serves as a fallback if H4 specific logic failed.
-                image_source_container = episode_block
-                if strategy.get("name") == "H4AnchorSiblingStrategy":
-                    # For H4, the image is not IN the H4 tag. Try its parent or grandparent again if strategy allows.
-                    # This might be redundant with earlier H4 image logic but can act as a broader fallback.
-                    if episode_block.parent and episode_block.parent.parent:
-                        image_source_container = episode_block.parent.parent
-                    elif episode_block.parent:
-                        image_source_container = episode_block.parent
-                
-                image_tag_el = image_source_container.select_one(strategy.get("image_selector"))
-                if image_tag_el:
-                    raw_img_src = image_tag_el.get(strategy.get("image_attr", "src"))
-                    if raw_img_src:
-                        image_url = self._get_high_res_image_url(raw_img_src)
-                        logger.debug(f"General/Fallback Strategy ({strategy.get('name')}): Found image_url via select_one on container: {image_url}")
-
-            # Final episode number determination: use link first, then index if link didn't yield number
-            final_episode_num = episode_num_from_link if episode_num_from_link != "Unknown" else str(block_index + 1)
-
-            episode_info = {
-                "title": title,
-                "imdb_url": imdb_url,
-                "episode_num": final_episode_num,
-                "season_num": str(season_num_str),
-                "air_date": air_date, # Will be parsed again by caller if it's a raw string
-                "rating": rating,
-                "votes": votes,
-                "description": description if description else "N/A",
-                "image_url": image_url if image_url else "N/A"
-            }
-
-            # Matching logic
-            matched = False
-            if isinstance(episode_identifier, int): # Matching by episode number
-                # Try matching against episode_num_from_link if available
-                if episode_num_from_link != "Unknown" and episode_num_from_link == str(episode_identifier):
-                    logger.info(f"Matched by episode number from link ({episode_num_from_link}) for S{season_num_str}E{episode_identifier}")
-                    episode_info["episode_num"] = episode_num_from_link # Ensure it's the matched one
-                    matched = True
-                # Fallback to block_index + 1 if link didn't provide number or didn't match
-                elif str(block_index + 1) == str(episode_identifier):
-                    logger.info(f"Matched by block index ({block_index + 1}) for S{season_num_str}E{episode_identifier} (link ep num: {episode_num_from_link}).")
-                    episode_info["episode_num"] = str(episode_identifier) # Update to the identifier
-                    matched = True
-            elif isinstance(episode_identifier, str): # Matching by title
-                if episode_identifier.lower() in title.lower():
-                    logger.info(f"Matched by title ('{episode_identifier}') for S{season_num_str} -> '{title}' (Ep num in info: {final_episode_num})")
-                    matched = True
-            
-            if matched:
-                return episode_info
-            
-            logger.debug(f"No match for S{season_num_str}E{episode_identifier} in this block. Title: '{title}', Link Ep#: {episode_num_from_link}, Index Ep#: {block_index+1}")
-            return None
-
+            graphql_data = self._fetch_graphql(season)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            logger.error(f"Error processing episode block with strategy {strategy['name']} for S{season_num_str}E{episode_identifier} (idx {block_index}): {e}", exc_info=True)
-            # logger.debug(f"Problematic block HTML (strategy {strategy['name']}): {episode_block.prettify()[:1000]}")
-            return None
-
-    def _try_json_ld_method(self, season: Union[int, str], episode_identifier_to_find: Union[int, str]) -> Optional[dict]:
-        """Attempts to extract episode data using JSON-LD from the season page."""
-        try:
-            season_url = f"https://www.imdb.com/title/{SEINFELD_IMDB_ID}/episodes?season={season}"
-            logger.info(f"Fetching HTML for JSON-LD extraction from: {season_url}")
-            response = self.session.get(season_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            scripts = soup.find_all('script', type='application/ld+json')
-            for script_tag in scripts:
-                if script_tag.string:
-                    try:
-                        data = json.loads(script_tag.string)
-                        # JSON-LD can be a list or a dict
-                        if isinstance(data, list):
-                            # Find the TVSeries object in the list
-                            series_data = next((item for item in data if item.get("@type") == "TVSeries"), None)
-                            if not series_data: data = data[0] # Fallback if no TVSeries type explicitly found
-                            else: data = series_data
-                        
-                        if data.get("@type") == "TVSeries" and 'episode' in data:
-                            episodes_list_json = data['episode']
-                            for idx, ep_json in enumerate(episodes_list_json):
-                                ep_title_json = ep_json.get('name', '').lower()
-                                ep_num_json = ep_json.get('episodeNumber') # This is usually an int
-                                
-                                match_by_title = False
-                                # Corrected: Added colon here
-                                if isinstance(episode_identifier_to_find, str) and not episode_identifier_to_find.isdigit():
-                                    match_by_title = episode_identifier_to_find.lower() in ep_title_json
-                                
-                                match_by_ep_num = False
-                                if ep_num_json is not None:
-                                    if isinstance(episode_identifier_to_find, int) and int(ep_num_json) == episode_identifier_to_find:
-                                        match_by_ep_num = True
-                                    elif isinstance(episode_identifier_to_find, str) and episode_identifier_to_find.isdigit() and int(ep_num_json) == int(episode_identifier_to_find):
-                                        match_by_ep_num = True
-
-                                if match_by_title or match_by_ep_num:
-                                    imdb_url_json = ep_json.get('url')
-                                    if imdb_url_json and not imdb_url_json.startswith('http'):
-                                        imdb_url_json = urllib.parse.urljoin("https://www.imdb.com", imdb_url_json)
-
-                                    episode_data = {
-                                        'title': ep_json.get('name', 'Unknown'),
-                                        'rating': str(ep_json.get('aggregateRating', {}).get('ratingValue', 'N/A')),
-                                        'votes': str(ep_json.get('aggregateRating', {}).get('ratingCount', 0)),
-                                        'image_url': ep_json.get('image'),
-                                        'imdb_url': imdb_url_json,
-                                        'episode_num': str(ep_num_json) if ep_num_json is not None else "Unknown",
-                                        'season_num': season,
-                                        'air_date': ep_json.get('datePublished', 'Unknown'), # Will be parsed by parse_air_date
-                                        'description': ep_json.get('description', 'N/A')
-                                    }
-                                    logger.info(f"Found episode via JSON-LD: {episode_data['title']}")
-                                    return episode_data
-                    except json.JSONDecodeError as e:
-                        logger.debug(f"JSON-LD parsing error: {e} for script content: {script_tag.string[:200]}...")
-                        continue # Try next script tag
-            logger.info("JSON-LD method did not find the episode or no suitable JSON-LD script found.")
-            return None
-        except requests.RequestException as e:
-            logger.error(f"Request failed for JSON-LD data for season {season}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error in _try_json_ld_method for S{season}E{episode_identifier_to_find}: {e}", exc_info=True)
-            return None
-
+            logger.warning(f"GraphQL API method failed: {str(e)}")
+        soup = None if self._graphql_edges(graphql_data) else self._fetch_season_page(season)
+        return self._parse_season(graphql_data, soup, season)
+
+    def _resolve_title(self, season: Union[int, str], title: str) -> Optional[dict]:
+        """Title map entry for an episode title, listing the season once if the map doesn't know it yet"""
+        titles = get_title_index()
+        entry = titles.resolve(title, season)
+        if entry is None:
+            logger.info(f"'{title}' not in the title map, listing season {season}")
+            self._cache_season(season, self._get_season_listing(season))
+            entry = titles.resolve(title, season)
+        return entry
+
+    @timed("imdb")
     def get_episode_rating(self, season: Union[int, str], episode: Union[int, str]) -> Optional[dict]:
         """get rating for specific episode"""
         try:
@@ -646,34 +738,37 @@ class SeinfelderIMDB:
             if cache_key in self.episodes_cache:
                 logger.info(f"Returning cached data for S{season}E{episode}")
                 return self.episodes_cache[cache_key]
-            
-            episode_data = self._get_episode(season, episode)
+
+            #titles resolve to an episode number through the title map, then look up like a number
+            lookup_season, lookup_episode = season, episode
+            if isinstance(episode, str) and not episode.isdigit():
+                entry = self._resolve_title(season, episode)
+                if entry is None:
+                    logger.warning(f"No IMDb episode titled '{episode}'")
+                    self.episodes_cache[cache_key] = None
+                    return None
+                lookup_season, lookup_episode = entry["season"], entry["episode"]
+                logger.info(f"Resolved '{episode}' to S{lookup_season}E{lookup_episode} ({entry['imdb_id']})")
+                listed = self.episodes_cache.get((str(lookup_season), str(lookup_episode)))
+                if listed:
+                    self.episodes_cache[cache_key] = listed
+                    return listed
+
+            episode_data = self._get_episode(lookup_season, lookup_episode)
             if not episode_data:
                 logger.warning(f"No data found for S{season}E{episode} after all attempts.")
                 # Cache the failure to avoid re-fetching repeatedly for known misses
                 self.episodes_cache[cache_key] = None 
                 return None
-            
-            # Ensure air_date is parsed if not already (it should be by the sub-methods)
-            if 'air_date' in episode_data and not re.match(r"^\d{4}-\d{2}-\d{2}$", str(episode_data['air_date'])):
-                episode_data['air_date'] = parse_air_date(episode_data.get('air_date'))
-
-            # Ensure all expected keys are present, providing defaults
-            result = {
-                'title': episode_data.get('title', 'Unknown'),
-                'rating': episode_data.get('rating', 'N/A'),
-                'votes': episode_data.get('votes', '0'),
-                'season': episode_data.get('season_num', season),
-                'episode': episode_data.get('episode_num', episode), # Ensure this is the actual episode number
-                'air_date': str(episode_data.get('air_date', 'Unknown')),
-                'image_url': episode_data.get('image_url'),
-                'imdb_url': episode_data.get('imdb_url'),
-                'description': episode_data.get('description', 'N/A')
-            }
-            
+
+            result = self._result(episode_data, lookup_season, lookup_episode)
             logger.info(f"Successfully retrieved: {result['title']} (S{result['season']}E{result['episode']}) - Rating: {result['rating']}/10")
             self.episodes_cache[cache_key] = result # Cache successful result
             return result
+        except DeadlineExceeded as e:
+            #not cached, with more time the lookup may well succeed
+            mark_degraded(f"IMDb lookup for S{season}E{episode} skipped: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error in get_episode_rating for S{season}E{episode}: {e}", exc_info=True)
             return None
@@ -703,7 +798,7 @@ if __name__ == "__main__":
 
     # If episode_input is a title, it will be passed as a string.
     # If it's an episode number, it can be passed as int or string.
-    # The script logic should handle this (e.g. _try_api_method, _get_episode)
+    # get_episode_rating resolves titles to an episode number through the title map
 
     result = get_rating(season_input, episode_input)
     if result:
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP cache for IMDb fetches
+
+Season pages rarely change, but every cold lookup used to download the
+whole page again. CachingAdapter is a requests transport adapter that
+SeinfelderIMDB mounts on its session; AsyncCachingTransport is the httpx
+equivalent used by AsyncSeinfelderIMDB, over the same cache. GET response
+bodies are stored gzip-compressed under data/http_cache together with
+their ETag and Last-Modified headers. The next request for the same URL is sent as a
+conditional request (If-None-Match / If-Modified-Since), and a 304 is
+answered from disk. Entries younger than HTTP_CACHE_FRESH_SECONDS are
+served without asking IMDb at all.
+
+A response that went through the cache carries ``cache_status`` ("hit",
+"revalidated" or "miss") and, when the body is stored, ``cache_validator``.
+The validator is a digest of the body, so callers can key parsed results
+on it and skip reparsing a page that did not change.
+
+    python scripts/http_cache.py stats     entries and size on disk
+    python scripts/http_cache.py clear     drop every entry
+"""
+
+import os
+import sys
+import gzip
+import asyncio
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from datetime import timedelta
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+HTTP_CACHE_DIR = Path(__file__).parent.parent / "data" / "http_cache"
+#served without revalidation for this long, 0 always revalidates
+HTTP_CACHE_FRESH_SECONDS = int(os.environ.get("HTTP_CACHE_FRESH_SECONDS", 3600))
+#headers worth replaying on a cached response
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+def write_atomic(path, data):
+    #pid and thread, two workers may store the same URL at once
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class HTTPCache:
+    """Compressed response bodies and their validators, one pair of files per URL"""
+
+    def __init__(self, directory=HTTP_CACHE_DIR, fresh_seconds=HTTP_CACHE_FRESH_SECONDS):
+        self.directory = Path(directory)
+        self.fresh_seconds = fresh_seconds
+        self.counters = {"hits": 0, "revalidated": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.directory / f"{digest}.json", self.directory / f"{digest}.gz"
+
+    def count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def load(self, url) -> Optional[dict]:
+        """Stored metadata for url, None if there is no usable entry"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not body_path.exists():
+            return None
+        return meta
+
+    def body(self, url) -> Optional[bytes]:
+        try:
+            with open(self._paths(url)[1], 'rb') as f:
+                return gzip.decompress(f.read())
+        except (OSError, EOFError, gzip.BadGzipFile) as e:
+            logger.warning(f"Unreadable cached body for {url}: {e}")
+            return None
+
+    def is_fresh(self, meta) -> bool:
+        return time.time() - meta.get("stored_at", 0) < self.fresh_seconds
+
+    def store(self, url, response) -> dict:
+        """Save a 200 response, body first so a meta file never points at a missing body"""
+        body = response.content
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "headers": {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            "encoding": response.encoding,
+            "validator": hashlib.sha256(body).hexdigest()[:16],
+            "stored_at": time.time(),
+        }
+        meta_path, body_path = self._paths(url)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write_atomic(body_path, gzip.compress(body))
+            write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"Could not cache {url}: {e}")
+        return meta
+
+    def revalidated(self, url, meta, headers) -> dict:
+        """Restart the freshness window after a 304, taking any new validators it sent"""
+        meta = dict(meta, stored_at=time.time())
+        for key, name in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+            if name in headers:
+                meta[key] = headers[name]
+                meta["headers"][name] = headers[name]
+        try:
+            write_atomic(self._paths(url)[0], json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"Could not update cache entry for {url}: {e}")
+        return meta
+
+    def stats(self) -> dict:
+        """This process's counters plus what is on disk"""
+        with self._lock:
+            stats = dict(self.counters)
+        bodies = list(self.directory.glob("*.gz")) if self.directory.exists() else []
+        stats["entries"] = len(bodies)
+        stats["bytes"] = sum(path.stat().st_size for path in bodies)
+        return stats
+
+    def clear(self) -> int:
+        removed = 0
+        if self.directory.exists():
+            for path in self.directory.iterdir():
+                if path.suffix in (".json", ".gz"):
+                    path.unlink()
+                    removed += path.suffix == ".gz"
+        return removed
+
+def stored_response(adapter, request, status_code, headers, body, encoding=None, reason="OK") -> requests.Response:
+    """A requests.Response for a body that comes from disk instead of the network"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response._content = body
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = encoding
+    response.url = request.url
+    response.request = request
+    response.connection = adapter
+    response.elapsed = timedelta(0)
+    return response
+
+class CachingAdapter(HTTPAdapter):
+    """Transport adapter answering GETs from an HTTPCache, revalidating stale entries"""
+
+    def __init__(self, cache: Optional[HTTPCache] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache or get_http_cache()
+
+    def _cached_response(self, request, meta, body, status) -> requests.Response:
+        response = stored_response(self, request, 200, meta["headers"], body, meta.get("encoding"))
+        response.cache_status = status
+        response.cache_validator = meta["validator"]
+        return response
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+        meta = self.cache.load(request.url)
+        body = self.cache.body(request.url) if meta else None
+        if body is None:
+            meta = None
+        elif self.cache.is_fresh(meta):
+            self.cache.count("hits")
+            return self._cached_response(request, meta, body, "hit")
+        elif meta.get("etag") or meta.get("last_modified"):
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = super().send(request, **kwargs)
+        if meta is not None and response.status_code == 304:
+            self.cache.count("revalidated")
+            meta = self.cache.revalidated(request.url, meta, response.headers)
+            response.close()
+            return self._cached_response(request, meta, body, "revalidated")
+
+        self.cache.count("misses")
+        response.cache_status = "miss"
+        if response.status_code == 200:
+            response.cache_validator = self.cache.store(request.url, response)["validator"]
+        return response
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """CachingAdapter for httpx: answers GETs from an HTTPCache, sending the rest through `transport`"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: Optional[HTTPCache] = None):
+        self.transport = transport
+        self.cache = cache or get_http_cache()
+
+    def _cached_response(self, request, meta, body, status) -> httpx.Response:
+        response = httpx.Response(200, headers=meta["headers"], content=body, request=request)
+        if meta.get("encoding"):
+            response.encoding = meta["encoding"]
+        response.cache_status = status
+        response.cache_validator = meta["validator"]
+        return response
+
+    async def handle_async_request(self, request):
+        if request.method != "GET":
+            return await self.transport.handle_async_request(request)
+        url = str(request.url)
+        #file reads and writes go to a thread, the event loop keeps serving the other requests
+        meta = await asyncio.to_thread(self.cache.load, url)
+        body = await asyncio.to_thread(self.cache.body, url) if meta else None
+        if body is None:
+            meta = None
+        elif self.cache.is_fresh(meta):
+            self.cache.count("hits")
+            return self._cached_response(request, meta, body, "hit")
+        elif meta.get("etag") or meta.get("last_modified"):
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = await self.transport.handle_async_request(request)
+        if meta is not None and response.status_code == 304:
+            self.cache.count("revalidated")
+            meta = await asyncio.to_thread(self.cache.revalidated, url, meta, response.headers)
+            await response.aclose()
+            return self._cached_response(request, meta, body, "revalidated")
+
+        self.cache.count("misses")
+        response.cache_status = "miss"
+        if response.status_code == 200:
+            await response.aread()
+            response.cache_validator = (await asyncio.to_thread(self.cache.store, url, response))["validator"]
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache():
+    """Process-wide HTTP cache, shared by every session that mounts a CachingAdapter"""
+    global _http_cache
+    if _http_cache is not None:
+        return _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HTTPCache()
+        return _http_cache
+
+def main():
+    """Command line interface: inspect or clear the HTTP cache"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect or clear the on-disk HTTP cache')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args()
+
+    cache = get_http_cache()
+    if args.command == 'clear':
+        print(f"Removed {cache.clear()} cached responses from {cache.directory}")
+        return
+    stats = cache.stats()
+    print(f"{stats['entries']} cached responses, {stats['bytes'] / 1024:.0f} KB compressed, in {cache.directory}")
+
+if __name__ == "__main__":
+    main()
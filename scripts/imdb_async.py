@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Async IMDb client for bulk lookups
+
+SeinfelderIMDB makes one blocking request at a time, so refreshing all nine
+seasons costs the sum of every round trip. AsyncSeinfelderIMDB parses with
+the same IMDbParser strategies and returns the same episode dicts. It
+fetches over one pooled httpx.AsyncClient with all requests in flight at
+once, bounded by MAX_CONCURRENCY overall and PER_HOST_LIMIT per host. A
+full refresh takes about as long as the slowest season page.
+
+A season is fetched once per client. Every episode lookup in that season,
+by number or by title, is answered from the parsed listing.
+
+Requests go through the same layers as the sync client: the on-disk HTTP
+cache (AsyncCachingTransport), or the recorded fixtures when IMDB_FIXTURES
+is set (AsyncFixtureTransport), so IMDB_FIXTURES=replay runs offline. Failed
+calls are retried under the request deadline with with_retries_async.
+
+    python scripts/imdb_async.py                      all seasons, summary
+    python scripts/imdb_async.py --seasons 3-5 --output ratings.json
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Union, Iterable
+
+import httpx
+from bs4 import BeautifulSoup
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.get_imdb_rating import (IMDbParser, GRAPHQL_URL, USER_AGENT, REQUEST_TIMEOUT_SECONDS, SEASONS,
+                                     RETRY_STATUSES, graphql_request, season_url)
+from scripts.http_cache import AsyncCachingTransport
+from scripts.imdb_fixtures import FIXTURE_MODE, AsyncFixtureTransport, MissingFixture
+from scripts.deadline import DeadlineExceeded, with_retries_async
+from scripts.episode_titles import get_title_index
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+MAX_CONCURRENCY = 32
+#everything goes to www.imdb.com; enough for a full refresh (GraphQL + page per season) in one wave, no more
+PER_HOST_LIMIT = 2 * len(SEASONS)
+
+def is_retryable_async(error: Exception) -> bool:
+    """is_retryable for httpx errors"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in RETRY_STATUSES
+
+class AsyncSeinfelderIMDB(IMDbParser):
+    """IMDb client on a pooled async HTTP client, use as ``async with AsyncSeinfelderIMDB() as imdb:``"""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, per_host_limit: int = PER_HOST_LIMIT,
+                 fixtures: Optional[str] = FIXTURE_MODE):
+        super().__init__()
+        network = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        if fixtures:
+            #bypasses the HTTP cache too, like SeinfelderIMDB
+            transport = AsyncFixtureTransport(fixtures, network)
+        else:
+            transport = AsyncCachingTransport(network)
+        self.client = httpx.AsyncClient(
+            transport=transport,
+            headers={'User-Agent': USER_AGENT},
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            follow_redirects=True,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.per_host_limit = per_host_limit
+        self.host_semaphores = {}
+        #season -> task, so concurrent lookups in one season share its fetch
+        self.seasons = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        host = httpx.URL(url).host
+        host_semaphore = self.host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        async with self.semaphore, host_semaphore:
+            return await self.client.request(method, url, **kwargs)
+
+    async def _fetch_graphql(self, season: Union[int, str]) -> Optional[dict]:
+        headers, payload = graphql_request(season)
+        #serialized the way requests does json=, so both clients share fixture keys
+        content = json.dumps(payload, allow_nan=False).encode('utf-8')
+
+        async def post(timeout):
+            response = await self._request("POST", GRAPHQL_URL, content=content, headers=headers, timeout=timeout)
+            if response.status_code in RETRY_STATUSES:
+                response.raise_for_status()
+            return response
+
+        try:
+            response = await with_retries_async(post, REQUEST_TIMEOUT_SECONDS, is_retryable_async, name="IMDb GraphQL")
+        except (httpx.HTTPError, MissingFixture, DeadlineExceeded) as e:
+            logger.warning(f"GraphQL API call for season {season} failed: {e}")
+            return None
+        if response.status_code != 200:
+            logger.info(f"GraphQL API returned status {response.status_code} for season {season}")
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            logger.warning(f"GraphQL API returned invalid JSON for season {season}: {e}")
+            return None
+
+    async def _fetch_season_page(self, season: Union[int, str]) -> Optional[str]:
+        async def get(timeout):
+            response = await self._request("GET", season_url(season), timeout=timeout)
+            response.raise_for_status()
+            return response
+
+        try:
+            response = await with_retries_async(get, REQUEST_TIMEOUT_SECONDS, is_retryable_async,
+                                                name="IMDb season page")
+        except (httpx.HTTPError, MissingFixture, DeadlineExceeded) as e:
+            logger.error(f"Request failed for season {season} page: {e}")
+            return None
+        return response.text
+
+    async def _load_season(self, season: Union[int, str]) -> list:
+        started = time.perf_counter()
+        #the page is requested alongside GraphQL rather than after it fails, so a fallback costs no extra round trip
+        graphql_data, page = await asyncio.gather(self._fetch_graphql(season), self._fetch_season_page(season))
+        soup = None
+        if not self._graphql_edges(graphql_data) and page:
+            #parsing is CPU bound, keep it off the event loop
+            soup = await asyncio.to_thread(BeautifulSoup, page, 'html.parser')
+        results = self._parse_season(graphql_data, soup, season)
+        self._cache_season(season, results)
+        logger.info(f"Season {season}: {len(results)} episodes in {time.perf_counter() - started:.2f}s")
+        return results
+
+    async def get_season(self, season: Union[int, str]) -> list:
+        """Every episode of a season in the get_episode_rating schema"""
+        key = str(season)
+        if key not in self.seasons:
+            self.seasons[key] = asyncio.ensure_future(self._load_season(season))
+        results = await self.seasons[key]
+        if not results:
+            #don't pin a failed fetch, the next lookup retries it
+            self.seasons.pop(key, None)
+        return results
+
+    async def get_episode_rating(self, season: Union[int, str], episode: Union[int, str]) -> Optional[dict]:
+        """Same lookup and result as SeinfelderIMDB.get_episode_rating"""
+        cache_key = (str(season), str(episode))
+        if cache_key not in self.episodes_cache:
+            await self.get_season(season)
+        if cache_key in self.episodes_cache:
+            return self.episodes_cache[cache_key]
+        #titles resolve through the title map, which listing the season just filled
+        if isinstance(episode, str) and not episode.isdigit():
+            entry = get_title_index().resolve(episode, season)
+            if entry is not None:
+                listed_key = (str(entry["season"]), str(entry["episode"]))
+                if listed_key not in self.episodes_cache:
+                    await self.get_season(entry["season"])
+                if listed_key in self.episodes_cache:
+                    return self.episodes_cache[listed_key]
+        logger.warning(f"No data found for S{season}E{episode} after all attempts.")
+        return None
+
+    async def get_episode_ratings(self, episodes: Iterable[tuple]) -> list:
+        """get_episode_rating for every (season, episode) pair, concurrently, in input order"""
+        return await asyncio.gather(*(self.get_episode_rating(season, episode) for season, episode in episodes))
+
+    async def refresh(self, seasons: Iterable[int] = SEASONS) -> dict:
+        """Fresh {season: episode list} for the given seasons, all fetched concurrently"""
+        seasons = list(seasons)
+        for season in seasons:
+            self.seasons.pop(str(season), None)
+        results = await asyncio.gather(*(self.get_season(season) for season in seasons))
+        return dict(zip(seasons, results))
+
+def refresh_ratings(seasons: Iterable[int] = SEASONS) -> dict:
+    """Blocking wrapper around AsyncSeinfelderIMDB.refresh for scripts"""
+    async def run():
+        async with AsyncSeinfelderIMDB() as imdb:
+            return await imdb.refresh(seasons)
+    return asyncio.run(run())
+
+def get_ratings(episodes: Iterable[tuple]) -> list:
+    """Blocking wrapper around AsyncSeinfelderIMDB.get_episode_ratings for scripts"""
+    async def run():
+        async with AsyncSeinfelderIMDB() as imdb:
+            return await imdb.get_episode_ratings(episodes)
+    return asyncio.run(run())
+
+def parse_seasons(value: str) -> list:
+    """'1-9' or '1,3,5' -> list of season numbers"""
+    seasons = []
+    for part in value.split(","):
+        first, _, last = part.strip().partition("-")
+        seasons.extend(range(int(first), int(last or first) + 1))
+    return seasons
+
+def main():
+    """Command line interface: refresh IMDb data for whole seasons concurrently"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fetch IMDb ratings for whole seasons concurrently')
+    parser.add_argument('--seasons', type=parse_seasons, default=list(SEASONS), help="e.g. 1-9 or 1,3,5 (default: all)")
+    parser.add_argument('--output', type=str, help='write the episodes as JSON to this file')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = refresh_ratings(args.seasons)
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(episodes) for episodes in results.values())
+    print(f"\n{total} episodes from {len(results)} seasons in {elapsed:.2f}s")
+    for season, episodes in results.items():
+        print(f"  Season {season}: {len(episodes)} episodes")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({str(season): episodes for season, episodes in results.items()}, f, indent=2)
+        print(f"Saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
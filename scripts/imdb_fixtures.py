@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Recorded IMDb responses for offline work on the scraper
+
+FixtureAdapter is a requests transport adapter that SeinfelderIMDB mounts
+instead of the HTTP cache when IMDB_FIXTURES is set (or when it is
+constructed with fixtures=...). AsyncFixtureTransport does the same for
+AsyncSeinfelderIMDB's httpx client, over the same fixtures:
+
+    record   every response is fetched from IMDb and saved
+    replay   only saved responses are served, nothing touches the network
+
+A fixture is one gzip-compressed JSON file under data/fixtures/imdb. It
+holds the request (method, URL, body) and the raw response (status,
+headers, body). Fixtures are keyed by a digest of method, URL and body, so
+the GraphQL POST for each season gets its own fixture. A request with no
+fixture fails in replay mode with MissingFixture, which is not retried.
+
+    python scripts/imdb_fixtures.py record --seasons 1-9   GraphQL and page for each season
+    python scripts/imdb_fixtures.py list
+"""
+
+import os
+import sys
+import gzip
+import asyncio
+import json
+import base64
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.http_cache import write_atomic, stored_response
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+FIXTURES_DIR = Path(__file__).parent.parent / "data" / "fixtures" / "imdb"
+FIXTURE_MODES = ("record", "replay")
+#unset talks to IMDb normally
+FIXTURE_MODE = os.environ.get("IMDB_FIXTURES", "").lower() or None
+TRANSFER_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+class MissingFixture(requests.RequestException):
+    """Replay mode and nothing was recorded for the request; trying again can't help, so it isn't retried"""
+
+def fixture_key(method, url, body=None) -> str:
+    digest = hashlib.sha256(f"{method.upper()} {url}\n".encode('utf-8'))
+    if body:
+        digest.update(body if isinstance(body, bytes) else body.encode('utf-8'))
+    return digest.hexdigest()[:24]
+
+def as_text(body) -> Optional[str]:
+    if body is None:
+        return None
+    return body.decode('utf-8', errors='replace') if isinstance(body, bytes) else body
+
+class FixtureStore:
+    """Directory of recorded request/response pairs"""
+
+    def __init__(self, directory=FIXTURES_DIR):
+        self.directory = Path(directory)
+
+    def _path(self, key):
+        return self.directory / f"{key}.json.gz"
+
+    def save(self, request, response) -> Path:
+        return self.save_exchange(request.method, request.url, request.body, response.status_code, response.reason,
+                                  response.headers, response.encoding, response.content)
+
+    def save_exchange(self, method, url, request_body, status, reason, headers, encoding, body) -> Path:
+        """Record one request/response pair from any HTTP client"""
+        fixture = {
+            "method": method,
+            "url": url,
+            "request_body": as_text(request_body),
+            "status": status,
+            "reason": reason,
+            #the body is stored decoded, so its transfer headers no longer apply
+            "headers": {name: value for name, value in headers.items() if name.lower() not in TRANSFER_HEADERS},
+            "encoding": encoding,
+            #base64, the body is recorded byte for byte
+            "body": base64.b64encode(body).decode('ascii'),
+        }
+        path = self._path(fixture_key(method, url, request_body))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, gzip.compress(json.dumps(fixture).encode('utf-8')))
+        return path
+
+    def _read(self, path) -> dict:
+        with open(path, 'rb') as f:
+            fixture = json.loads(gzip.decompress(f.read()))
+        fixture["body"] = base64.b64decode(fixture["body"])
+        return fixture
+
+    def load(self, method, url, body=None) -> Optional[dict]:
+        path = self._path(fixture_key(method, url, body))
+        return self._read(path) if path.exists() else None
+
+    def __iter__(self):
+        """Every fixture, body decoded to bytes, in file order"""
+        if self.directory.exists():
+            for path in sorted(self.directory.glob("*.json.gz")):
+                yield self._read(path)
+
+class FixtureAdapter(HTTPAdapter):
+    """Transport adapter that records responses to, or replays them from, a FixtureStore"""
+
+    def __init__(self, mode: str, store: Optional[FixtureStore] = None, **kwargs):
+        if mode not in FIXTURE_MODES:
+            raise ValueError(f"fixture mode must be one of {FIXTURE_MODES}, not {mode!r}")
+        super().__init__(**kwargs)
+        self.mode = mode
+        self.store = store or FixtureStore()
+
+    def send(self, request, **kwargs):
+        if self.mode == "replay":
+            fixture = self.store.load(request.method, request.url, request.body)
+            if fixture is None:
+                raise MissingFixture(f"No recorded fixture for {request.method} {request.url}", request=request)
+            return stored_response(self, request, fixture["status"], fixture["headers"], fixture["body"],
+                                   fixture["encoding"], fixture["reason"])
+        response = super().send(request, **kwargs)
+        path = self.store.save(request, response)
+        logger.info(f"Recorded {request.method} {request.url} ({response.status_code}) to {path.name}")
+        return response
+
+class AsyncFixtureTransport(httpx.AsyncBaseTransport):
+    """FixtureAdapter for httpx: records what `transport` returns to, or replays it from, a FixtureStore"""
+
+    def __init__(self, mode: str, transport: httpx.AsyncBaseTransport, store: Optional[FixtureStore] = None):
+        if mode not in FIXTURE_MODES:
+            raise ValueError(f"fixture mode must be one of {FIXTURE_MODES}, not {mode!r}")
+        self.mode = mode
+        self.transport = transport
+        self.store = store or FixtureStore()
+
+    async def handle_async_request(self, request):
+        url = str(request.url)
+        body = await request.aread()
+        if self.mode == "replay":
+            fixture = await asyncio.to_thread(self.store.load, request.method, url, body)
+            if fixture is None:
+                raise MissingFixture(f"No recorded fixture for {request.method} {url}")
+            response = httpx.Response(fixture["status"], headers=fixture["headers"], content=fixture["body"],
+                                      request=request)
+            if fixture["encoding"]:
+                response.encoding = fixture["encoding"]
+            return response
+        response = await self.transport.handle_async_request(request)
+        await response.aread()
+        path = await asyncio.to_thread(self.store.save_exchange, request.method, url, body, response.status_code,
+                                       response.reason_phrase, response.headers, response.encoding, response.content)
+        logger.info(f"Recorded {request.method} {url} ({response.status_code}) to {path.name}")
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+def main():
+    """Command line interface: record fixtures for whole seasons, or list them"""
+    import argparse
+    from scripts.get_imdb_rating import SeinfelderIMDB, SEASONS
+    from scripts.imdb_async import parse_seasons
+
+    parser = argparse.ArgumentParser(description='Record or list IMDb response fixtures')
+    parser.add_argument('command', choices=['record', 'list'])
+    parser.add_argument('--seasons', type=parse_seasons, default=list(SEASONS), help="e.g. 1-9 or 1,3,5 (default: all)")
+    args = parser.parse_args()
+
+    store = FixtureStore()
+    if args.command == 'record':
+        imdb = SeinfelderIMDB(fixtures="record")
+        for season in args.seasons:
+            #both sources, so the benchmark has GraphQL and HTML input for every season
+            for fetch in (imdb._fetch_graphql, imdb._fetch_season_page):
+                try:
+                    fetch(season)
+                except Exception as e:
+                    logger.warning(f"Season {season}: {fetch.__name__} failed: {e}")
+
+    fixtures = list(store)
+    print(f"\n{len(fixtures)} fixtures in {store.directory}")
+    for fixture in fixtures:
+        print(f"  {fixture['method']:<5} {fixture['status']} {len(fixture['body']):>9,} bytes  {fixture['url']}")
+
+if __name__ == "__main__":
+    main()
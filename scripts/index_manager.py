@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Versioned search indexes with hot swapping
+
+Every build goes into its own directory under data/indexes/:
+
+    data/indexes/20250101-120000-1a2b3c4d/
+        scripts.pack               packed corpus (script_corpus)
+        scripts.*.npy              suffix array quote index over the pack (quote_index)
+        keyword_index.bin          keyword index over that pack
+        seinfeld_descriptions.txt  snapshot of the descriptions
+        episode_digests.json       digests of that snapshot
+        manifest.json              name, source fingerprint, counts
+
+A version is built in a temporary directory, validated, renamed into place
+and only then published by atomically rewriting data/indexes/CURRENT.
+
+A server process holds the loaded version in one module-level reference.
+Requests take that reference once and keep using it, so swapping it lets
+in-flight requests finish on the old version while new ones get the new
+version. IndexReloader watches data/scripts and the descriptions file in
+the background. It builds new versions in a separate process so the server
+threads never compete with the build, and it follows CURRENT when another
+process publishes first.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    #no cross-process build lock on Windows, concurrent builds just both finish
+    fcntl = None
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.script_corpus import PackedCorpus, pack_corpus, scripts_fingerprint
+from scripts.keyword_index import KeywordIndex, build_index, install_index, parse_query
+from scripts.build_digests import DESCRIPTIONS_FILE, build_digests, load_digests
+from scripts.quote_index import QuoteIndex, build_quote_index, install_quote_index
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+INDEXES_DIR = Path(__file__).parent.parent / "data" / "indexes"
+CURRENT_FILE = INDEXES_DIR / "CURRENT"
+BUILD_LOCK_FILE = INDEXES_DIR / ".build.lock"
+KEEP_VERSIONS = 3
+RELOAD_INTERVAL_SECONDS = float(os.getenv("INDEX_RELOAD_INTERVAL", "30"))
+
+class IndexVersion:
+    """One loaded, immutable set of search indexes"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json", 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.name = self.manifest["name"]
+        self.fingerprint = self.manifest["fingerprint"]
+        self.corpus = PackedCorpus(self.path / "scripts.pack")
+        self.keyword_index = KeywordIndex.load(self.path / "keyword_index.bin")
+        #snippets must come from the pack this index was built over
+        self.keyword_index.corpus = self.corpus
+        self.quote_index = QuoteIndex.load(self.path / "scripts.pack", self.corpus)
+        descriptions_file = self.path / "seinfeld_descriptions.txt"
+        self.descriptions = descriptions_file.read_text(encoding='utf-8') if descriptions_file.exists() else None
+        self.digests = (load_digests(self.descriptions, self.path / "episode_digests.json")
+                        if self.descriptions else None)
+
+    def validate(self):
+        """Raise ValueError unless the version is complete and answers a query"""
+        if self.keyword_index.docs != self.corpus.keys():
+            raise ValueError("keyword index and corpus disagree on the episode list")
+        if self.manifest.get("docs") != len(self.corpus):
+            raise ValueError("manifest doc count doesn't match the corpus")
+        if self.manifest.get("has_descriptions") and not self.descriptions:
+            raise ValueError("descriptions snapshot is missing")
+        if len(self.keyword_index.terms):
+            #probe with the most common term, it has to match something
+            term_id = max(range(len(self.keyword_index.terms)), key=self.keyword_index.doc_freqs.__getitem__)
+            probe = parse_query(self.keyword_index.terms[term_id])
+            if probe and not self.keyword_index.evaluate(probe[0]):
+                raise ValueError("probe query returned no matches")
+
+def source_fingerprint():
+    """Fingerprint of everything a version is built from: the script files and the descriptions"""
+    descriptions = DESCRIPTIONS_FILE.read_bytes() if DESCRIPTIONS_FILE.exists() else b""
+    combined = f"{scripts_fingerprint()}|{hashlib.sha1(descriptions).hexdigest()}"
+    return hashlib.sha1(combined.encode('utf-8')).hexdigest()
+
+def build_version():
+    """
+    Build, validate and publish a new version, returns its directory
+
+    Runs in a separate process when called from IndexReloader. Nothing is
+    visible to readers until the directory is complete and CURRENT points
+    at it.
+    """
+    fingerprint = source_fingerprint()
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{fingerprint[:8]}"
+    INDEXES_DIR.mkdir(parents=True, exist_ok=True)
+    build_dir = INDEXES_DIR / f".build-{name}-{os.getpid()}"
+    build_dir.mkdir()
+    try:
+        #snapshot the descriptions first so the digests and the version agree
+        has_descriptions = DESCRIPTIONS_FILE.exists()
+        if has_descriptions:
+            shutil.copyfile(DESCRIPTIONS_FILE, build_dir / "seinfeld_descriptions.txt")
+            build_digests(build_dir / "seinfeld_descriptions.txt", build_dir / "episode_digests.json")
+
+        if not pack_corpus(build_dir / "scripts.pack"):
+            raise ValueError("no scripts to index")
+        index = build_index(corpus_path=build_dir / "scripts.pack", fingerprint=fingerprint)
+        index.save(build_dir / "keyword_index.bin")
+        build_quote_index(build_dir / "scripts.pack")
+
+        manifest = {
+            "name": name,
+            "fingerprint": fingerprint,
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "docs": len(index.docs),
+            "terms": len(index.terms),
+            "has_descriptions": has_descriptions,
+        }
+        with open(build_dir / "manifest.json", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+
+        IndexVersion(build_dir).validate()
+        version_dir = INDEXES_DIR / name
+        os.rename(build_dir, version_dir)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    publish(name)
+    logger.info(f"Built index version {name}: {manifest['docs']} scripts, {manifest['terms']} terms")
+    prune_versions()
+    return version_dir
+
+def publish(name):
+    """Point CURRENT at a version (atomic rename, readers see the old or the new name)"""
+    tmp_path = CURRENT_FILE.with_name(f"CURRENT.{os.getpid()}.tmp")
+    tmp_path.write_text(name, encoding='utf-8')
+    os.replace(tmp_path, CURRENT_FILE)
+
+def current_version_name():
+    try:
+        return CURRENT_FILE.read_text(encoding='utf-8').strip() or None
+    except FileNotFoundError:
+        return None
+
+def version_fingerprint(name):
+    """Source fingerprint a version was built from, None if its manifest can't be read"""
+    try:
+        with open(INDEXES_DIR / name / "manifest.json", 'r', encoding='utf-8') as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+def prune_versions(keep=KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions (never the current one)"""
+    current = current_version_name()
+    versions = sorted((p for p in INDEXES_DIR.iterdir() if p.is_dir() and not p.name.startswith(".")),
+                      key=lambda p: p.name, reverse=True)
+    for path in versions[keep:]:
+        if path.name != current:
+            #processes still mapping its files keep their pages until they swap
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed old index version {path.name}")
+
+_current = None
+_current_lock = threading.Lock()
+
+def current_version():
+    """The installed IndexVersion, or None when versioned indexes aren't in use"""
+    return _current
+
+def install(version):
+    """Make `version` the one new requests see"""
+    global _current
+    with _current_lock:
+        _current = version
+        install_index(version.keyword_index)
+        install_quote_index(version.quote_index)
+    logger.info(f"Serving index version {version.name}")
+
+def load_current():
+    """Load and install the published version, building one first if there is none"""
+    name = current_version_name()
+    if name is None or not (INDEXES_DIR / name).exists():
+        build_version()
+        name = current_version_name()
+    version = IndexVersion(INDEXES_DIR / name)
+    install(version)
+    return version
+
+class BuildLock:
+    """Non-blocking cross-process lock so only one process builds a given change"""
+
+    def __init__(self, path=BUILD_LOCK_FILE):
+        self.path = Path(path)
+        self._file = None
+
+    def acquire(self):
+        if fcntl is None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w')
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+class IndexReloader(threading.Thread):
+    """Background thread that keeps the installed version in step with the source data"""
+
+    def __init__(self, interval=RELOAD_INTERVAL_SECONDS):
+        super().__init__(name="index-reloader", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Index reload failed, still serving {getattr(current_version(), 'name', None)}: {e}")
+
+    def check(self):
+        active = current_version()
+        published = current_version_name()
+        if published and (active is None or published != active.name):
+            #another process (or the CLI) published a newer version
+            install(IndexVersion(INDEXES_DIR / published))
+            return
+        if active is not None and source_fingerprint() == active.fingerprint:
+            return
+
+        lock = BuildLock()
+        if not lock.acquire():
+            #someone else is building, their CURRENT update is picked up next time
+            return
+        try:
+            #another process may have published this change between the checks
+            #above and taking the lock, follow it instead of building it again
+            published = current_version_name()
+            if published and version_fingerprint(published) == source_fingerprint():
+                version_dir = INDEXES_DIR / published
+            else:
+                logger.info("Source data changed, building a new index version")
+                #a fresh process per build (builds are rare), spawned rather than
+                #forked because the server process has threads of its own
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    version_dir = executor.submit(build_version).result()
+        finally:
+            lock.release()
+        if active is None or version_dir.name != active.name:
+            install(IndexVersion(version_dir))
+
+_reloader = None
+
+def start_reloader(interval=RELOAD_INTERVAL_SECONDS):
+    """Install the current version and start watching for changes (once per process)"""
+    global _reloader
+    if _reloader is not None:
+        return _reloader
+    if current_version() is None:
+        load_current()
+    _reloader = IndexReloader(interval)
+    _reloader.start()
+    return _reloader
+
+def main():
+    """Command line interface for building and inspecting index versions"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage versioned search indexes')
+    parser.add_argument('command', choices=['build', 'status', 'prune'])
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(f"\nPublished {build_version().name}")
+    elif args.command == 'prune':
+        prune_versions()
+    else:
+        name = current_version_name()
+        print(f"\nCurrent version: {name or 'none'}")
+        if name:
+            version = IndexVersion(INDEXES_DIR / name)
+            print(json.dumps(version.manifest, indent=1))
+            print(f"Up to date: {version.fingerprint == source_fingerprint()}")
+
+if __name__ == "__main__":
+    main()
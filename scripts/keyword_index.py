@@ -0,0 +1,1093 @@
+#!/usr/bin/env python3
+"""
+Positional keyword index over the script corpus
+
+The index maps term -> episode -> sorted token positions, so keyword search
+can answer exact phrase queries ("no soup for you") and proximity queries
+(soup NEAR/3 nazi) by merging position lists instead of rescanning the
+scripts. Dialogue is also indexed per speaker ("george:marine"), so
+speaker:george "marine biologist" only touches George's postings.
+Season, catalog-flag and title filters (season:5-7, -flag:clip,
+title:parking-garage) are int bitmaps over doc ids, ANDed with each term's
+doc bitmap before positions are decoded.
+
+The index is built once from the packed corpus, saved to
+data/keyword_index.bin and reused until the corpus changes. The file is a
+flat set of typed arrays (see flat_store) that every server process maps
+read-only, so N workers share one physical copy of the index.
+
+Postings are stored compressed: terms get integer ids, and each term's doc
+ids and positions are delta + varint encoded into one shared bytes blob with
+a skip list every SKIP_INTERVAL docs. A term is only decoded when a query
+touches it. `python scripts/keyword_index.py --measure-memory` compares this
+against a plain dict index and the old per-query Counter/set scan.
+
+For snippets, every episode also gets a line table: the byte offset of each
+line in the packed corpus and the token position each line starts at. A
+match position maps to its line with a bisect, and the dialogue around it is
+sliced straight out of the corpus mapping. The download header at the top
+of each script (Title:, Season:, URL:, Downloaded:) isn't dialogue, so it
+is neither indexed nor in the line table.
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import logging
+import bisect
+import functools
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from collections import namedtuple
+from pathlib import Path
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.script_corpus import (PACKED_CORPUS_FILE, PackedCorpus, iter_scripts, script_keys, script_chunks,
+                                   corpus_fingerprint, get_corpus, pack_corpus)
+from scripts.tokenizer import tokenize_text, iter_lines, iter_buffer_chunks
+from scripts.flat_store import FlatStore, write_store
+from scripts.dedupe import HEADER_PATTERN
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+INDEX_FILE = Path(__file__).parent.parent / "data" / "keyword_index.bin"
+INDEX_MAGIC = b"SFKWIDX1"
+INDEX_VERSION = 7
+#flat arrays making up an index, in file order
+SECTIONS = ("term_offsets", "term_bytes", "doc_freqs", "postings_offsets", "postings", "skip_starts",
+            "skip_docs", "skip_offsets", "line_offsets", "line_starts", "line_tokens",
+            "delete_hashes", "delete_terms")
+DEFAULT_NEAR_DISTANCE = 5
+#a skip entry every SKIP_INTERVAL doc records of a term
+SKIP_INTERVAL = 16
+DECODE_CACHE_SIZE = 256
+#worker processes for index builds, 0 means one per core
+BUILD_JOBS = int(os.getenv("INDEX_BUILD_JOBS", "1"))
+#shards per worker, so one slow shard doesn't hold up the whole build
+SHARDS_PER_JOB = 4
+#typo tolerance: terms shorter than FUZZY_MIN_LENGTH are never corrected,
+#up to FUZZY_SHORT_LENGTH chars allow 1 edit, longer terms FUZZY_MAX_DISTANCE
+FUZZY_MIN_LENGTH = 4
+FUZZY_SHORT_LENGTH = 6
+FUZZY_MAX_DISTANCE = 2
+FUZZY_MAX_EXPANSIONS = 3
+SNIPPET_LIMIT = 3
+SNIPPET_CONTEXT_LINES = 1
+
+#one query clause: a single term, any of several terms (typo expansion), an exact
+#phrase, or two terms within `distance` tokens, optionally limited to one speaker's lines
+Clause = namedtuple("Clause", ["kind", "terms", "distance", "label", "speaker"], defaults=(None,))
+QUERY_TOKEN_PATTERN = re.compile(
+    r'(?i:speaker):(?:"([^"]*)"|([^\s,"]+))|"([^"]*)"|([^\s,"]+)\s+NEAR(?:/(\d+))?\s+([^\s,"]+)|([^\s,"]+)')
+SPEAKER_LINE_PATTERN = re.compile(r"^\s*([A-Z][A-Z0-9 .'\-]{0,30}):\s*(.*)$")
+#speaker-qualified terms are stored as "<speaker>:<term>"; ':' never survives tokenize_text
+SPEAKER_SEPARATOR = ":"
+#header lines of the script files that look like dialogue
+NON_SPEAKERS = {"url", "title", "season", "downloaded"}
+#catalog flags usable as flag:<name> / -flag:<name>, matched against the base title
+CATALOG_FLAGS = {
+    "clip": re.compile(r"^The (Clip Show|Chronicle|Highlights of 100)\b", re.IGNORECASE),
+    "multipart": re.compile(r"\((Part \d+|\d+)\)|\bPt\.? ?\d+\b", re.IGNORECASE),
+    "pilot": re.compile(r"^The Pilot\b", re.IGNORECASE),
+    "finale": re.compile(r"^The Finale\b", re.IGNORECASE),
+}
+FILTER_PATTERN = re.compile(r"(?<![^\s,])(-?)(season|flag|title):([\w\-]+)(?![^\s,])", re.IGNORECASE)
+
+#season:5-7 / season:3 (repeatable, unioned), -season:n, flag:x / -flag:x and
+#title:parking-garage / -title:x filters (titles are tuples of title tokens, unioned like seasons)
+Filters = namedtuple("Filters", ["seasons", "exclude_seasons", "include_flags", "exclude_flags",
+                                 "titles", "exclude_titles"])
+
+def speaker_key(name):
+    """Normalized speaker name as used in qualified terms, e.g. MR. PITT -> mr_pitt"""
+    return "_".join(tokenize_text(name))
+
+def qualify(term, speaker):
+    return f"{speaker}{SPEAKER_SEPARATOR}{term}" if speaker else term
+
+def parse_query(query_str):
+    """
+    Parse a keyword query into clauses
+
+    Quoted text becomes an exact phrase, `a NEAR/k b` a proximity clause
+    (k defaults to DEFAULT_NEAR_DISTANCE) and everything else single terms
+    separated by commas or spaces. `speaker:name` limits the clauses after
+    it to that character's lines, up to the next speaker: filter.
+    """
+    clauses = []
+    seen = set()
+    speaker = None
+    for match in QUERY_TOKEN_PATTERN.finditer(query_str):
+        quoted_speaker, bare_speaker, phrase, near_left, near_distance, near_right, word = match.groups()
+        if quoted_speaker is not None or bare_speaker is not None:
+            speaker = speaker_key(quoted_speaker if quoted_speaker is not None else bare_speaker) or None
+            continue
+        if phrase is not None:
+            terms = tokenize_text(phrase)
+            if len(terms) > 1:
+                clause = Clause("phrase", tuple(terms), None, f'"{" ".join(terms)}"')
+            elif terms:
+                clause = Clause("term", tuple(terms), None, terms[0])
+            else:
+                continue
+        elif near_left is not None:
+            left, right = tokenize_text(near_left), tokenize_text(near_right)
+            if not left or not right:
+                continue
+            distance = int(near_distance) if near_distance else DEFAULT_NEAR_DISTANCE
+            clause = Clause("near", (left[0], right[0]), distance, f"{left[0]} NEAR/{distance} {right[0]}")
+        else:
+            terms = tokenize_text(word)
+            if not terms:
+                continue
+            clause = Clause("term", (terms[0],), None, terms[0])
+        if speaker:
+            clause = clause._replace(speaker=speaker, label=f"speaker:{speaker} {clause.label}")
+        if clause.label not in seen:
+            seen.add(clause.label)
+            clauses.append(clause)
+    return clauses
+
+def split_filters(query_str):
+    """
+    Pull season:/flag:/title: filters out of a query
+
+    Returns (the query without them, Filters or None, problems). Season and
+    title filters are unioned with each other, flags must all be present, a
+    leading - excludes. Malformed filters and unknown flags are left out of
+    Filters and described in `problems`, so the caller can refuse the query
+    instead of running it without them.
+    """
+    seasons = set()
+    exclude_seasons = set()
+    include_flags = set()
+    exclude_flags = set()
+    titles = set()
+    exclude_titles = set()
+    problems = []
+
+    def take(match):
+        negate, kind, value = match.group(1), match.group(2).lower(), match.group(3).lower()
+        if kind == "season":
+            bounds = value.split("-", 1)
+            if not all(bound.isdigit() for bound in bounds):
+                problems.append(f"{match.group(0)} isn't a season number or range (e.g. season:5 or season:5-7)")
+                return " "
+            low, high = int(bounds[0]), int(bounds[-1])
+            (exclude_seasons if negate else seasons).update(range(min(low, high), max(low, high) + 1))
+        elif kind == "title":
+            words = tuple(title_words(value.replace("-", " ")))
+            if not words:
+                problems.append(f"{match.group(0)} doesn't name a title (e.g. title:parking-garage)")
+                return " "
+            (exclude_titles if negate else titles).add(words)
+        elif value in CATALOG_FLAGS:
+            (exclude_flags if negate else include_flags).add(value)
+        else:
+            problems.append(f"{match.group(0)} isn't a catalog flag (known flags: {', '.join(CATALOG_FLAGS)})")
+        return " "
+
+    remaining = FILTER_PATTERN.sub(take, query_str)
+    if not (seasons or exclude_seasons or include_flags or exclude_flags or titles or exclude_titles):
+        return remaining, None, problems
+    return remaining, Filters(frozenset(seasons), frozenset(exclude_seasons),
+                              frozenset(include_flags), frozenset(exclude_flags),
+                              frozenset(titles), frozenset(exclude_titles)), problems
+
+def title_words(title):
+    """Tokens of an episode title without a leading "the", as title: filters spell it"""
+    words = tokenize_text(title)
+    return words[1:] if words[:1] == ["the"] and len(words) > 1 else words
+
+def title_slug(title):
+    """title:<slug> value naming an episode, e.g. The Pilot (1) -> pilot-1"""
+    return "-".join(title_words(title))
+
+def bitmap_docs(bitmap):
+    """Doc ids of the set bits, ascending"""
+    docs = []
+    while bitmap:
+        low_bit = bitmap & -bitmap
+        docs.append(low_bit.bit_length() - 1)
+        bitmap ^= low_bit
+    return docs
+
+def docs_bitmap(doc_ids):
+    bitmap = 0
+    for doc_id in doc_ids:
+        bitmap |= 1 << doc_id
+    return bitmap
+
+def fuzzy_distance_for(term):
+    """Edits allowed when correcting term, 0 for terms too short to correct safely"""
+    if len(term) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(term) <= FUZZY_SHORT_LENGTH else FUZZY_MAX_DISTANCE
+
+def deletes(term, max_distance):
+    """Every string reachable from term by removing up to max_distance characters"""
+    results = {term}
+    frontier = {term}
+    for _ in range(max_distance):
+        frontier = {t[:i] + t[i + 1:] for t in frontier for i in range(len(t))} - results
+        results |= frontier
+    return results
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance (adjacent swaps count as one edit), capped at max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+def intersect_shifted(left, right, shift):
+    """Positions p in left such that p + shift is in right (both sorted), by merging"""
+    result = array('I')
+    i = j = 0
+    while i < len(left) and j < len(right):
+        target = left[i] + shift
+        if right[j] < target:
+            j += 1
+        elif right[j] > target:
+            i += 1
+        else:
+            result.append(left[i])
+            i += 1
+            j += 1
+    return result
+
+def positions_within(left, right, distance):
+    """Positions in left with some position in right at most `distance` away"""
+    result = array('I')
+    j = 0
+    for position in left:
+        while j < len(right) and right[j] < position - distance:
+            j += 1
+        if j < len(right) and right[j] <= position + distance:
+            result.append(position)
+    return result
+
+def encode_varint(value, out):
+    """Append value to the bytearray as a LEB128 varint"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decode_varint(buf, pos):
+    """Read one varint from buf at pos, returns (value, next pos)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def encode_term_postings(doc_postings, out, skip_docs, skip_offsets):
+    """
+    Append one term's postings to `out`
+
+    Each doc record is varint(doc delta), varint(count), varint(byte length
+    of the positions) and then the delta-encoded positions. Every
+    SKIP_INTERVAL-th record stores its doc id absolutely and is added to the
+    skip list, so a reader can jump straight to it.
+    """
+    term_start = len(out)
+    previous_doc = 0
+    positions_buf = bytearray()
+    for record, doc_id in enumerate(sorted(doc_postings)):
+        if record % SKIP_INTERVAL == 0:
+            previous_doc = 0
+            skip_docs.append(doc_id)
+            skip_offsets.append(len(out) - term_start)
+        positions_buf.clear()
+        previous_position = 0
+        for position in doc_postings[doc_id]:
+            encode_varint(position - previous_position, positions_buf)
+            previous_position = position
+        encode_varint(doc_id - previous_doc, out)
+        encode_varint(len(doc_postings[doc_id]), out)
+        encode_varint(len(positions_buf), out)
+        out += positions_buf
+        previous_doc = doc_id
+
+class TermArray:
+    """Sorted terms stored as UTF-8 bytes plus an offsets array, looked up by bisection"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, term_id):
+        return bytes(self.data[self.offsets[term_id]:self.offsets[term_id + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        return (self[term_id] for term_id in range(len(self)))
+
+    def find(self, term):
+        """Id of term, or None"""
+        term_id = bisect.bisect_left(self, term)
+        return term_id if term_id < len(self) and self[term_id] == term else None
+
+class LineTable:
+    """Per-doc slices of one flat array: values[offsets[doc]:offsets[doc + 1]]"""
+
+    def __init__(self, offsets, values):
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, doc_id):
+        return self.values[self.offsets[doc_id]:self.offsets[doc_id + 1]]
+
+def variant_hash(variant):
+    """Stable 64-bit hash of a delete variant (hash() differs between processes)"""
+    return int.from_bytes(hashlib.blake2b(variant.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class KeywordIndex:
+    """
+    Positional inverted index with compressed postings
+
+    Terms are kept in a sorted array and mapped to integer ids. Every term's
+    postings live in one shared bytes blob (see encode_term_postings) with a
+    small skip list per term, and are only decoded when a query touches them.
+
+    All of it is held in flat typed arrays (SECTIONS). A loaded index views
+    them straight out of a read-only mapping of INDEX_FILE, so every server
+    process shares the same physical pages.
+    """
+
+    def __init__(self, docs, sections, fingerprint=None, store=None, aliases=None):
+        self.docs = docs
+        #episode key -> keys of duplicate scripts indexed as that doc
+        self.aliases = aliases or {}
+        self.fingerprint = fingerprint
+        #keeps the mapping alive when loaded from disk
+        self.store = store
+        #corpus the snippets are sliced from; None means the default pack (get_corpus())
+        self.corpus = None
+        self.sections = {name: memoryview(sections[name]) for name in SECTIONS}
+        self.terms = TermArray(self.sections["term_offsets"], self.sections["term_bytes"])
+        self.doc_freqs = self.sections["doc_freqs"]
+        #postings_offsets[t]:postings_offsets[t + 1] is term t's slice of the blob
+        self.postings_offsets = self.sections["postings_offsets"]
+        self.postings_blob = self.sections["postings"]
+        #skip_starts[t]:skip_starts[t + 1] are term t's entries in skip_docs/skip_offsets
+        self.skip_starts = self.sections["skip_starts"]
+        self.skip_docs = self.sections["skip_docs"]
+        self.skip_offsets = self.sections["skip_offsets"]
+        #per doc: byte offset of every line in the packed corpus, and the
+        #token position the line starts at
+        self.line_starts = LineTable(self.sections["line_offsets"], self.sections["line_starts"])
+        self.line_tokens = LineTable(self.sections["line_offsets"], self.sections["line_tokens"])
+        #symspell-style deletion dictionary: sorted variant hashes and the term each came from
+        self.delete_hashes = self.sections["delete_hashes"]
+        self.delete_terms = self.sections["delete_terms"]
+        #decoded postings of recently queried terms
+        self.positions = functools.lru_cache(maxsize=DECODE_CACHE_SIZE)(self._decode_term)
+        self.doc_bitmap = functools.lru_cache(maxsize=DECODE_CACHE_SIZE)(self._term_bitmap)
+        self.term_id = functools.lru_cache(maxsize=DECODE_CACHE_SIZE * 4)(self.terms.find)
+        self.season_bitmaps, self.flag_bitmaps, self.title_bitmaps = self._catalog_bitmaps()
+
+    def _catalog_bitmaps(self):
+        """season, catalog flag and title words -> bitmap of their docs (bit i = doc id i)"""
+        seasons = {}
+        flags = {flag: 0 for flag in CATALOG_FLAGS}
+        titles = {}
+        for doc_id, episode_key in enumerate(self.docs):
+            #a deduplicated script counts for every season it was filed under
+            for key in [episode_key] + self.aliases.get(episode_key, []):
+                match = re.match(r"Season (\d+): (.*)", key)
+                if not match:
+                    continue
+                seasons[int(match.group(1))] = seasons.get(int(match.group(1)), 0) | (1 << doc_id)
+                for flag, pattern in CATALOG_FLAGS.items():
+                    if pattern.search(match.group(2)):
+                        flags[flag] |= 1 << doc_id
+                words = tuple(title_words(match.group(2)))
+                titles[words] = titles.get(words, 0) | (1 << doc_id)
+        return seasons, flags, titles
+
+    def title_bitmap(self, words):
+        """Docs whose title words start with `words`, so title:pilot finds both parts of The Pilot"""
+        bitmap = 0
+        for title, docs in self.title_bitmaps.items():
+            if title[:len(words)] == words:
+                bitmap |= docs
+        return bitmap
+
+    def filter_bitmap(self, filters):
+        """Bitmap of the docs allowed by Filters, None when nothing is filtered"""
+        if not filters:
+            return None
+        bitmap = (1 << len(self.docs)) - 1
+        if filters.seasons:
+            season_bitmap = 0
+            for season in filters.seasons:
+                season_bitmap |= self.season_bitmaps.get(season, 0)
+            bitmap &= season_bitmap
+        for season in filters.exclude_seasons:
+            bitmap &= ~self.season_bitmaps.get(season, 0)
+        for flag in filters.include_flags:
+            bitmap &= self.flag_bitmaps.get(flag, 0)
+        for flag in filters.exclude_flags:
+            bitmap &= ~self.flag_bitmaps.get(flag, 0)
+        if filters.titles:
+            title_bitmap = 0
+            for words in filters.titles:
+                title_bitmap |= self.title_bitmap(words)
+            bitmap &= title_bitmap
+        for words in filters.exclude_titles:
+            bitmap &= ~self.title_bitmap(words)
+        return bitmap
+
+    @classmethod
+    def from_postings(cls, docs, postings, line_starts, line_tokens, fingerprint=None, aliases=None):
+        """Encode a plain {term: {doc id: positions}} mapping and per-doc line arrays"""
+        terms = sorted(postings)
+        term_offsets = array('Q', [0])
+        term_bytes = bytearray()
+        doc_freqs = array('I')
+        postings_offsets = array('Q', [0])
+        blob = bytearray()
+        skip_starts = array('I', [0])
+        skip_docs = array('I')
+        skip_offsets = array('I')
+        variants = []
+        for term_id, term in enumerate(terms):
+            term_bytes += term.encode('utf-8')
+            term_offsets.append(len(term_bytes))
+            encode_term_postings(postings[term], blob, skip_docs, skip_offsets)
+            doc_freqs.append(len(postings[term]))
+            postings_offsets.append(len(blob))
+            skip_starts.append(len(skip_docs))
+            #speaker-qualified terms are never offered as spelling corrections
+            if SPEAKER_SEPARATOR not in term:
+                variants.extend((variant_hash(variant), term_id) for variant in deletes(term, FUZZY_MAX_DISTANCE))
+        variants.sort()
+
+        line_offsets = array('Q', [0])
+        flat_line_starts = array('I')
+        flat_line_tokens = array('I')
+        for doc_line_starts, doc_line_tokens in zip(line_starts, line_tokens):
+            flat_line_starts.extend(doc_line_starts)
+            flat_line_tokens.extend(doc_line_tokens)
+            line_offsets.append(len(flat_line_starts))
+
+        sections = {
+            "term_offsets": term_offsets,
+            "term_bytes": bytes(term_bytes),
+            "doc_freqs": doc_freqs,
+            "postings_offsets": postings_offsets,
+            "postings": bytes(blob),
+            "skip_starts": skip_starts,
+            "skip_docs": skip_docs,
+            "skip_offsets": skip_offsets,
+            "line_offsets": line_offsets,
+            "line_starts": flat_line_starts,
+            "line_tokens": flat_line_tokens,
+            "delete_hashes": array('Q', (variant for variant, _ in variants)),
+            "delete_terms": array('I', (term_id for _, term_id in variants)),
+        }
+        return cls(docs, sections, fingerprint, aliases=aliases)
+
+    def _iter_records(self, term_id, start_record=0, start_offset=0):
+        """Yield (doc id, positions start, positions end) headers without decoding positions"""
+        blob = self.postings_blob
+        pos = self.postings_offsets[term_id] + start_offset
+        end = self.postings_offsets[term_id + 1]
+        record = start_record
+        doc_id = 0
+        while pos < end:
+            if record % SKIP_INTERVAL == 0:
+                doc_id = 0
+            delta, pos = decode_varint(blob, pos)
+            _, pos = decode_varint(blob, pos)
+            length, pos = decode_varint(blob, pos)
+            doc_id += delta
+            yield doc_id, pos, pos + length
+            pos += length
+            record += 1
+
+    def _decode_positions(self, start, end):
+        blob = self.postings_blob
+        positions = array('I')
+        position = 0
+        pos = start
+        while pos < end:
+            delta, pos = decode_varint(blob, pos)
+            position += delta
+            positions.append(position)
+        return positions
+
+    def _decode_term(self, term):
+        """doc id -> sorted positions of term (cached through self.positions)"""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return {}
+        return {doc_id: self._decode_positions(start, end) for doc_id, start, end in self._iter_records(term_id)}
+
+    def doc_frequency(self, term):
+        term_id = self.term_id(term)
+        return 0 if term_id is None else self.doc_freqs[term_id]
+
+    def doc_ids(self, term):
+        """Docs containing term, decoding only the record headers"""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return set()
+        return {doc_id for doc_id, _, _ in self._iter_records(term_id)}
+
+    def positions_in(self, term, doc_id):
+        """Positions of term in one doc, using the skip list to avoid decoding other docs"""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return None
+        first, last = self.skip_starts[term_id], self.skip_starts[term_id + 1]
+        skip = bisect.bisect_right(self.skip_docs, doc_id, first, last) - 1
+        if skip < first:
+            return None
+        record = (skip - first) * SKIP_INTERVAL
+        for found_doc, start, end in self._iter_records(term_id, record, self.skip_offsets[skip]):
+            if found_doc == doc_id:
+                return self._decode_positions(start, end)
+            if found_doc > doc_id:
+                return None
+        return None
+
+    def _term_bitmap(self, term):
+        """Bitmap of the docs containing term (cached through self.doc_bitmap)"""
+        return docs_bitmap(self.doc_ids(term))
+
+    def term_matches(self, term, allowed=None):
+        """doc id -> positions of term, only in the `allowed` bitmap of docs when given"""
+        if allowed is None:
+            return dict(self.positions(term))
+        return {doc_id: self.positions_in(term, doc_id) for doc_id in bitmap_docs(self.doc_bitmap(term) & allowed)}
+
+    def phrase_matches(self, terms, allowed=None):
+        """doc id -> start positions of the exact phrase"""
+        if not all(self.doc_frequency(term) for term in terms):
+            return {}
+        #only docs containing every term, starting from the rarest
+        candidates = allowed if allowed is not None else (1 << len(self.docs)) - 1
+        for term in sorted(set(terms), key=self.doc_frequency):
+            candidates &= self.doc_bitmap(term)
+            if not candidates:
+                return {}
+
+        matches = {}
+        for doc_id in bitmap_docs(candidates):
+            starts = self.positions_in(terms[0], doc_id)
+            for offset, term in enumerate(terms[1:], 1):
+                starts = intersect_shifted(starts, self.positions_in(term, doc_id), offset)
+                if not starts:
+                    break
+            if starts:
+                matches[doc_id] = starts
+        return matches
+
+    def near_matches(self, left, right, distance, allowed=None):
+        """doc id -> positions of left with right within `distance` tokens"""
+        candidates = self.doc_bitmap(left) & self.doc_bitmap(right)
+        if allowed is not None:
+            candidates &= allowed
+        matches = {}
+        for doc_id in bitmap_docs(candidates):
+            positions = positions_within(self.positions_in(left, doc_id), self.positions_in(right, doc_id), distance)
+            if positions:
+                matches[doc_id] = positions
+        return matches
+
+    def any_matches(self, terms, allowed=None):
+        """doc id -> positions of any of the terms"""
+        matches = {}
+        for term in terms:
+            for doc_id, positions in self.term_matches(term, allowed).items():
+                matches.setdefault(doc_id, set()).update(positions)
+        return {doc_id: array('I', sorted(positions)) for doc_id, positions in matches.items()}
+
+    def variant_term_ids(self, variant):
+        """Ids of the vocabulary terms that `variant` is a delete of (hash matches, verified by the caller)"""
+        key = variant_hash(variant)
+        start = bisect.bisect_left(self.delete_hashes, key)
+        end = start
+        while end < len(self.delete_hashes) and self.delete_hashes[end] == key:
+            end += 1
+        return self.delete_terms[start:end]
+
+    def similar_terms(self, term, limit=FUZZY_MAX_EXPANSIONS):
+        """
+        Closest vocabulary terms to a term that isn't in the vocabulary
+
+        Candidates share a delete variant with the term and are verified
+        with edit_distance. Only the closest distance is kept, most frequent
+        terms first.
+        """
+        max_distance = fuzzy_distance_for(term)
+        if not max_distance:
+            return []
+        candidate_ids = set()
+        for variant in deletes(term, max_distance):
+            candidate_ids.update(self.variant_term_ids(variant))
+        scored = []
+        for term_id in candidate_ids:
+            distance = edit_distance(term, self.terms[term_id], max_distance)
+            if distance <= max_distance:
+                scored.append((distance, -self.doc_freqs[term_id], self.terms[term_id]))
+        if not scored:
+            return []
+        best = min(distance for distance, _, _ in scored)
+        return [candidate for distance, _, candidate in sorted(scored) if distance == best][:limit]
+
+    def expand_clause(self, clause):
+        """
+        Replace out-of-vocabulary terms with their nearest vocabulary terms
+
+        A single term becomes an "any" clause over up to FUZZY_MAX_EXPANSIONS
+        corrections; inside phrases and NEAR clauses only the best correction
+        is used. Returns (clause, {original term: [corrections]}).
+        """
+        expansions = {}
+        terms = []
+        for term in clause.terms:
+            if self.term_id(term) is not None:
+                terms.append(term)
+                continue
+            corrections = self.similar_terms(term, FUZZY_MAX_EXPANSIONS if clause.kind == "term" else 1)
+            if corrections:
+                expansions[term] = corrections
+                terms.extend(corrections if clause.kind == "term" else corrections[:1])
+            else:
+                terms.append(term)
+        if not expansions:
+            return clause, expansions
+        kind = "any" if clause.kind == "term" else clause.kind
+        return clause._replace(kind=kind, terms=tuple(terms)), expansions
+
+    def expand_query(self, clauses):
+        """expand_clause over a whole query, returns (clauses, merged expansions)"""
+        expanded = []
+        expansions = {}
+        for clause in clauses:
+            clause, clause_expansions = self.expand_clause(clause)
+            expanded.append(clause)
+            expansions.update(clause_expansions)
+        return expanded, expansions
+
+    def speakers(self):
+        """Speaker keys that have qualified postings"""
+        return sorted({term.split(SPEAKER_SEPARATOR, 1)[0] for term in self.terms if SPEAKER_SEPARATOR in term})
+
+    def resolve(self, clause):
+        """Clause over the terms actually stored: speaker-scoped clauses use the speaker's own postings"""
+        if clause.speaker:
+            #positions are shared with the plain terms
+            return clause._replace(terms=tuple(qualify(term, clause.speaker) for term in clause.terms), speaker=None)
+        return clause
+
+    def clause_cost(self, clause):
+        """Upper bound on the docs a clause can match, from doc frequencies alone"""
+        frequencies = [self.doc_frequency(term) for term in self.resolve(clause).terms]
+        return sum(frequencies) if clause.kind == "any" else min(frequencies, default=0)
+
+    def clause_bitmap(self, clause, allowed=None):
+        """Bitmap of the docs a clause matches; single terms never decode positions"""
+        clause = self.resolve(clause)
+        if clause.kind in ("term", "any"):
+            bitmap = 0
+            for term in clause.terms:
+                bitmap |= self.doc_bitmap(term)
+            return bitmap if allowed is None else bitmap & allowed
+        return docs_bitmap(self.evaluate(clause, allowed))
+
+    def evaluate(self, clause, allowed=None):
+        """
+        doc id -> sorted match positions for one parsed clause
+
+        `allowed` is a doc bitmap from filter_bitmap(); it is ANDed with the
+        term bitmaps before any positions are decoded.
+        """
+        clause = self.resolve(clause)
+        if clause.kind == "any":
+            return self.any_matches(clause.terms, allowed)
+        if clause.kind == "phrase":
+            return self.phrase_matches(clause.terms, allowed)
+        if clause.kind == "near":
+            return self.near_matches(clause.terms[0], clause.terms[1], clause.distance, allowed)
+        return self.term_matches(clause.terms[0], allowed)
+
+    def lines_for(self, doc_id, positions, limit=None):
+        """Distinct line numbers containing the given token positions, in order"""
+        line_tokens = self.line_tokens[doc_id]
+        lines = []
+        for position in positions:
+            line = bisect.bisect_right(line_tokens, position) - 1
+            if not lines or lines[-1] != line:
+                if limit is not None and len(lines) == limit:
+                    break
+                lines.append(line)
+        return lines
+
+    def snippets(self, doc_id, positions, terms, limit=SNIPPET_LIMIT, context=SNIPPET_CONTEXT_LINES):
+        """
+        Dialogue around the first `limit` matching lines
+
+        Only the byte range of each snippet is read from the corpus mapping,
+        so the cost depends on the number of matches, not the script length.
+        Returns dicts with speaker, the matching line (terms wrapped in **)
+        and the surrounding lines.
+        """
+        corpus = self.corpus or get_corpus()
+        if corpus is None:
+            return []
+        line_starts = self.line_starts[doc_id]
+        if not len(line_starts):
+            return []
+        #the table starts after the download header, count its lines back in for the line numbers
+        header_lines = corpus.slice(doc_id, 0, line_starts[0]).tobytes().count(b"\n")
+        highlight = set(terms)
+        snippets = []
+        for line in self.lines_for(doc_id, positions, limit):
+            first = max(0, line - context)
+            last = min(len(line_starts) - 1, line + context)
+            end = line_starts[last + 1] if last + 1 < len(line_starts) else None
+            raw = corpus.slice(doc_id, line_starts[first], end).tobytes().decode('utf-8', errors='replace')
+            lines = raw.split('\n')
+            match_line = lines[line - first] if line - first < len(lines) else ""
+            speaker_match = SPEAKER_LINE_PATTERN.match(match_line)
+            speaker, text = (speaker_match.group(1).strip(), speaker_match.group(2)) if speaker_match else (None, match_line.strip())
+            snippets.append({
+                "line": header_lines + line + 1,
+                "speaker": speaker,
+                "text": highlight_terms(text, highlight),
+                "before": [l.strip() for l in lines[:line - first] if l.strip()],
+                "after": [l.strip() for l in lines[line - first + 1:last - first + 1] if l.strip()],
+            })
+        return snippets
+
+    def save(self, path=INDEX_FILE):
+        meta = {"version": INDEX_VERSION, "fingerprint": self.fingerprint, "docs": self.docs, "aliases": self.aliases}
+        write_store(path, INDEX_MAGIC, meta, {name: self.sections[name] for name in SECTIONS})
+        #servers only ever see the saved file, so it has to answer exactly like this index
+        self.check_round_trip(KeywordIndex.load(path))
+        logger.info(f"Saved keyword index to {path}")
+
+    def check_round_trip(self, loaded):
+        """Raise ValueError unless `loaded` (this index saved and mapped back) holds the same arrays and finds the same docs"""
+        for name in SECTIONS:
+            built, mapped = self.sections[name], loaded.sections[name]
+            if built.format != mapped.format or built != mapped:
+                raise ValueError(f"index section {name} did not survive save/load ({built.format!r} -> {mapped.format!r})")
+        for term_id in range(0, len(self.terms), max(1, len(self.terms) // 32)):
+            term = self.terms[term_id]
+            if loaded.doc_ids(term) != self.doc_ids(term):
+                raise ValueError(f"saved index finds different docs for {term!r}")
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        """Map a saved index read-only; nothing is copied into the process"""
+        store = FlatStore(path, INDEX_MAGIC)
+        if store.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"index version {store.meta.get('version')} != {INDEX_VERSION}")
+        missing = [name for name in SECTIONS if name not in store]
+        if missing:
+            raise ValueError(f"index is missing sections: {missing}")
+        return cls(store.meta["docs"], store.sections(), store.meta.get("fingerprint"), store, store.meta.get("aliases"))
+
+    def memory_bytes(self):
+        """Size of the index arrays (shared between processes when mapped from disk)"""
+        return sum(section.nbytes for section in self.sections.values())
+
+def highlight_terms(text, terms):
+    """Wrap words whose normalized form is one of `terms` in **"""
+    def mark(match):
+        tokens = tokenize_text(match.group(0))
+        return f"**{match.group(0)}**" if tokens and tokens[0] in terms else match.group(0)
+    return re.sub(r"\S+", mark, text)
+
+def add_posting(postings, term, doc_id, position):
+    doc_postings = postings.get(term)
+    if doc_postings is None:
+        doc_postings = postings[term] = {}
+    positions = doc_postings.get(doc_id)
+    if positions is None:
+        positions = doc_postings[doc_id] = array('I')
+    positions.append(position)
+
+def index_document(doc_id, lines, postings):
+    """
+    Add one script's tokens to `postings`, returns its (line starts, line token positions)
+
+    `lines` is a stream of (byte offset, line) pairs from tokenizer.iter_lines,
+    so only one line of the script is tokenized at a time. Dialogue tokens
+    are also posted as "<speaker>:<term>" at the same position. A turn runs
+    from a `SPEAKER:` line until the next speaker, blank line or [stage
+    direction]. The download header lines at the top are skipped entirely.
+    """
+    doc_line_starts = array('I')
+    doc_line_tokens = array('I')
+    position = 0
+    speaker = None
+    in_header = True
+    for byte_offset, line in lines:
+        if in_header and HEADER_PATTERN.match(line):
+            continue
+        in_header = False
+        doc_line_starts.append(byte_offset)
+        doc_line_tokens.append(position)
+        tokens = tokenize_text(line)
+        dialogue_start = 0
+        speaker_match = SPEAKER_LINE_PATTERN.match(line)
+        if speaker_match:
+            speaker_tokens = tokenize_text(speaker_match.group(1))
+            speaker = speaker_key(speaker_match.group(1))
+            if speaker in NON_SPEAKERS or tokens[:len(speaker_tokens)] != speaker_tokens:
+                speaker = None
+            else:
+                dialogue_start = len(speaker_tokens)
+        elif not line.strip() or line.lstrip().startswith(('[', '(')):
+            speaker = None
+        for i, token in enumerate(tokens):
+            add_posting(postings, token, doc_id, position)
+            if speaker and i >= dialogue_start:
+                add_posting(postings, qualify(token, speaker), doc_id, position)
+            position += 1
+    return doc_line_starts, doc_line_tokens
+
+@functools.lru_cache(maxsize=4)
+def open_corpus(path):
+    return PackedCorpus(path)
+
+def shard_chunks(episode_key, corpus_path):
+    if corpus_path is None:
+        return script_chunks(episode_key)
+    return iter_buffer_chunks(open_corpus(corpus_path).view(episode_key))
+
+def index_shard(shard, corpus_path=None):
+    """
+    Worker: partial postings and line tables for a list of (doc id, episode key)
+
+    Scripts come from the pack at corpus_path, or from the default corpus
+    (pack or files) when it is None.
+    """
+    postings = {}
+    lines = {}
+    for doc_id, episode_key in shard:
+        lines[doc_id] = index_document(doc_id, iter_lines(shard_chunks(episode_key, corpus_path)), postings)
+    return postings, lines
+
+def resolve_jobs(jobs):
+    if jobs is None:
+        jobs = BUILD_JOBS
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+def collect_postings(jobs=None, corpus_path=None):
+    """
+    Tokenize every script once into plain {term: {doc id: positions}} postings and line tables
+
+    With more than one job the scripts are split into contiguous shards that
+    worker processes index independently. Doc ids are assigned from the
+    sorted episode keys before sharding, so the merged result is the same
+    whatever the worker count. `corpus_path` indexes a specific pack
+    instead of the default corpus.
+    """
+    if corpus_path is not None:
+        docs = open_corpus(str(corpus_path)).keys()
+        corpus_path = str(corpus_path)
+    else:
+        #snippets are sliced out of the pack, so make sure there is one
+        if not PACKED_CORPUS_FILE.exists():
+            pack_corpus()
+        docs = list(script_keys())
+
+    jobs = resolve_jobs(jobs)
+    numbered = list(enumerate(docs))
+    if jobs == 1:
+        postings, lines = index_shard(numbered, corpus_path)
+        line_starts = [lines[doc_id][0] for doc_id in range(len(docs))]
+        line_tokens = [lines[doc_id][1] for doc_id in range(len(docs))]
+        return docs, postings, line_starts, line_tokens
+
+    shard_count = min(len(numbered), jobs * SHARDS_PER_JOB) or 1
+    shard_size = -(-len(numbered) // shard_count)
+    shards = [numbered[i:i + shard_size] for i in range(0, len(numbered), shard_size)]
+    logger.info(f"Indexing {len(docs)} scripts in {len(shards)} shards on {jobs} workers")
+
+    postings = {}
+    lines = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        #map() yields in shard order, so the merge order is fixed too
+        for shard_postings, shard_lines in executor.map(index_shard, shards, [corpus_path] * len(shards)):
+            for term, doc_postings in shard_postings.items():
+                merged = postings.get(term)
+                if merged is None:
+                    postings[term] = doc_postings
+                else:
+                    merged.update(doc_postings)
+            lines.update(shard_lines)
+
+    line_starts = [lines[doc_id][0] for doc_id in range(len(docs))]
+    line_tokens = [lines[doc_id][1] for doc_id in range(len(docs))]
+    return docs, postings, line_starts, line_tokens
+
+def build_index(jobs=None, corpus_path=None, fingerprint=None):
+    """Build the compressed positional index and line tables (see collect_postings for the arguments)"""
+    started = time.perf_counter()
+    docs, postings, line_starts, line_tokens = collect_postings(jobs, corpus_path)
+    if fingerprint is None:
+        fingerprint = corpus_fingerprint()
+    corpus = open_corpus(str(corpus_path)) if corpus_path is not None else get_corpus()
+    aliases = corpus.aliases() if corpus else {}
+    index = KeywordIndex.from_postings(docs, postings, line_starts, line_tokens, fingerprint, aliases)
+    logger.info(f"Indexed {len(docs)} scripts, {len(index.terms)} distinct terms, "
+                f"{len(index.postings_blob)} bytes of postings in {time.perf_counter() - started:.2f}s")
+    return index
+
+def measure_memory():
+    """
+    Compare memory of the compressed index against the alternatives
+
+    Reports the plain dict-of-dicts index, the compressed index, the peak
+    of the old per-query scan that tokenized each script into a Counter and
+    a set, and the peak of streaming the same script through the tokenizer.
+    """
+    import tracemalloc
+    from collections import Counter
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    docs, postings, line_starts, line_tokens = collect_postings()
+    plain_bytes = tracemalloc.get_traced_memory()[0] - baseline
+
+    before_encode = tracemalloc.get_traced_memory()[0]
+    index = KeywordIndex.from_postings(docs, postings, line_starts, line_tokens)
+    #line tables are shared with the plain structure, count them once for each
+    compact_bytes = tracemalloc.get_traced_memory()[0] - before_encode + sum(
+        arr.itemsize * len(arr) for arr in line_starts + line_tokens)
+    del postings
+
+    scan_peak = 0
+    stream_peak = 0
+    for episode_key, text in iter_scripts():
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        tokens = tokenize_text(text)
+        token_counts, token_set = Counter(tokens), set(tokens)
+        scan_peak = max(scan_peak, tracemalloc.get_traced_memory()[1] - start)
+        del tokens, token_counts, token_set
+
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        for _, line in iter_lines(script_chunks(episode_key)):
+            for _ in tokenize_text(line):
+                pass
+        stream_peak = max(stream_peak, tracemalloc.get_traced_memory()[1] - start)
+    tracemalloc.stop()
+
+    return {
+        "docs": len(docs),
+        "terms": len(index.terms),
+        "plain_index_bytes": plain_bytes,
+        "compressed_index_bytes": compact_bytes,
+        "postings_blob_bytes": len(index.postings_blob),
+        "per_query_scan_peak_bytes": scan_peak,
+        "streaming_tokenize_peak_bytes": stream_peak,
+    }
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Process-wide index: loaded from disk if current, otherwise rebuilt and saved"""
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is not None:
+            return _index
+        fingerprint = corpus_fingerprint()
+        if INDEX_FILE.exists():
+            try:
+                index = KeywordIndex.load(INDEX_FILE)
+                if index.fingerprint == fingerprint:
+                    _index = index
+                    logger.info(f"Loaded keyword index with {len(index.docs)} scripts")
+                    return _index
+                logger.info("Keyword index is stale, rebuilding")
+            except Exception as e:
+                logger.warning(f"Failed to load keyword index, rebuilding: {e}")
+        index = build_index()
+        if not index.docs:
+            return None
+        try:
+            index.save(INDEX_FILE)
+            #serve from the mapping like every other process, not from private build arrays
+            index = KeywordIndex.load(INDEX_FILE)
+        except Exception as e:
+            logger.warning(f"Could not save keyword index: {e}")
+        _index = index
+        return _index
+
+def install_index(index):
+    """Swap the process-wide index; requests already holding the old one finish on it"""
+    global _index
+    with _index_lock:
+        _index = index
+
+def main():
+    """Command line interface for (re)building the index"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the keyword search index')
+    parser.add_argument('--jobs', type=int, default=BUILD_JOBS,
+                        help='Worker processes for the build (0 = one per core)')
+    parser.add_argument('--measure-memory', action='store_true', help='Report index memory use instead of saving')
+    args = parser.parse_args()
+
+    if args.measure_memory:
+        for name, value in measure_memory().items():
+            print(f"{name:>28}: {value:,}")
+        return
+
+    index = build_index(args.jobs)
+    if not index.docs:
+        logger.error("No scripts found to index")
+        sys.exit(1)
+    index.save(INDEX_FILE)
+    print(f"\nIndexed {len(index.docs)} scripts with {len(index.terms)} distinct terms ({index.memory_bytes():,} bytes)")
+
+if __name__ == "__main__":
+    main()
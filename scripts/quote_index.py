@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Suffix array quote locator
+
+Finds every occurrence of an exact piece of dialogue ("who said 'these
+pretzels are making me thirsty'"), punctuation and word order included,
+which the token-based keyword index can't do.
+
+The suffix array is built offline over the script bytes of the packed
+corpus (scripts.pack), normalized the same way as queries: ASCII
+lowercase, and every run of whitespace (line breaks included) as one
+space, so "marine   KEYS" finds "Marine keys" even across a line break.
+Punctuation still has to match. The normalized text is shorter than the
+pack, so an offset map from each normalized byte back to its byte in the
+pack is kept alongside. It is all saved next to the pack as NumPy arrays:
+
+    scripts.sa.npy       suffix start offsets in the normalized text, in sorted order
+    scripts.lcp.npy      lcp[i] = common prefix length of suffixes i-1 and i
+    scripts.offsets.npy  offsets[i] = pack offset of normalized byte i
+    scripts.sa.json      which pack they were built from
+
+Both arrays are memory-mapped read-only at query time. A lookup is a
+binary search comparing the query against normalized slices of the pack
+(O(m log n) for a query of m bytes). The LCP array then extends the first
+hit to the whole run of matching suffixes without a second search. Hits
+are mapped back to episode, line and speaker through the pack's doc table.
+
+    python scripts/quote_index.py                  build for data/scripts.pack
+    python scripts/quote_index.py "serenity now"   search
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.script_corpus import PACKED_CORPUS_FILE, PackedCorpus, get_corpus
+from scripts.keyword_index import SPEAKER_LINE_PATTERN
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+QUOTE_INDEX_VERSION = 2
+MIN_QUOTE_LENGTH = 3
+MAX_QUOTE_HITS = 50
+#normalization applied to the corpus and to queries alike
+NORMALIZE_TABLE = bytes.maketrans(b"\t\r\n\x0b\x0c", b"     ")
+SPACE_RUN_PATTERN = re.compile(rb" {2,}")
+
+def normalize_bytes(data):
+    """Lowercase, with every run of whitespace as a single space"""
+    return SPACE_RUN_PATTERN.sub(b" ", bytes(data).lower().translate(NORMALIZE_TABLE))
+
+def normalized_offsets(data):
+    """Offset in data of each byte normalize_bytes(data) keeps: all but the 2nd+ space of a run"""
+    space = np.frombuffer(bytes(data).translate(NORMALIZE_TABLE), dtype=np.uint8) == ord(" ")
+    keep = ~space
+    keep[1:] |= ~space[:-1]
+    return np.flatnonzero(keep)
+
+def normalize_query(query):
+    return normalize_bytes(" ".join(query.split()).encode('utf-8'))
+
+def index_paths(corpus_path):
+    """(suffix array, lcp, offset map, metadata) paths next to a pack"""
+    corpus_path = Path(corpus_path)
+    return (corpus_path.with_suffix(".sa.npy"), corpus_path.with_suffix(".lcp.npy"),
+            corpus_path.with_suffix(".offsets.npy"), corpus_path.with_suffix(".sa.json"))
+
+def pack_identity(corpus):
+    return {"created": corpus.metadata.get("created"), "size": len(corpus.blob()), "docs": len(corpus)}
+
+def build_suffix_array(text):
+    """
+    Suffix array of a bytes object by prefix doubling
+
+    Each round sorts suffixes by (rank of the first k bytes, rank of the
+    next k bytes) as one int64 key, so the work is log2(longest repeat)
+    NumPy argsorts rather than a Python-level comparison sort.
+    """
+    n = len(text)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    rank = np.frombuffer(text, dtype=np.uint8).astype(np.int64)
+    #ranks stay below max(n, 256), so (rank, next rank + 1) never collide in the key
+    base = max(n, 256) + 1
+    k = 1
+    while True:
+        following = np.zeros(n, dtype=np.int64)
+        following[:n - k] = rank[k:] + 1
+        key = rank * base + following
+        sa = np.argsort(key, kind='stable')
+        sorted_key = key[sa]
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.concatenate(([0], np.cumsum(sorted_key[1:] != sorted_key[:-1])))
+        if rank[sa[-1]] == n - 1 or k >= n:
+            return sa
+        k *= 2
+
+def build_lcp(text, sa):
+    """LCP array by Kasai's algorithm (linear, each byte comparison is amortized)"""
+    n = len(text)
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[sa] = np.arange(n, dtype=np.int64)
+    #plain arrays: indexing them from Python is much cheaper than indexing NumPy arrays
+    rank = array('q', inverse.tobytes())
+    suffixes = array('q', sa.astype(np.int64).tobytes())
+    lcp = array('q', bytes(8 * n))
+    h = 0
+    for i in range(n):
+        position = rank[i]
+        if position == 0:
+            h = 0
+            continue
+        j = suffixes[position - 1]
+        while i + h < n and j + h < n and text[i + h] == text[j + h]:
+            h += 1
+        lcp[position] = h
+        if h:
+            h -= 1
+    return np.frombuffer(lcp, dtype=np.int64)
+
+def save_array(path, values):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+def build_quote_index(corpus_path=PACKED_CORPUS_FILE):
+    """Build and save the suffix array and LCP for a pack, returns the number of suffixes"""
+    started = time.perf_counter()
+    corpus = PackedCorpus(corpus_path)
+    text = normalize_bytes(corpus.blob())
+    offsets = normalized_offsets(corpus.blob())
+    dtype = np.int32 if len(corpus.blob()) < 2 ** 31 else np.int64
+    sa = build_suffix_array(text)
+    sorted_at = time.perf_counter()
+    lcp = build_lcp(text, sa)
+
+    sa_path, lcp_path, offsets_path, meta_path = index_paths(corpus_path)
+    save_array(sa_path, sa.astype(dtype))
+    save_array(lcp_path, lcp.astype(dtype))
+    save_array(offsets_path, offsets.astype(dtype))
+    #metadata last, so half-written arrays never look current
+    meta = {"version": QUOTE_INDEX_VERSION, "pack": pack_identity(corpus)}
+    tmp_path = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(meta), encoding='utf-8')
+    os.replace(tmp_path, meta_path)
+    logger.info(f"Built quote index over {len(text)} bytes: suffix array {sorted_at - started:.2f}s, "
+                f"lcp {time.perf_counter() - sorted_at:.2f}s")
+    return len(sa)
+
+def line_speaker(preceding, line):
+    """Speaker of a line: its own SPEAKER: prefix, else the last one since the previous blank line"""
+    for candidate in [line] + preceding.split("\n")[::-1]:
+        if not candidate.strip():
+            return None
+        speaker_match = SPEAKER_LINE_PATTERN.match(candidate)
+        if speaker_match:
+            return speaker_match.group(1).strip()
+    return None
+
+class QuoteIndex:
+    """Memory-mapped suffix array, LCP and offset map over one pack"""
+
+    def __init__(self, corpus, sa, lcp, offsets):
+        self.corpus = corpus
+        self.sa = sa
+        self.lcp = lcp
+        self.offsets = offsets
+        self.blob = corpus.blob()
+        self.doc_starts = corpus.doc_starts()
+        self.doc_ends = self.doc_starts[1:] + [len(self.blob)]
+
+    @classmethod
+    def load(cls, corpus_path=PACKED_CORPUS_FILE, corpus=None):
+        """Map the arrays saved next to a pack, ValueError if they are missing or from another pack"""
+        corpus = corpus or PackedCorpus(corpus_path)
+        sa_path, lcp_path, offsets_path, meta_path = index_paths(corpus_path)
+        if not meta_path.exists():
+            raise ValueError(f"no quote index next to {corpus_path}")
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        if meta.get("version") != QUOTE_INDEX_VERSION or meta.get("pack") != pack_identity(corpus):
+            raise ValueError(f"quote index next to {corpus_path} is stale")
+        sa = np.load(sa_path, mmap_mode='r')
+        lcp = np.load(lcp_path, mmap_mode='r')
+        offsets = np.load(offsets_path, mmap_mode='r')
+        if len(lcp) != len(sa) or len(offsets) != len(sa) or (len(offsets) and offsets[-1] >= len(corpus.blob())):
+            raise ValueError(f"quote index next to {corpus_path} doesn't match the pack")
+        return cls(corpus, sa, lcp, offsets)
+
+    def suffix(self, rank, length):
+        """First `length` normalized bytes of the suffix at rank"""
+        start = int(self.sa[rank])
+        end = min(start + length, len(self.offsets))
+        #the pack bytes from the first to the last kept byte normalize to exactly these
+        return normalize_bytes(self.blob[int(self.offsets[start]):int(self.offsets[end - 1]) + 1])
+
+    def first_rank(self, pattern):
+        """Lowest rank whose suffix is >= pattern (binary search, O(m log n))"""
+        lo, hi = 0, len(self.sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.suffix(mid, len(pattern)) < pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def match_range(self, pattern):
+        """[lo, hi) ranks of every suffix starting with pattern"""
+        lo = self.first_rank(pattern)
+        if lo == len(self.sa) or self.suffix(lo, len(pattern)) != pattern:
+            return lo, lo
+        #the run of matches ends at the first lcp shorter than the pattern;
+        #scan the mapped lcp in growing windows so the cost tracks the hit count
+        hi = lo + 1
+        window = 64
+        while hi < len(self.lcp):
+            short = np.flatnonzero(self.lcp[hi:hi + window] < len(pattern))
+            if len(short):
+                return lo, hi + int(short[0])
+            hi += window
+            window *= 2
+        return lo, len(self.lcp)
+
+    def longest_prefix(self, pattern):
+        """Longest prefix of pattern that occurs somewhere, from the two suffixes around its insertion point"""
+        rank = self.first_rank(pattern)
+        best = 0
+        for neighbour in (rank - 1, rank):
+            if 0 <= neighbour < len(self.sa):
+                candidate = self.suffix(neighbour, len(pattern))
+                common = 0
+                while common < len(candidate) and candidate[common] == pattern[common]:
+                    common += 1
+                best = max(best, common)
+        return pattern[:best]
+
+    def hit(self, position, length):
+        """Episode, line number, speaker and the line with the match in ** for one occurrence"""
+        doc_id = bisect.bisect_right(self.doc_starts, position) - 1
+        doc_start = self.doc_starts[doc_id]
+        doc = self.corpus.view(doc_id)
+        offset = position - doc_start
+        before = doc[:offset].tobytes()
+        line_start = before.rfind(b"\n") + 1
+        line_end = doc.tobytes().find(b"\n", offset + length)
+        line_end = len(doc) if line_end < 0 else line_end
+        line = doc[line_start:line_end].tobytes()
+        column = offset - line_start
+        marked = (line[:column] + b"**" + line[column:column + length] + b"**" + line[column + length:]).decode(
+            'utf-8', errors='replace')
+        return {
+            "episode": self.corpus.docs[doc_id]["key"],
+            "line": before.count(b"\n") + 1,
+            "speaker": line_speaker(before[:line_start].decode('utf-8', errors='replace'),
+                                    line.decode('utf-8', errors='replace').split("\n")[0]),
+            "text": marked.strip(),
+        }
+
+    def search(self, query, limit=MAX_QUOTE_HITS):
+        """
+        Every occurrence of query (case and whitespace insensitive)
+
+        Returns the total count and up to `limit` hits in corpus order. When
+        there are none, 'closest' is the longest leading part of the query
+        that does occur.
+        """
+        pattern = normalize_query(query)
+        if len(pattern) < MIN_QUOTE_LENGTH:
+            return {"query": query, "count": 0, "hits": [], "closest": None}
+        lo, hi = self.match_range(pattern)
+        matches = np.sort(np.asarray(self.sa[lo:hi], dtype=np.int64))
+        #back to pack offsets: a match covers its first through last kept byte
+        positions = np.asarray(self.offsets[matches], dtype=np.int64)
+        ends = np.asarray(self.offsets[matches + len(pattern) - 1], dtype=np.int64) + 1
+        #a match running off the end of one script into the next isn't a quote
+        doc_ids = np.searchsorted(self.doc_starts, positions, side='right') - 1
+        inside = ends <= np.asarray(self.doc_ends, dtype=np.int64)[doc_ids]
+        positions, ends = positions[inside], ends[inside]
+        closest = None
+        if not len(positions):
+            prefix = self.longest_prefix(pattern)
+            if len(prefix) >= MIN_QUOTE_LENGTH:
+                closest = prefix.decode('utf-8', errors='ignore').strip() or None
+        return {
+            "query": query,
+            "count": int(len(positions)),
+            "hits": [self.hit(int(position), int(end - position))
+                     for position, end in zip(positions[:limit], ends[:limit])],
+            "closest": closest,
+        }
+
+_quote_index = None
+_quote_index_lock = threading.Lock()
+
+def get_quote_index():
+    """Process-wide quote index for data/scripts.pack, built on first use if missing or stale"""
+    global _quote_index
+    if _quote_index is not None:
+        return _quote_index
+    with _quote_index_lock:
+        if _quote_index is not None:
+            return _quote_index
+        corpus = get_corpus()
+        if corpus is None:
+            return None
+        try:
+            _quote_index = QuoteIndex.load(corpus.path, corpus)
+        except ValueError as e:
+            logger.info(f"Building quote index ({e})")
+            build_quote_index(corpus.path)
+            _quote_index = QuoteIndex.load(corpus.path, corpus)
+        return _quote_index
+
+def install_quote_index(quote_index):
+    """Swap the process-wide quote index; requests already holding the old one finish on it"""
+    global _quote_index
+    with _quote_index_lock:
+        _quote_index = quote_index
+
+def main():
+    """Command line interface: build the quote index, or search it"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or search the suffix array quote index')
+    parser.add_argument('quote', nargs='?', help='exact text to find (omit to rebuild the index)')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.quote is None:
+        if get_corpus() is None:
+            print("No packed corpus, run script_corpus.py first")
+            sys.exit(1)
+        build_quote_index(get_corpus().path)
+        return
+    quote_index = get_quote_index()
+    started = time.perf_counter()
+    result = quote_index.search(args.quote, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"\n{result['count']} occurrences in {elapsed:.2f} ms")
+    for hit in result["hits"]:
+        print(f"  {hit['episode']} line {hit['line']} ({hit['speaker'] or 'unknown'}): {hit['text']}")
+    if result["closest"]:
+        print(f"Closest: {result['closest']!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Packed script corpus
+
+All scripts under data/scripts are concatenated into a single file,
+data/scripts.pack, which is read through mmap:
+
+    header   MAGIC (8 bytes), format version, doc count, metadata length
+    table    doc count x (offset, length) as little-endian uint64 pairs
+    metadata JSON: pack info plus key/season/title/path for every doc
+    blob     the UTF-8 script texts back to back
+
+Readers slice episodes straight out of the mapping (no per-file open/stat),
+and the OS page cache is shared by every process that maps the file.
+Near-duplicate scripts (see dedupe.py) are stored once, and the other
+episode keys are kept as that doc's aliases.
+Rebuild with `python scripts/script_corpus.py` after changing data/scripts.
+"""
+
+import os
+import re
+import sys
+import mmap
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.tokenizer import CHUNK_SIZE, iter_buffer_chunks, iter_file_chunks
+from scripts.dedupe import find_duplicates
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+PACKED_CORPUS_FILE = Path(__file__).parent.parent / "data" / "scripts.pack"
+MAGIC = b"SFCORPUS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIII4x")
+TABLE_ENTRY = struct.Struct("<QQ")
+
+class PackedCorpus:
+    """Read-only, memory-mapped view of a packed script corpus"""
+
+    def __init__(self, path=PACKED_CORPUS_FILE):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, meta_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a packed script corpus")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has format version {version}, expected {FORMAT_VERSION}")
+
+        table_start = HEADER.size
+        self._table = [TABLE_ENTRY.unpack_from(self._mmap, table_start + i * TABLE_ENTRY.size) for i in range(count)]
+        meta_start = table_start + count * TABLE_ENTRY.size
+        self.metadata = json.loads(bytes(self._mmap[meta_start:meta_start + meta_len]).decode('utf-8'))
+        self.docs = self.metadata["docs"]
+        self._ids = {doc["key"]: doc_id for doc_id, doc in enumerate(self.docs)}
+        #duplicate scripts resolve to the copy that was kept
+        for doc_id, doc in enumerate(self.docs):
+            for alias in doc.get("aliases", []):
+                self._ids.setdefault(alias, doc_id)
+        self._view = memoryview(self._mmap)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def keys(self):
+        return [doc["key"] for doc in self.docs]
+
+    def doc_id(self, key):
+        return self._ids[key]
+
+    def aliases(self):
+        """episode key -> keys of the duplicates stored as that script"""
+        return {doc["key"]: doc["aliases"] for doc in self.docs if doc.get("aliases")}
+
+    def paths(self):
+        """episode key -> original script path, same shape as load_script_files()"""
+        return {doc["key"]: Path(doc["path"]) for doc in self.docs}
+
+    def view(self, doc):
+        """Zero-copy memoryview over one script's UTF-8 bytes (doc id or episode key)"""
+        doc_id = self._ids[doc] if isinstance(doc, str) else doc
+        offset, length = self._table[doc_id]
+        return self._view[offset:offset + length]
+
+    def slice(self, doc, start, end=None):
+        """Bytes [start, end) of one script (end=None for the rest of it), zero-copy"""
+        doc_id = self._ids[doc] if isinstance(doc, str) else doc
+        offset, length = self._table[doc_id]
+        end = length if end is None else min(end, length)
+        return self._view[offset + start:offset + end]
+
+    def text(self, doc):
+        return self.view(doc).tobytes().decode('utf-8')
+
+    def blob(self):
+        """Zero-copy memoryview over every script's bytes back to back, in doc id order"""
+        if not self._table:
+            return self._view[0:0]
+        start = self._table[0][0]
+        return self._view[start:start + sum(length for _, length in self._table)]
+
+    def doc_starts(self):
+        """Start of each script within blob()"""
+        start = self._table[0][0] if self._table else 0
+        return [offset - start for offset, _ in self._table]
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+def pack_corpus(output=PACKED_CORPUS_FILE):
+    """Pack every script from data/scripts into one file, returns the doc count"""
+    from scripts.find_episode_by_keywords import load_script_files
+
+    script_files = load_script_files()
+    if not script_files:
+        logger.error("No script files to pack")
+        return 0
+
+    contents = {}
+    for episode_key, script_path in script_files.items():
+        with open(script_path, 'rb') as f:
+            contents[episode_key] = f.read()
+    #the same page downloaded under several seasons is stored once, the other keys become aliases
+    duplicates = find_duplicates({key: blob.decode('utf-8', errors='replace') for key, blob in contents.items()})
+    alias_keys = {alias for aliases in duplicates.values() for alias in aliases}
+
+    docs = []
+    blobs = []
+    #sorted so doc ids and the blob layout don't depend on directory listing order
+    #(the metadata still records when the pack was built and where each script came from)
+    for episode_key in sorted(script_files):
+        if episode_key in alias_keys:
+            continue
+        match = re.match(r"Season (\d+): (.*)", episode_key)
+        docs.append({
+            "key": episode_key,
+            "season": int(match.group(1)) if match else None,
+            "title": match.group(2) if match else episode_key,
+            "path": str(script_files[episode_key]),
+            "aliases": duplicates.get(episode_key, []),
+        })
+        blobs.append(contents[episode_key])
+
+    metadata = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "docs": docs,
+    }).encode('utf-8')
+
+    offset = HEADER.size + len(docs) * TABLE_ENTRY.size + len(metadata)
+    table = []
+    for blob in blobs:
+        table.append(TABLE_ENTRY.pack(offset, len(blob)))
+        offset += len(blob)
+
+    output = Path(output)
+    output.parent.mkdir(exist_ok=True)
+    tmp_path = output.with_suffix(output.suffix + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(docs), len(metadata)))
+        f.write(b"".join(table))
+        f.write(metadata)
+        for blob in blobs:
+            f.write(blob)
+    #readers that already mapped the old file keep their view
+    os.replace(tmp_path, output)
+    logger.info(f"Packed {len(docs)} scripts ({offset} bytes, {len(alias_keys)} duplicates stored as aliases) into {output}")
+    return len(docs)
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+def get_corpus():
+    """Process-wide PackedCorpus, or None if no pack has been built"""
+    global _corpus
+    if _corpus is None and PACKED_CORPUS_FILE.exists():
+        with _corpus_lock:
+            if _corpus is None:
+                try:
+                    _corpus = PackedCorpus(PACKED_CORPUS_FILE)
+                    logger.info(f"Mapped packed corpus with {len(_corpus)} scripts")
+                except Exception as e:
+                    logger.error(f"Failed to open packed corpus {PACKED_CORPUS_FILE}: {e}")
+                    return None
+    return _corpus
+
+def script_keys():
+    """Sorted episode keys of every script, from the pack when available"""
+    corpus = get_corpus()
+    if corpus:
+        return corpus.keys()
+    from scripts.find_episode_by_keywords import load_script_files
+    return sorted(load_script_files())
+
+def read_script(key, script_files=None):
+    """Text of one script by episode key, None if it can't be read"""
+    corpus = get_corpus()
+    if corpus and key in corpus:
+        return corpus.text(key)
+
+    if script_files is None:
+        from scripts.find_episode_by_keywords import load_script_files
+        script_files = load_script_files()
+    try:
+        #bytes decoded as-is so offsets match what the pack would give
+        with open(script_files[key], 'rb') as f:
+            return f.read().decode('utf-8')
+    except Exception as e:
+        logger.error(f"Error reading {script_files.get(key)}: {e}")
+        return None
+
+def script_chunks(key, chunk_size=CHUNK_SIZE, script_files=None):
+    """Stream one script as byte chunks, from the pack mapping or the original file"""
+    corpus = get_corpus()
+    if corpus and key in corpus:
+        return iter_buffer_chunks(corpus.view(key), chunk_size)
+
+    if script_files is None:
+        from scripts.find_episode_by_keywords import load_script_files
+        script_files = load_script_files()
+    if key not in script_files:
+        logger.error(f"No script file for {key}")
+        return iter(())
+    return iter_file_chunks(script_files[key], chunk_size)
+
+def iter_scripts():
+    """Yield (episode key, script text) for every script, from the pack when available"""
+    corpus = get_corpus()
+    if corpus:
+        for doc_id, key in enumerate(corpus.keys()):
+            yield key, corpus.text(doc_id)
+        return
+
+    from scripts.find_episode_by_keywords import load_script_files
+    script_files = load_script_files()
+    for key in sorted(script_files):
+        text = read_script(key, script_files)
+        if text is not None:
+            yield key, text
+
+def corpus_fingerprint():
+    """Cheap identifier of the current corpus contents, used to detect stale indexes"""
+    corpus = get_corpus()
+    if corpus:
+        stat = corpus.path.stat()
+        return f"pack:{stat.st_size}:{int(stat.st_mtime)}"
+
+    return scripts_fingerprint()
+
+def scripts_fingerprint():
+    """Identifier of the script files themselves (names, sizes, mtimes), ignoring any pack"""
+    from scripts.find_episode_by_keywords import load_script_files
+    parts = []
+    for key, script_path in sorted(load_script_files().items()):
+        stat = script_path.stat()
+        parts.append(f"{key}:{stat.st_size}:{int(stat.st_mtime)}")
+    return "files:" + hashlib.sha1("\n".join(parts).encode('utf-8')).hexdigest()
+
+def main():
+    """Command line interface for packing the corpus"""
+    count = pack_corpus()
+    if not count:
+        sys.exit(1)
+    corpus = PackedCorpus()
+    print(f"\nPacked {len(corpus)} scripts into {corpus.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Prefix autocomplete for the keyword search box
+
+Completions come from three sources: the keyword index vocabulary (ranked
+by how many episodes use the word), episode titles (completed to a
+title:<slug> filter for that episode) and speaker names. All
+of them go into one sorted list of normalized keys. The completions for a
+prefix are a contiguous slice of it, found with two bisects.
+
+Short prefixes match thousands of keys, so every prefix that matches more
+than SCAN_LIMIT keys gets its best completions precomputed when the
+suggester is built. A lookup is therefore two bisects plus either a
+dictionary hit or a scan of at most SCAN_LIMIT entries, which takes a few
+microseconds.
+
+    python scripts/suggest.py "kramer bag"
+"""
+
+import re
+import sys
+import time
+import bisect
+import heapq
+import logging
+import functools
+from pathlib import Path
+
+#add project root to path if running as script
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+from scripts.keyword_index import SPEAKER_SEPARATOR, get_index, title_slug, title_words
+from scripts.tokenizer import tokenize_text
+
+#setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+#constants
+MAX_SUGGESTIONS = 10
+SCAN_LIMIT = 64
+MIN_TERM_LENGTH = 3
+#too common to be worth completing to
+STOP_WORDS = frozenset({'the', 'and', 'but', 'for', 'with', 'are', 'was', 'were', 'been', 'have', 'has', 'had',
+                        'does', 'did', 'will', 'would', 'could', 'should', 'might', 'must', 'shall', 'can',
+                        'this', 'that', 'these', 'those', 'you', 'she', 'they', 'them', 'him', 'her'})
+SPEAKER_PREFIX = "speaker:"
+TITLE_PATTERN = re.compile(r"Season \d+: (.*)")
+
+class Suggester:
+    """Sorted completion keys for one keyword index"""
+
+    def __init__(self, index):
+        started = time.perf_counter()
+        doc_count = len(index.docs)
+        speaker_docs = {}
+        entries = []
+        for term_id, term in enumerate(index.terms):
+            frequency = index.doc_freqs[term_id]
+            if SPEAKER_SEPARATOR in term:
+                #a speaker's most common word is roughly the episodes they talk in
+                speaker = term.split(SPEAKER_SEPARATOR, 1)[0]
+                speaker_docs[speaker] = max(speaker_docs.get(speaker, 0), frequency)
+            elif len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS:
+                entries.append((term, frequency, "term", term, term))
+
+        for speaker, frequency in speaker_docs.items():
+            name = speaker.replace("_", " ").title()
+            entries.append((SPEAKER_PREFIX + speaker, frequency, "speaker", name, SPEAKER_PREFIX + speaker))
+
+        #a title completes to the title: filter for that episode; the title text
+        #itself isn't indexed (the download header is skipped) and rarely comes up in dialogue
+        title_rank = max(1, doc_count // 2)
+        for key in index.docs:
+            match = TITLE_PATTERN.match(key)
+            title = match.group(1) if match else key
+            words = tokenize_text(title)
+            if not words:
+                continue
+            short = title_words(title)
+            value = f"title:{title_slug(title)}"
+            #typing "parking" should find The Parking Garage as well as "the parking"
+            for title_key in {" ".join(words), " ".join(short)}:
+                entries.append((title_key, title_rank, "title", title, value))
+
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [entry[0] for entry in entries]
+        self.ranks = [entry[1] for entry in entries]
+        self.entries = [{"text": entry[3], "kind": entry[2], "value": entry[4],
+                         "episodes": 1 if entry[2] == "title" else entry[1]} for entry in entries]
+        self.top = {}
+        self._precompute(0, len(entries), 0)
+        logger.info(f"Suggester ready: {len(entries)} keys, {len(self.top)} precomputed prefixes "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _precompute(self, lo, hi, depth):
+        """Top completions for every prefix (of length > depth) whose slice is too long to scan"""
+        start = lo
+        while start < hi:
+            key = self.keys[start]
+            if len(key) <= depth:
+                start += 1
+                continue
+            prefix = key[:depth + 1]
+            end = bisect.bisect_left(self.keys, prefix + "\uffff", start, hi)
+            if end - start > SCAN_LIMIT:
+                #extra headroom for titles that dedupe against each other
+                self.top[prefix] = self._best(start, end, MAX_SUGGESTIONS * 2)
+                self._precompute(start, end, depth + 1)
+            start = end
+
+    def _best(self, lo, hi, limit):
+        return heapq.nlargest(limit, range(lo, hi), key=self.ranks.__getitem__)
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        """Entry dicts for keys starting with prefix, most frequent first"""
+        if not prefix:
+            return []
+        ids = self.top.get(prefix)
+        if ids is None:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + "\uffff", lo)
+            ids = self._best(lo, hi, limit * 2)
+        results = []
+        seen = set()
+        for entry_id in ids:
+            entry = self.entries[entry_id]
+            if entry["value"] in seen:
+                continue
+            seen.add(entry["value"])
+            results.append(entry)
+            if len(results) == limit:
+                break
+        return results
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        """
+        Completions for the last word of query, as full replacement queries
+
+        Titles are also matched against the whole query so "the parking ga"
+        completes to The Parking Garage.
+        """
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        if not query.strip() or query[-1].isspace():
+            return []
+        head, _, last = query.rpartition(" ")
+        head = head.rstrip()
+
+        def after_head(value):
+            return f"{head} {value}" if head else value
+
+        #(entry, query it turns into)
+        matches = []
+        if last.lower().startswith(SPEAKER_PREFIX):
+            prefix = SPEAKER_PREFIX + "_".join(tokenize_text(last[len(SPEAKER_PREFIX):]))
+            matches = [(entry, after_head(entry["value"])) for entry in self.complete(prefix, limit)
+                       if entry["kind"] == "speaker"]
+        elif ":" not in last:
+            #(season:/flag: filters have nothing to complete)
+            if head:
+                #a multi-word prefix can only be the start of a title, which replaces the whole query
+                phrase = " ".join(tokenize_text(query))
+                matches = [(entry, entry["value"]) for entry in self.complete(phrase, limit) if entry["kind"] == "title"]
+            words = tokenize_text(last)
+            if words:
+                #after a head only words complete the last word, titles were matched against the whole query above
+                matches += [(entry, after_head(entry["value"])) for entry in self.complete(words[-1], limit)
+                            if entry["kind"] == "term" or (not head and entry["kind"] == "title")]
+
+        suggestions = []
+        seen = set()
+        for entry, value in matches:
+            if value in seen:
+                continue
+            seen.add(value)
+            suggestions.append({"text": entry["text"], "kind": entry["kind"], "value": value,
+                                "episodes": entry["episodes"]})
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+@functools.lru_cache(maxsize=2)
+def suggester_for(index):
+    """One Suggester per index object, so a hot-swapped index gets its own"""
+    return Suggester(index)
+
+def get_suggester():
+    index = get_index()
+    return suggester_for(index) if index else None
+
+def main():
+    """Command line interface: print completions for a partial query and the lookup time"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Autocomplete a partial keyword query')
+    parser.add_argument('query', type=str, help='partial query, e.g. "kramer bag"')
+    parser.add_argument('--limit', type=int, default=MAX_SUGGESTIONS)
+    args = parser.parse_args()
+
+    suggester = get_suggester()
+    if suggester is None:
+        print("No keyword index available")
+        sys.exit(1)
+    runs = 1000
+    started = time.perf_counter()
+    for _ in range(runs):
+        suggestions = suggester.suggest(args.query, args.limit)
+    elapsed = (time.perf_counter() - started) / runs * 1e6
+    print(f"\n{len(suggestions)} suggestions in {elapsed:.1f} µs")
+    for suggestion in suggestions:
+        print(f"  {suggestion['value']:<40} {suggestion['kind']:<8} {suggestion['episodes']}")
+
+if __name__ == "__main__":
+    main()
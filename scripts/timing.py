@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Lightweight per-request timing spans
+
+Code wraps the stages it wants measured in ``with span("name"):``. Spans are
+collected per request (a context variable, so threads don't mix) once
+``start_timing()`` has been called, and are a no-op otherwise, so the search
+functions can be instrumented unconditionally and still be used from the CLI.
+"""
+
+import re
+import time
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_spans = ContextVar("timing_spans", default=None)
+
+def start_timing():
+    """Start collecting spans for the current request and return the list they go into"""
+    spans = []
+    _current_spans.set(spans)
+    return spans
+
+def stop_timing():
+    """Stop collecting and return the spans recorded so far"""
+    spans = _current_spans.get()
+    _current_spans.set(None)
+    return spans or []
+
+def get_spans():
+    return list(_current_spans.get() or [])
+
+@contextmanager
+def span(name, description=None):
+    """Time the enclosed block and record it under ``name``"""
+    spans = _current_spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append({
+            "name": name,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "description": description,
+        })
+
+def timed(name):
+    """Decorator form of span() for timing a whole function"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing_header(spans):
+    """Format spans as a Server-Timing header value"""
+    metrics = []
+    for item in spans:
+        #metric names must be HTTP tokens
+        name = re.sub(r"[^A-Za-z0-9_\-.]", "-", item["name"])
+        metric = f"{name};dur={item['duration_ms']}"
+        if item.get("description"):
+            description = str(item["description"]).replace('\\', '').replace('"', "'")
+            metric += f';desc="{description}"'
+        metrics.append(metric)
+    return ", ".join(metrics)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Streaming tokenizer for scripts
+
+Scripts are read in fixed-size byte chunks and split into lines on b'\\n'
+(safe in UTF-8, the byte never occurs inside a multi-byte character), so
+only one chunk plus the current line is held at a time however long the
+transcript is. Lines are normalized with one precompiled translation table
+(ASCII lowercase + punctuation removal in a single pass) and tokenized one
+line at a time, never the whole script at once.
+"""
+
+import string
+
+#constants
+CHUNK_SIZE = 64 * 1024
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+#lowercases ASCII and drops punctuation in one translate() call
+TOKEN_TABLE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase, string.punctuation)
+
+def normalize_line(text):
+    """Lowercase and strip punctuation, whitespace left as it is"""
+    if text.isascii():
+        return text.translate(TOKEN_TABLE)
+    #str.lower() handles non-ASCII case mappings the table doesn't know about
+    return text.lower().translate(PUNCTUATION_TABLE)
+
+def tokenize_text(text):
+    """Lowercase, drop punctuation and split on whitespace"""
+    return normalize_line(text).split()
+
+def iter_buffer_chunks(buffer, chunk_size=CHUNK_SIZE):
+    """Chunks of a bytes-like object (e.g. a memoryview into the packed corpus) without copying the whole buffer"""
+    view = memoryview(buffer)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+def iter_file_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def iter_lines(chunks):
+    """
+    (byte offset, line text) for every line in a stream of byte chunks
+
+    Offsets are measured in the original bytes, the same as slicing the
+    packed corpus. A final line without a trailing newline is still yielded,
+    and so is the empty line after a trailing newline (like str.split('\\n')).
+    """
+    pending = bytearray()
+    offset = 0
+    for chunk in chunks:
+        start = 0
+        chunk = bytes(chunk) if isinstance(chunk, memoryview) else chunk
+        while True:
+            newline = chunk.find(b'\n', start)
+            if newline < 0:
+                pending += chunk[start:]
+                break
+            if pending:
+                pending += chunk[start:newline]
+                line = bytes(pending)
+                pending.clear()
+            else:
+                line = chunk[start:newline]
+            yield offset, line.decode('utf-8', errors='replace')
+            offset += len(line) + 1
+            start = newline + 1
+    yield offset, pending.decode('utf-8', errors='replace')